@@ -1,35 +1,84 @@
 # app/auth.py
 
+import os
+import time
+from functools import lru_cache
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from app.utils import decode_access_token
-from app.database import engine
-from sqlmodel import Session, select
+from app.database import async_db_session, db_session, read_only
+from sqlmodel import select
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
 from app.models import User
+from app.cache import TTLCache
 
 # OAuth2 scheme tells FastAPI where clients should send login credentials.
 # tokenUrl="auth/login" means clients obtain tokens from this endpoint.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# ---------------------------------------------------------------------
+# PRINCIPAL / TOKEN CACHES
+# ---------------------------------------------------------------------
+# Authenticated requests would otherwise verify the JWT and load the user
+# from the database every time.
+# - token_cache: token signature -> user ID, kept no longer than the token's
+#   own expiry, so a cached token is never accepted after it expires.
+# - principal_cache: user ID -> read-only User snapshot. Invalidated when a
+#   User row is updated or deleted through the ORM (see listeners below);
+#   the TTL bounds staleness for changes made outside the ORM.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_USERS = int(os.getenv("AUTH_CACHE_MAX_USERS", "10000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+TOKEN_CACHE_MAX_TOKENS = int(os.getenv("TOKEN_CACHE_MAX_TOKENS", "20000"))
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+principal_cache = TTLCache(maxsize=AUTH_CACHE_MAX_USERS, ttl=AUTH_CACHE_TTL_SECONDS)
+token_cache = TTLCache(maxsize=TOKEN_CACHE_MAX_TOKENS, ttl=TOKEN_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id: int):
+    """Drop a user from the principal cache (e.g. after a role change or deletion)."""
+    principal_cache.delete(int(user_id))
+
+
+def _snapshot(user: User) -> User:
+    """Detached copy of a user, safe to share between requests."""
+    return User(**user.model_dump())
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    # Invalidate at flush time, and again after commit so a concurrent
+    # request cannot re-cache the pre-commit row in between.
+    invalidate_user(target.id)
+    session = OrmSession.object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop("changed_user_ids", ()):
+        invalidate_user(user_id)
+
+
+def _user_id_from_token(token: str) -> int:
     """
-    Extracts and validates the currently logged-in user using the JWT access token.
+    Decode the JWT and return the user ID it was issued for.
 
-    Steps:
-    1. Read the bearer token from Authorization header.
-    2. Decode the JWT using decode_access_token().
-    3. Validate the payload (must contain user ID).
-    4. Fetch the corresponding user from the database.
-    5. Return the authenticated user object.
+    Verified tokens are cached by signature until they expire.
 
     Raises:
         HTTPException(401): Invalid token or missing payload.
-        HTTPException(404): User does not exist in the database.
     """
-
-    print("Received token: ", token)  # Useful for debugging authentication issues
+    # The signature segment is unique per token and already covers the payload.
+    signature = token.rsplit(".", 1)[-1]
+    user_id = token_cache.get(signature)
+    if user_id is not None:
+        return user_id
 
     # Decode the token → returns payload or None if invalid/expired.
     payload = decode_access_token(token)
@@ -46,10 +95,39 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
             status_code=401,
             detail="Invalid token payload"
         )
+    user_id = int(user_id)
+    expires_in = payload.get("exp", 0) - time.time()
+    token_cache.set(signature, user_id, ttl=min(TOKEN_CACHE_TTL_SECONDS, expires_in))
+    return user_id
+
+
+def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    Extracts and validates the currently logged-in user using the JWT access token.
+
+    Steps:
+    1. Read the bearer token from Authorization header.
+    2. Decode the JWT using decode_access_token().
+    3. Validate the payload (must contain user ID).
+    4. Fetch the corresponding user from the principal cache, or from the
+       database on a miss.
+    5. Return the authenticated user object (a shared snapshot; treat it
+       as read-only and never add it to a session).
+
+    Raises:
+        HTTPException(401): Invalid token or missing payload.
+        HTTPException(404): User does not exist in the database.
+    """
+
+    user_id = _user_id_from_token(token)
+    cached = principal_cache.get(user_id)
+    if cached is not None:
+        return cached
 
     # Fetch the user from the database using the extracted user_id
-    with Session(engine) as session:
-        user = session.get(User, int(user_id))
+    # (a read, even inside a POST, so it never takes SQLite's write lock)
+    with read_only(), db_session() as session:
+        user = session.get(User, user_id)
 
         if not user:
             raise HTTPException(
@@ -57,9 +135,39 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
                 detail="User not found"
             )
 
+        user = _snapshot(user)
+        principal_cache.set(user_id, user)
         return user  # Authenticated user object
 
 
+async def get_current_user_async(token: str = Depends(oauth2_scheme)):
+    """
+    Same as get_current_user(), for `async def` routes (DB_MODE=async).
+
+    Looks the user up through an async session so the request never
+    leaves the event loop. The session is its own, read-only one: sharing
+    the route's session would open its transaction, and in a write route
+    take SQLite's write lock, before the route even starts.
+    """
+    user_id = _user_id_from_token(token)
+    cached = principal_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    with read_only():
+        async with async_db_session() as session:
+            user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(
+            status_code=404,
+            detail="User not found"
+        )
+    user = _snapshot(user)
+    principal_cache.set(user_id, user)
+    return user
+
+
+@lru_cache(maxsize=None)
 def require_role(role: str):
     """
     Dependency generator used to restrict access based on user role.
@@ -73,8 +181,12 @@ def require_role(role: str):
     - Calls get_current_user() to get the authenticated user.
     - Checks if user's role matches the required role.
     - Raises 403 if the user is not allowed.
+
+    One dependency is built per role, so FastAPI can de-duplicate it within a
+    request, and the check itself runs on the event loop instead of taking
+    another threadpool hop.
     """
-    def inner(user: User = Depends(get_current_user)):
+    async def inner(user: User = Depends(get_current_user)):
         # Compare required role with user's actual role
         if user.role != role:
             raise HTTPException(
@@ -0,0 +1,138 @@
+# app/directory.py
+"""
+Doctor directory listing shared by the sync and async doctor routers.
+
+One query lists doctors with their clinic name (outer join), filtered by
+specialty, clinic and name prefix, and keyset-paginated on (name, id).
+Each filter combination has a matching (filter, name, id) index, so a
+page is an index range scan whatever the size of the directory. The name
+prefix is a case-sensitive range condition (name >= 'Sm' AND name < 'Sn')
+so that it can use the index, which LIKE cannot do portably.
+
+Conditional requests: every page is served with an ETag derived from its
+content, and the ETag is remembered per query for DOCTOR_ETAG_TTL_SECONDS.
+A re-fetch whose If-None-Match matches the remembered ETag gets 304 Not
+Modified without touching the database. Inserts, updates and deletes of
+doctors or clinics through the ORM in this process clear the remembered
+ETags at once; changes made by other worker processes are picked up when
+the TTL runs out.
+
+Pages themselves are cached by app/read_cache.py, so a request without a
+matching ETag is still answered without a query while the directory is
+unchanged. With a shared (redis) read cache the remembered ETags are not
+used: they would keep answering 304 after another worker's change, which
+the shared versions exist to prevent. The cached page is looked up
+instead, and tag_page() answers 304 if its ETag still matches.
+"""
+import hashlib
+import os
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlmodel import select
+
+from app import read_cache
+from app.cache import TTLCache
+from app.models import Clinic, Doctor
+from app.schemas import DoctorOut
+from app.serialization import RowSerializer
+
+DOCTOR_ETAG_TTL_SECONDS = float(os.getenv("DOCTOR_ETAG_TTL_SECONDS", "30"))
+
+KEY_COLUMNS = [Doctor.name, Doctor.id]
+
+etag_cache = TTLCache(maxsize=4096, ttl=DOCTOR_ETAG_TTL_SECONDS)
+
+DOCTOR_ROWS = RowSerializer(DoctorOut)  # doctor_query() selects its columns in DoctorOut's order
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """Smallest string greater than every string that starts with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def doctor_query(specialty: Optional[str] = None, clinic_id: Optional[int] = None,
+                 name_prefix: Optional[str] = None):
+    """Doctors with their clinic name, filtered; order and limit are left to paginate()."""
+    stmt = (
+        select(Doctor.id, Doctor.name, Doctor.specialty, Clinic.name.label("clinic"))
+        .outerjoin(Clinic, Doctor.clinic_id == Clinic.id)
+    )
+    if specialty:
+        stmt = stmt.where(Doctor.specialty == specialty)
+    if clinic_id is not None:
+        stmt = stmt.where(Doctor.clinic_id == clinic_id)
+    if name_prefix:
+        stmt = stmt.where(Doctor.name >= name_prefix, Doctor.name < _prefix_upper_bound(name_prefix))
+    return stmt
+
+
+# ---------------------------------------------------------------------
+# CONDITIONAL REQUESTS
+# ---------------------------------------------------------------------
+
+def _matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+def _not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def not_modified(request: Request, key) -> Optional[Response]:
+    """A 304 response if the client already holds the current page for `key`."""
+    if read_cache.backend is not None and read_cache.backend.remote:
+        return None
+    etag = etag_cache.get(key)
+    if etag is not None and _matches(request, etag):
+        return _not_modified_response(etag)
+    return None
+
+
+def tag_page(request: Request, response: Response, key, body: bytes, next_cursor: Optional[str]) -> Optional[Response]:
+    """
+    Set the ETag of a freshly built page and remember it for `key`.
+
+    Args:
+        body (bytes): The encoded page (DOCTOR_ROWS.dump()).
+
+    Returns:
+        Optional[Response]: 304 if the client's copy turns out to be current.
+    """
+    digest = hashlib.sha1(body)
+    digest.update((next_cursor or "").encode())
+    etag = '"' + digest.hexdigest() + '"'
+    etag_cache.set(key, etag)
+    if _matches(request, etag):
+        return _not_modified_response(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"  # cache, but revalidate every time
+    return None
+
+
+# ---------------------------------------------------------------------
+# READ CACHE
+# ---------------------------------------------------------------------
+# Pages are kept in app/read_cache.py under the "doctors" namespace as one
+# value: the next cursor (URL-safe base64, so no newline), a newline, and
+# the encoded body.
+
+def pack_page(body: bytes, next_cursor: Optional[str]) -> bytes:
+    return (next_cursor or "").encode() + b"\n" + body
+
+
+def unpack_page(value: bytes):
+    """(body, next_cursor) of a value made by pack_page()."""
+    cursor, body = value.split(b"\n", 1)
+    return body, cursor.decode() or None
+
+
+def _directory_changed(mapper, connection, target):
+    etag_cache.clear()
+
+
+for _model in (Doctor, Clinic):
+    for _event in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event, _directory_changed)
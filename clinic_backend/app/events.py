@@ -0,0 +1,57 @@
+# app/events.py
+"""
+In-process domain events.
+
+Routes publish an event after their transaction commits; in-memory
+structures (search indexes, caches, streams) subscribe to keep themselves
+up to date without the routes knowing about them.
+
+Handlers run synchronously in the publishing thread (or on the event loop
+for async routes), so they must be quick and must not do database I/O;
+mark state dirty and refresh it lazily instead. A failing handler is
+logged and never fails the request that published the event.
+
+Events and their keyword payloads:
+    APPOINTMENT_BOOKED     appointment_id, patient_id, doctor_id, date, time
+    APPOINTMENT_CANCELLED  appointment_id, patient_id, doctor_id, date, time
+    AVAILABILITY_ADDED     doctor_id, dates
+    AVAILABILITY_CHANGED   doctor_id, date_from, date_to (None: open-ended)
+    DOCTOR_CREATED         doctor_id, name, specialty, clinic_id
+"""
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+APPOINTMENT_BOOKED = "appointment.booked"
+APPOINTMENT_CANCELLED = "appointment.cancelled"
+AVAILABILITY_ADDED = "availability.added"
+AVAILABILITY_CHANGED = "availability.changed"
+DOCTOR_CREATED = "doctor.created"
+
+_subscribers = defaultdict(list)
+
+
+def subscribe(event: str, handler=None):
+    """
+    Register a handler for an event. Usable directly or as a decorator:
+
+        @subscribe(APPOINTMENT_BOOKED)
+        def on_booked(**payload): ...
+    """
+    if handler is None:
+        def decorator(fn):
+            _subscribers[event].append(fn)
+            return fn
+        return decorator
+    _subscribers[event].append(handler)
+    return handler
+
+
+def publish(event: str, **payload):
+    """Call every handler subscribed to `event` with the payload."""
+    for handler in list(_subscribers.get(event, ())):
+        try:
+            handler(**payload)
+        except Exception:
+            logger.exception("handler %r failed for %s", handler, event)
@@ -0,0 +1,152 @@
+# app/hashing.py
+"""
+Password hashing off the request path.
+
+bcrypt is deliberately slow and CPU-bound. Running it inline in
+/auth/register and /auth/login lets a login storm occupy FastAPI's shared
+threadpool and every CPU, which stalls unrelated endpoints. Here the work
+goes to a dedicated process pool of PASSWORD_HASH_WORKERS processes, and
+at most PASSWORD_HASH_QUEUE_LIMIT further jobs may wait for it. Anything
+beyond that is rejected immediately with HashingBusy, which main.py turns
+into 503 + Retry-After.
+
+Because admission is bounded, sync routes that block on a result can tie
+up at most WORKERS + QUEUE_LIMIT threadpool threads; keep that sum well
+below the threadpool size (40 by default).
+"""
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from app import utils
+
+# Defaults to half the CPUs so request handling keeps the rest.
+# 0 runs hashing inline in the calling thread (still subject to admission).
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "16"))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool and its queue are full."""
+
+    def __init__(self, retry_after: int = PASSWORD_HASH_RETRY_AFTER):
+        super().__init__("password hashing is saturated")
+        self.retry_after = retry_after
+
+
+# ---------------------------------------------------------------------
+# WORKER-SIDE FUNCTIONS (must be importable top-level for pickling)
+# ---------------------------------------------------------------------
+
+def _hash_job(password: str) -> str:
+    return utils.hash_password(password)
+
+
+def _verify_job(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    # verify_and_update also returns a fresh hash when the stored one was
+    # made with a different bcrypt cost than BCRYPT_ROUNDS.
+    return utils.pwd_ctx.verify_and_update(password, hashed)
+
+
+# ---------------------------------------------------------------------
+# POOL AND ADMISSION
+# ---------------------------------------------------------------------
+
+_capacity = max(1, PASSWORD_HASH_WORKERS) + PASSWORD_HASH_QUEUE_LIMIT
+_in_flight = 0
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # "spawn" avoids forking a process that is already running
+            # threadpool and event-loop threads.
+            _pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown():
+    """Stop the worker processes (called at exit and from app shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown)
+
+
+def in_flight() -> int:
+    """Number of hashing jobs currently running or queued."""
+    return _in_flight
+
+
+def _release(_future=None):
+    global _in_flight
+    with _pool_lock:
+        _in_flight -= 1
+
+
+def _submit(fn, *args) -> Future:
+    """Admit one job or raise HashingBusy; the slot is freed when the job finishes."""
+    global _in_flight
+    with _pool_lock:
+        if _in_flight >= _capacity:
+            raise HashingBusy()
+        _in_flight += 1
+    try:
+        if PASSWORD_HASH_WORKERS > 0:
+            future = _get_pool().submit(fn, *args)
+        else:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except BaseException as exc:
+                future.set_exception(exc)
+    except BaseException:
+        _release()
+        raise
+    future.add_done_callback(_release)
+    return future
+
+
+# ---------------------------------------------------------------------
+# PUBLIC API
+# ---------------------------------------------------------------------
+
+def hash_password(password: str) -> str:
+    """Hash a password in the pool, blocking the calling thread until done."""
+    return _submit(_hash_job, password).result()
+
+
+def verify_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password in the pool, blocking the calling thread until done.
+
+    Returns:
+        (ok, new_hash): new_hash is set when the stored hash should be
+        replaced because the configured bcrypt cost changed.
+    """
+    return _submit(_verify_job, password, hashed).result()
+
+
+async def hash_password_async(password: str) -> str:
+    """Event-loop friendly hash_password()."""
+    return await asyncio.wrap_future(_submit(_hash_job, password))
+
+
+async def verify_password_async(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Event-loop friendly verify_password()."""
+    return await asyncio.wrap_future(_submit(_verify_job, password, hashed))
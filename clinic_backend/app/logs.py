@@ -0,0 +1,243 @@
+# app/logs.py
+"""
+Structured, non-blocking logging.
+
+setup_logging() installs one handler on the root logger. Request threads
+and the event loop only put records on a bounded queue; a background
+thread (logging.handlers.QueueListener) formats them and writes them to
+stderr, so a slow terminal or log collector never stalls a request. When
+the queue is full, new records are dropped and counted
+(clinic_log_records_dropped_total on /metrics) instead of blocking.
+LOG_QUEUE_SIZE=0 writes synchronously from the caller, as plain logging
+does.
+
+Before a record is queued, in the thread that logged it:
+- it gets the request ID of the current request (`request_id`, set by
+  RequestIdMiddleware from the X-Request-ID header or generated, and sent
+  back in the response), so every line of one request can be found;
+- its message is rendered and redacted: bearer tokens, JWTs, bcrypt
+  hashes and `password=...`-style values become [REDACTED], as do extra
+  fields whose name looks secret (password, token, secret, ...).
+
+Output is one JSON object per line (LOG_FORMAT=json, the default) or a
+plain text line (LOG_FORMAT=text). LOG_LEVEL sets the root level and
+LOG_LEVELS per-logger levels, e.g. "app.outbox=DEBUG,app.metrics=ERROR".
+The app's lifespan calls setup_logging() and shutdown_logging(); command
+line tools may call them too.
+"""
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import time
+import uuid
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+REQUEST_ID_HEADER = b"x-request-id"
+REDACTED = "[REDACTED]"
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+logger = logging.getLogger(__name__)
+request_logger = logging.getLogger("app.requests")
+
+
+# ---------------------------------------------------------------------
+# REDACTION
+# ---------------------------------------------------------------------
+
+SECRET_FIELD = re.compile(r"pass(word|wd)?|token|secret|authorization|api_?key|hash", re.IGNORECASE)
+SECRET_PATTERNS = [
+    (re.compile(r"(?i)\b(bearer)\s+[A-Za-z0-9._~+/=-]+"), r"\1 " + REDACTED),
+    (re.compile(r"\beyJ[A-Za-z0-9_-]*\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*"), REDACTED),  # JWT
+    (re.compile(r"\$2[abxy]?\$\d{2}\$[./A-Za-z0-9]{53}"), REDACTED),  # bcrypt hash
+    (re.compile(r"(?i)\b(password|passwd|secret|token|api_?key)(\"?\s*[:=]\s*\"?)[^\s\",&}]+"), r"\1\2" + REDACTED),
+]
+
+# Attributes every LogRecord has; anything else was passed with extra=.
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+def redact(text: str) -> str:
+    """`text` with anything that looks like a credential replaced by [REDACTED]."""
+    for pattern, replacement in SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class ContextFilter(logging.Filter):
+    """Adds the request ID to a record and redacts its message and extra fields."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        try:
+            message = record.getMessage()
+        except Exception:  # bad format arguments; let the handler report it
+            return True
+        record.msg = redact(message)
+        record.args = None
+        for key, value in list(vars(record).items()):
+            if key in _RECORD_FIELDS:
+                continue
+            if SECRET_FIELD.search(key):
+                setattr(record, key, REDACTED)
+            elif isinstance(value, str):
+                setattr(record, key, redact(value))
+        return True
+
+
+# ---------------------------------------------------------------------
+# FORMATTERS
+# ---------------------------------------------------------------------
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, request ID, message and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+            .isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage(),
+        }
+        entry.update((k, v) for k, v in vars(record).items() if k not in _RECORD_FIELDS)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = redact(record.exc_text)
+        return json.dumps(entry, default=str)
+
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+
+# ---------------------------------------------------------------------
+# HANDLERS
+# ---------------------------------------------------------------------
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The message is already rendered and redacted by ContextFilter. Keep
+        # exc_info out of the queue (tracebacks hold frames); render it here.
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+            from app import metrics
+
+            metrics.LOG_RECORDS_DROPPED.inc()
+
+
+_handler: Optional[logging.Handler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _levels(spec: str):
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        yield name.strip(), level.strip().upper()
+
+
+def setup_logging(stream=None):
+    """
+    Install the handler described above on the root logger and apply the
+    configured levels. Does nothing if it is already installed. Queued
+    records are written out at interpreter exit if shutdown_logging() was
+    not called.
+    """
+    global _handler, _listener
+    if _handler is not None:
+        return
+    writer = logging.StreamHandler(stream or sys.stderr)
+    writer.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    if LOG_QUEUE_SIZE > 0:
+        _handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _listener = logging.handlers.QueueListener(_handler.queue, writer)
+        _listener.start()
+        atexit.register(shutdown_logging)
+    else:
+        _handler = writer
+    _handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    for name, level in _levels(LOG_LEVELS):
+        logging.getLogger(name).setLevel(level)
+
+
+def shutdown_logging():
+    """Write out every queued record, stop the writer thread and remove the handler."""
+    global _handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+
+
+# ---------------------------------------------------------------------
+# REQUEST ID
+# ---------------------------------------------------------------------
+
+_VALID_REQUEST_ID = re.compile(rb"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware that sets `request_id` for the request and returns it
+    in the X-Request-ID response header. A well-formed incoming X-Request-ID
+    (from a proxy or client) is reused; otherwise a new one is generated.
+    Logs one line per request on "app.requests" at DEBUG.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER, b"")
+        rid = incoming.decode() if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, rid.encode())]
+            await send(message)
+
+        token = request_id.set(rid)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if request_logger.isEnabledFor(logging.DEBUG):
+                request_logger.debug("%s %s %d %.1f ms", scope["method"], scope["path"], status,
+                                     (time.perf_counter() - started) * 1000)
+            request_id.reset(token)
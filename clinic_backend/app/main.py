@@ -1,8 +1,19 @@
-from fastapi import FastAPI
+import contextlib
+import secrets
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import HTTPBearer
 from fastapi.openapi.utils import get_openapi
 
-from app.database import create_db_and_tables
+from app.database import DB_INIT_SCHEMA, DB_MODE, ReadOnlyRoutingMiddleware, create_db_and_tables, dispose_engines, ping
+from app.hashing import HashingBusy
+from app.reservations import BookingOverloaded
+from app.streams import StreamsFull
+from app import hashing, metrics, reminders
+from app.logs import RequestIdMiddleware, setup_logging, shutdown_logging
+from app.openapi import load_schema
+from app.serialization import JSONResponse as DefaultJSONResponse
 from app.routers import (
     auth_router,
     users_router,
@@ -21,6 +32,37 @@ from app.routers import (
 # allowing JWT tokens to be attached to authenticated requests.
 bearer_scheme = HTTPBearer()
 
+# ---------------------------------------------------------------------
+# STARTUP AND SHUTDOWN
+# ---------------------------------------------------------------------
+# Importing this module only builds the app; nothing touches the database
+# until the server starts it. Each worker process runs the lifespan once.
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup: install the log handler (app/logs.py), then create missing
+    tables and apply pending migrations, unless DB_INIT_SCHEMA=0 (for
+    workers of a deployment that migrates once, with
+    `python -m app.migrations` or app/serve.py, before starting them).
+    Then start the reminder scheduler (app/reminders.py). GET /readyz
+    answers 503 until this is done.
+
+    Shutdown: stop the reminder scheduler and the password hashing
+    processes, close the database connection pools and write out the
+    queued log records.
+    """
+    setup_logging()
+    if DB_INIT_SCHEMA:
+        create_db_and_tables()
+    reminders.start()
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    reminders.stop()
+    hashing.shutdown()
+    await dispose_engines()
+    shutdown_logging()
+
 # ---------------------------------------------------------------------
 # FASTAPI APPLICATION INSTANCE
 # ---------------------------------------------------------------------
@@ -28,7 +70,9 @@ app = FastAPI(
     title="Clinic API",
     description="API for clinic management system",
     version="1.0",
-    swagger_ui_init_oauth=None  # Prevents OAuth popup in Swagger UI
+    swagger_ui_init_oauth=None,  # Prevents OAuth popup in Swagger UI
+    lifespan=lifespan,
+    default_response_class=DefaultJSONResponse,  # orjson when installed (app/serialization.py)
 )
 
 # ---------------------------------------------------------------------
@@ -40,10 +84,18 @@ def custom_openapi():
     - Add a Bearer token security scheme for JWT authentication.
     - Apply this scheme globally to all routes.
     - Ensure Swagger UI shows a single token input field.
+
+    With OPENAPI_SCHEMA_PATH set, the document precomputed at build time
+    (app/openapi.py) is served instead of being generated.
     """
     if app.openapi_schema:
         return app.openapi_schema
 
+    precomputed = load_schema()
+    if precomputed is not None:
+        app.openapi_schema = precomputed
+        return app.openapi_schema
+
     # Generate default OpenAPI schema
     openapi_schema = get_openapi(
         title="Clinic API",
@@ -71,17 +123,98 @@ def custom_openapi():
 app.openapi = custom_openapi
 
 # ---------------------------------------------------------------------
-# DATABASE INITIALIZATION
+# ERROR HANDLERS
 # ---------------------------------------------------------------------
-# Creates all database tables when the app starts.
-# Only runs once per startup.
-create_db_and_tables()
+@app.exception_handler(HashingBusy)
+async def hashing_busy_handler(request: Request, exc: HashingBusy):
+    """
+    The password hashing pool is saturated (login/register storm).
+    Shed the request quickly instead of letting it queue.
+    """
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication is busy, please retry"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(BookingOverloaded)
+async def booking_overloaded_handler(request: Request, exc: BookingOverloaded):
+    """
+    The doctor's booking queue is full (app/reservations.py). Shed the
+    request with a hint of when the queue will have drained.
+    """
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many bookings for this doctor right now, please retry"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(StreamsFull)
+async def streams_full_handler(request: Request, exc: StreamsFull):
+    """
+    This process holds STREAM_MAX_SUBSCRIBERS event streams already
+    (app/streams.py); the client should reconnect later, or poll.
+    """
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many open event streams, please retry"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# ---------------------------------------------------------------------
+# MIDDLEWARE
+# ---------------------------------------------------------------------
+# GET and HEAD requests open their sessions on the read-only engine
+# (DATABASE_READ_URL); every other method uses the primary.
+app.add_middleware(ReadOnlyRoutingMiddleware)
+
+# Per-route latency, in-flight requests, response sizes and SQL statements
+# per request (app/metrics.py), served on /metrics. Added after the routing
+# middleware, so it times everything below it.
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# X-Request-ID for every request and in every log record it produces
+# (app/logs.py). Outermost, so the metrics middleware's logs carry it too.
+app.add_middleware(RequestIdMiddleware)
 
 # ---------------------------------------------------------------------
 # ROUTER REGISTRATION
 # ---------------------------------------------------------------------
 # Attach individual feature modules to the main application.
 # Each router handles a specific part of the system.
+
+# In async mode the async implementations of the hot routes are registered
+# first, and the sync routes they replace (same path and methods) are then
+# left out; every other route keeps its sync version.
+def drop_replaced_routes(app: FastAPI):
+    """Keep only the first route registered for each path and set of methods."""
+    seen = set()
+    kept = []
+    for route in app.router.routes:
+        methods = getattr(route, "methods", None)
+        if methods:
+            key = (route.path, frozenset(methods))
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(route)
+    app.router.routes[:] = kept
+
+
+if DB_MODE == "async":
+    from app.routers import (
+        async_auth_router,
+        async_doctors_router,
+        async_availability_router,
+        async_appointments_router,
+    )
+
+    app.include_router(async_auth_router.router, prefix="/auth")
+    app.include_router(async_doctors_router.router, prefix="/doctors")
+    app.include_router(async_availability_router.router, prefix="/availability")
+    app.include_router(async_appointments_router.router, prefix="/appointments")
+
 app.include_router(auth_router.router, prefix="/auth")
 app.include_router(users_router.router)  # No prefix, already defined in router
 app.include_router(doctors_router.router, prefix="/doctors")
@@ -90,6 +223,9 @@ app.include_router(appointments_router.router, prefix="/appointments")
 app.include_router(notifications_router.router, prefix="/notifications")
 app.include_router(admin_router.router, prefix="/admin")
 
+if DB_MODE == "async":
+    drop_replaced_routes(app)
+
 # ---------------------------------------------------------------------
 # ROOT ENDPOINT
 # ---------------------------------------------------------------------
@@ -99,3 +235,48 @@ def root():
     Basic health check endpoint to confirm the API is running.
     """
     return {"status": "ok", "message": "Clinic Booking API is running!"}
+
+# ---------------------------------------------------------------------
+# HEALTH PROBES
+# ---------------------------------------------------------------------
+# For load balancers and orchestrators (see app/serve.py). Kept out of the
+# OpenAPI schema, like /metrics.
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """
+    Liveness: the worker's event loop answers. Checks nothing else, so a
+    slow or unreachable database never gets healthy workers restarted.
+    """
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+def readyz(request: Request):
+    """
+    Readiness: the lifespan startup has finished and the database answers
+    SELECT 1. Anything else is 503, and the worker should get no traffic.
+    Runs on the threadpool, so a worker whose threads are all busy is
+    reported as not ready too (the probe times out).
+    """
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    try:
+        ping()
+    except Exception as exc:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "detail": type(exc).__name__})
+    return {"status": "ready"}
+
+
+# ---------------------------------------------------------------------
+# METRICS ENDPOINT
+# ---------------------------------------------------------------------
+if metrics.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics(request: Request):
+        """
+        Metrics of this process in the Prometheus text format. Requires
+        "Authorization: Bearer <METRICS_TOKEN>" when METRICS_TOKEN is set.
+        """
+        expected = f"Bearer {metrics.METRICS_TOKEN}"
+        if metrics.METRICS_TOKEN and not secrets.compare_digest(request.headers.get("Authorization", ""), expected):
+            return PlainTextResponse("Unauthorized\n", status_code=401)
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
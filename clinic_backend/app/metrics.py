@@ -0,0 +1,279 @@
+# app/metrics.py
+"""
+Request metrics, exposed in the Prometheus text format on /metrics.
+
+MetricsMiddleware records for every HTTP request, labelled by method and
+route template ("/doctors/doctors/{doctor_id}", never the raw path, so the
+number of series stays bounded):
+- a latency histogram and a request counter by status;
+- the number of requests in flight;
+- a response size histogram (body bytes, streamed responses included);
+- the SQL statements the request executed and the time spent in them,
+  counted by the engine event hooks in app/database.py.
+
+A request that executes more than METRICS_N_PLUS_ONE_THRESHOLD statements
+is flagged: it is counted in clinic_db_n_plus_one_requests_total and
+logged, since that is the usual signature of a query issued per row.
+
+The metric types are implemented here rather than with prometheus_client,
+which the app does not depend on; each is a dict of label values to
+numbers behind one lock. Values are per process: with several server
+workers, Prometheus scrapes and sums each of them.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from app.database import count_queries
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_N_PLUS_ONE_THRESHOLD = int(os.getenv("METRICS_N_PLUS_ONE_THRESHOLD", "20"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+QUEUE_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+UNMATCHED = "<unmatched>"  # route label of requests no route matched (404s)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+registry: List["_Metric"] = []
+
+
+# ---------------------------------------------------------------------
+# METRIC TYPES
+# ---------------------------------------------------------------------
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def add(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Histogram(_Metric):
+    """
+    Histogram with fixed upper bounds.
+
+    Per label set it keeps one count per bucket (plus +Inf), the sum and
+    the count; cumulative bucket counts are computed when rendering.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        i = bisect.bisect_left(self.buckets, value)  # first bound >= value
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((labels, ([*counts], total, count)) for labels, (counts, total, count) in self._values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def render() -> str:
+    """Every metric in the registry, in the Prometheus text format."""
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------
+# REQUEST METRICS
+# ---------------------------------------------------------------------
+
+REQUESTS = Counter("clinic_http_requests_total", "HTTP requests handled.", ["method", "route", "status"])
+LATENCY = Histogram("clinic_http_request_duration_seconds", "Time from request to the last byte of the response.",
+                    ["method", "route"], LATENCY_BUCKETS)
+IN_FLIGHT = Gauge("clinic_http_requests_in_flight", "HTTP requests being handled.", ["method"])
+RESPONSE_SIZE = Histogram("clinic_http_response_size_bytes", "Response body size.",
+                          ["method", "route"], SIZE_BUCKETS)
+DB_STATEMENTS = Histogram("clinic_db_statements_per_request", "SQL statements executed per request.",
+                          ["method", "route"], STATEMENT_BUCKETS)
+DB_TIME = Histogram("clinic_db_time_per_request_seconds", "Time spent executing SQL per request.",
+                    ["method", "route"], LATENCY_BUCKETS)
+N_PLUS_ONE = Counter("clinic_db_n_plus_one_requests_total",
+                     "Requests that executed more than METRICS_N_PLUS_ONE_THRESHOLD SQL statements.",
+                     ["method", "route"])
+LOG_RECORDS_DROPPED = Counter("clinic_log_records_dropped_total",
+                              "Log records dropped because the log queue was full (see app/logs.py).")
+
+
+def route_label(scope) -> str:
+    """Path template of the route that handled the request."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED
+
+
+class MetricsMiddleware:
+    """ASGI middleware that records the request metrics above."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500  # unless the app starts a response
+        size = 0
+        finished = None
+
+        async def send_wrapper(message):
+            nonlocal status, size, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished = time.perf_counter()
+            await send(message)
+
+        IN_FLIGHT.add(method)
+        started = time.perf_counter()
+        try:
+            with count_queries() as queries:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            # Background tasks run after the last body message; they count
+            # towards the request's SQL statements but not its latency.
+            elapsed = (finished or time.perf_counter()) - started
+            IN_FLIGHT.add(method, amount=-1)
+            route = route_label(scope)
+            REQUESTS.inc(method, route, str(status))
+            LATENCY.observe(elapsed, method, route)
+            RESPONSE_SIZE.observe(size, method, route)
+            DB_STATEMENTS.observe(queries.statements, method, route)
+            DB_TIME.observe(queries.seconds, method, route)
+            if queries.statements > METRICS_N_PLUS_ONE_THRESHOLD:
+                N_PLUS_ONE.inc(method, route)
+                logger.warning("%s %s executed %d SQL statements (threshold %d)",
+                               method, route, queries.statements, METRICS_N_PLUS_ONE_THRESHOLD)
+
+
+# ---------------------------------------------------------------------
+# BOOKING ADMISSION
+# ---------------------------------------------------------------------
+# Updated by app/reservations.py.
+
+BOOKING_QUEUE_DEPTH = Gauge("clinic_booking_queue_depth", "Bookings waiting in a per-doctor admission queue.")
+BOOKING_QUEUE_DEPTH_SEEN = Histogram("clinic_booking_queue_position_on_arrival",
+                                     "Place a booking took in its doctor's queue (0: admitted at once).",
+                                     [], QUEUE_BUCKETS)
+BOOKING_QUEUE_WAIT = Histogram("clinic_booking_queue_wait_seconds", "Time a booking waited for admission.",
+                               [], LATENCY_BUCKETS)
+BOOKING_ACTIVE = Gauge("clinic_booking_in_progress", "Admitted bookings being processed.")
+BOOKING_REJECTED = Counter("clinic_booking_rejected_total",
+                           "Bookings turned away before their transaction, by reason "
+                           "(known_taken, slot_busy, queue_full, waiting_limit, queue_timeout).", ["reason"])
+
+
+# ---------------------------------------------------------------------
+# EVENT STREAMS
+# ---------------------------------------------------------------------
+# Updated by app/streams.py.
+
+STREAM_SUBSCRIBERS = Gauge("clinic_stream_subscribers", "Open slot-change event streams.")
+STREAM_EVENTS_PUBLISHED = Counter("clinic_stream_events_published_total",
+                                  "Events sent to the streams of a doctor with subscribers.", ["event"])
+STREAM_EVENTS_DROPPED = Counter("clinic_stream_events_dropped_total",
+                                "Events dropped from full subscriber buffers (oldest first).")
+STREAM_REJECTED = Counter("clinic_stream_rejected_total",
+                          "Streams refused because STREAM_MAX_SUBSCRIBERS were open.")
+
+
+# ---------------------------------------------------------------------
+# READ CACHE
+# ---------------------------------------------------------------------
+# Updated by app/read_cache.py.
+
+READ_CACHE_REQUESTS = Counter("clinic_read_cache_requests_total",
+                              "Read cache lookups by namespace kind and result (hit, miss).",
+                              ["namespace", "result"])
+READ_CACHE_ERRORS = Counter("clinic_read_cache_errors_total",
+                            "Read cache operations that failed and were skipped.")
+
+
+# ---------------------------------------------------------------------
+# REMINDERS
+# ---------------------------------------------------------------------
+# Updated by app/reminders.py.
+
+REMINDERS_LOADED = Counter("clinic_reminders_loaded_total",
+                           "Reminders loaded into the scheduler by window range queries.")
+REMINDERS_WRITTEN = Counter("clinic_reminders_written_total", "Due reminders written to the notification outbox.")
+REMINDERS_SKIPPED = Counter("clinic_reminders_skipped_total",
+                            "Due reminders not written, by reason (cancelled, stale_or_written).", ["reason"])
@@ -0,0 +1,236 @@
+# app/migrations.py
+"""
+Versioned schema migrations.
+
+SQLModel.metadata.create_all() only creates tables that do not exist yet,
+so an existing clinic.db never picks up new indexes, constraints or
+columns. Each Migration below is applied once, in version order, inside
+its own transaction, and recorded in the `schema_migration` table.
+
+Operations are written to be idempotent (they check the live schema
+first), so running them on a database that create_all() has just built
+from the current models is a no-op apart from recording the version.
+
+Usage:
+    python -m app.migrations            # apply pending migrations
+    python -m app.migrations status     # list applied / pending versions
+"""
+import datetime
+import logging
+import sys
+from dataclasses import dataclass
+from typing import Callable, List
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlmodel import SQLModel
+
+import app.models  # noqa: F401  (registers every table on SQLModel.metadata)
+
+# Bookkeeping table, kept on its own MetaData so create_all() for the
+# application models never touches it.
+_version_metadata = MetaData()
+schema_migration = Table(
+    "schema_migration",
+    _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    operations: List[Callable]
+
+
+# ---------------------------------------------------------------------
+# OPERATIONS
+# ---------------------------------------------------------------------
+
+def _declared_index(table_name: str, index_name: str):
+    table = SQLModel.metadata.tables[table_name]
+    for index in table.indexes:
+        if index.name == index_name:
+            return index
+    raise KeyError(f"{table_name} declares no index named {index_name}")
+
+
+def create_index(table_name: str, index_name: str):
+    """Create an index declared on the models if it is missing."""
+    def op(conn):
+        _declared_index(table_name, index_name).create(bind=conn, checkfirst=True)
+    op.__doc__ = f"create index {index_name} on {table_name}"
+    return op
+
+
+def add_column(table_name: str, column_name: str):
+    """Add a column declared on the models if it is missing."""
+    def op(conn):
+        existing = {c["name"] for c in inspect(conn).get_columns(table_name)}
+        if column_name in existing:
+            return
+        column = SQLModel.metadata.tables[table_name].c[column_name]
+        ddl_type = column.type.compile(dialect=conn.dialect)
+        sql = f'ALTER TABLE "{table_name}" ADD COLUMN "{column_name}" {ddl_type}'
+        default = column.server_default
+        if default is not None:
+            sql += f" DEFAULT {default.arg}"
+        conn.exec_driver_sql(sql)
+    op.__doc__ = f"add column {table_name}.{column_name}"
+    return op
+
+
+def cancel_duplicate_bookings():
+    """
+    Cancel all but the oldest booked appointment of each (doctor, date, time).
+
+    uq_appointment_active_slot cannot be built while a slot holds two
+    booked rows, and older databases had no constraint to prevent them.
+    The lowest id (the first booking) keeps the slot; the cancelled IDs
+    are logged so that the patients can be contacted.
+    """
+    def op(conn):
+        # Plain SQL: on an old database the model's later columns do not exist yet.
+        duplicates = conn.execute(text(
+            "SELECT a.id FROM appointment a WHERE a.status = 'booked' AND EXISTS ("
+            " SELECT 1 FROM appointment b WHERE b.status = 'booked' AND b.doctor_id = a.doctor_id"
+            " AND b.date = a.date AND b.time = a.time AND b.id < a.id)"
+        )).scalars().all()
+        if not duplicates:
+            return
+        conn.execute(text("UPDATE appointment SET status = 'cancelled' WHERE id IN (%s)"
+                          % ",".join(str(int(i)) for i in duplicates)))
+        logger.warning("cancelled %d duplicate booking(s) of an already booked slot: appointment ids %s",
+                       len(duplicates), duplicates)
+    op.__doc__ = "cancel duplicate bookings of the same slot"
+    return op
+
+
+def backfill_appointment_stats():
+    """Rebuild the appointment statistics rollup from existing rows."""
+    def op(conn):
+        from app.stats import rebuild
+        rebuild(conn)
+    op.__doc__ = "backfill appointmentdailystat and doctordailystat"
+    return op
+
+
+def create_table(table_name: str):
+    """Create a table declared on the models (and its indexes) if it is missing."""
+    def op(conn):
+        SQLModel.metadata.tables[table_name].create(bind=conn, checkfirst=True)
+    op.__doc__ = f"create table {table_name}"
+    return op
+
+
+# ---------------------------------------------------------------------
+# MIGRATIONS (append only; never renumber)
+# ---------------------------------------------------------------------
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "active slot unique index", [
+        cancel_duplicate_bookings(),
+        create_index("appointment", "uq_appointment_active_slot"),
+    ]),
+    Migration(2, "lookup indexes", [
+        create_index("user", "ix_user_email"),
+        create_index("appointment", "ix_appointment_doctor_slot_status"),
+        create_index("appointment", "ix_appointment_patient_id"),
+        create_index("availability", "ix_availability_doctor_date"),
+        create_index("notification", "ix_notification_sent"),
+    ]),
+    Migration(3, "appointment statistics rollup", [
+        create_table("appointmentdailystat"),
+        create_table("doctordailystat"),
+        backfill_appointment_stats(),
+    ]),
+    Migration(4, "doctor directory indexes", [
+        create_index("doctor", "ix_doctor_name_id"),
+        create_index("doctor", "ix_doctor_specialty_name_id"),
+        create_index("doctor", "ix_doctor_clinic_name_id"),
+    ]),
+    Migration(5, "notification outbox columns", [
+        add_column("notification", "claimed_by"),
+        add_column("notification", "claim_expires_at"),
+        add_column("notification", "attempts"),
+        add_column("notification", "next_attempt_at"),
+        add_column("notification", "last_error"),
+        add_column("notification", "sent_at"),
+    ]),
+    Migration(6, "recurring availability templates", [
+        create_table("availabilitytemplate"),
+        create_table("availabilityoverride"),
+    ]),
+    Migration(7, "appointment reminders", [
+        add_column("notification", "kind"),
+        add_column("notification", "remind_at"),
+        create_index("notification", "uq_notification_reminder"),
+        create_index("appointment", "ix_appointment_booked_start"),
+    ]),
+    Migration(8, "appointment version", [
+        add_column("appointment", "version"),
+    ]),
+]
+
+
+# ---------------------------------------------------------------------
+# RUNNER
+# ---------------------------------------------------------------------
+
+def applied_versions(engine) -> set:
+    _version_metadata.create_all(engine)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_migration.c.version)).scalars())
+
+
+def run_migrations(engine, migrations: List[Migration] = None) -> List[int]:
+    """
+    Apply every pending migration in version order.
+
+    Each migration runs in its own transaction together with the row that
+    records it, so a failure leaves the database at the previous version.
+
+    Returns:
+        List[int]: Versions applied by this call.
+    """
+    migrations = sorted(migrations or MIGRATIONS, key=lambda m: m.version)
+    done = applied_versions(engine)
+    applied = []
+    for migration in migrations:
+        if migration.version in done:
+            continue
+        with engine.begin() as conn:
+            for op in migration.operations:
+                op(conn)
+            conn.execute(schema_migration.insert().values(
+                version=migration.version,
+                name=migration.name,
+                applied_at=datetime.datetime.utcnow(),
+            ))
+        applied.append(migration.version)
+    return applied
+
+
+def main(argv):
+    from app.database import engine
+
+    command = argv[0] if argv else "upgrade"
+    if command == "status":
+        done = applied_versions(engine)
+        for m in MIGRATIONS:
+            print(f"{m.version:>4}  {'applied' if m.version in done else 'pending':8} {m.name}")
+    elif command == "upgrade":
+        applied = run_migrations(engine)
+        print(f"applied {applied}" if applied else "database is up to date")
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
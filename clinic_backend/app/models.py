@@ -1,12 +1,13 @@
 # app/models.py
 from typing import Optional, List
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 import datetime
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
-    email: str
+    email: str = Field(index=True)  # looked up on every login/register
     password_hash: str
     role: str = Field(default="patient")  # patient, doctor, admin
 
@@ -21,6 +22,14 @@ class Clinic(SQLModel, table=True):
 
 
 class Doctor(SQLModel, table=True):
+    # Directory listing (app/directory.py): each filter is followed by the
+    # (name, id) sort key so a filtered page is one index range scan.
+    __table_args__ = (
+        Index("ix_doctor_name_id", "name", "id"),
+        Index("ix_doctor_specialty_name_id", "specialty", "name", "id"),
+        Index("ix_doctor_clinic_name_id", "clinic_id", "name", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     specialty: Optional[str] = None
@@ -31,6 +40,10 @@ class Doctor(SQLModel, table=True):
 
 
 class Availability(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_availability_doctor_date", "doctor_id", "date"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     doctor_id: int = Field(foreign_key="doctor.id")
     date: datetime.date
@@ -40,23 +53,118 @@ class Availability(SQLModel, table=True):
     doctor: Optional[Doctor] = Relationship(back_populates="availabilities")
 
 
+class AvailabilityTemplate(SQLModel, table=True):
+    # One weekly window ("Tuesdays 09:00-12:00") over an effective date range.
+    # Expanded into concrete windows on read (app/recurring.py) rather than
+    # stored as one Availability row per day.
+    __table_args__ = (
+        Index("ix_availabilitytemplate_doctor_weekday", "doctor_id", "weekday"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    doctor_id: int = Field(foreign_key="doctor.id")
+    weekday: int  # 0 = Monday ... 6 = Sunday
+    start_time: datetime.time
+    end_time: datetime.time
+    effective_from: datetime.date
+    effective_to: Optional[datetime.date] = None  # open-ended when null
+
+
+class AvailabilityOverride(SQLModel, table=True):
+    # Replaces a doctor's template windows on one date: the day's rows are its
+    # windows, and a single row without times closes the day.
+    __table_args__ = (
+        Index("ix_availabilityoverride_doctor_date", "doctor_id", "date"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    doctor_id: int = Field(foreign_key="doctor.id")
+    date: datetime.date
+    start_time: Optional[datetime.time] = None
+    end_time: Optional[datetime.time] = None
+
+
 class Appointment(SQLModel, table=True):
+    # Only one *active* booking may hold a doctor's slot. Cancelled and
+    # completed rows are excluded so a freed slot can be booked again.
+    __table_args__ = (
+        Index(
+            "uq_appointment_active_slot",
+            "doctor_id", "date", "time",
+            unique=True,
+            sqlite_where=text("status = 'booked'"),
+            postgresql_where=text("status = 'booked'"),
+        ),
+        # Booking conflict check filters on all four columns.
+        Index("ix_appointment_doctor_slot_status", "doctor_id", "date", "time", "status"),
+        # Booked appointments by start time: the reminder scheduler loads
+        # its window with one range scan (app/reminders.py).
+        Index(
+            "ix_appointment_booked_start",
+            "date", "time",
+            sqlite_where=text("status = 'booked'"),
+            postgresql_where=text("status = 'booked'"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    patient_id: int = Field(foreign_key="user.id")
+    patient_id: int = Field(foreign_key="user.id", index=True)  # /appointments/me
     doctor_id: int = Field(foreign_key="doctor.id")
     date: datetime.date
     time: datetime.time
     status: str = Field(default="booked")  # booked, cancelled, completed
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+    # Bumped by every change after booking; a reschedule that names the
+    # version it read fails if the row has changed since.
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
 
     patient: Optional[User] = Relationship(back_populates="appointments")
     doctor: Optional[Doctor] = Relationship(back_populates="appointments")
 
 
+class AppointmentDailyStat(SQLModel, table=True):
+    # Rollups of appointment counts per slot date and status, overall and
+    # per doctor, kept in step by the booking and cancellation transactions
+    # (app/stats.py) so /admin/stats never scans the appointment table.
+    date: datetime.date = Field(primary_key=True)
+    status: str = Field(primary_key=True)
+    count: int = Field(default=0)
+
+
+class DoctorDailyStat(SQLModel, table=True):
+    __table_args__ = (
+        # Covering index for the per-doctor breakdown.
+        Index("ix_doctordailystat_doctor_status", "doctor_id", "status", "date", "count"),
+    )
+
+    date: datetime.date = Field(primary_key=True)
+    doctor_id: int = Field(primary_key=True)
+    status: str = Field(primary_key=True)
+    count: int = Field(default=0)
+
+
 class Notification(SQLModel, table=True):
+    # A reminder is written at most once per appointment, kind and due time,
+    # however many schedulers try (app/reminders.py). Other notifications
+    # have no kind, and NULLs never collide.
+    __table_args__ = (
+        Index("uq_notification_reminder", "appointment_id", "kind", "remind_at", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     appointment_id: Optional[int] = Field(default=None, foreign_key="appointment.id")
     message: str
-    sent: bool = Field(default=False)
+    sent: bool = Field(default=False, index=True)  # the outbox worker polls unsent rows
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+    # Outbox bookkeeping (app/outbox.py): a worker claims a row by writing its
+    # claim token and a lease expiry; failed sends are retried with backoff.
+    claimed_by: Optional[str] = None
+    claim_expires_at: Optional[datetime.datetime] = None
+    attempts: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    next_attempt_at: Optional[datetime.datetime] = None
+    last_error: Optional[str] = None
+    sent_at: Optional[datetime.datetime] = None
+    # Reminders: "reminder_24h", "reminder_1h", ..., and when it was due.
+    kind: Optional[str] = None
+    remind_at: Optional[datetime.datetime] = None
 
@@ -0,0 +1,329 @@
+# app/next_available.py
+"""
+"Next available appointment" index.
+
+Keeps, per doctor, the sorted list of free slot start times over a rolling
+horizon (today + NEXT_AVAILABLE_HORIZON_DAYS), grouped by specialty. A
+search walks only the doctors of the requested specialty (and clinic): it
+bisects each doctor's list to the start of the window and merges them
+through a heap of next-free times, so the k earliest slots cost
+O(d log n + k log d) with no database access on a warm index.
+
+The index is built lazily with three queries (doctors, availability,
+bookings) and then maintained from app.events:
+- a booking removes the overlapping starts in memory;
+- a cancellation or new availability marks that doctor-day dirty, a
+  template or override change every doctor-day it covers, and the dirty
+  days are reloaded in one batch at the start of the next search.
+Handlers run on the publishing thread (the event loop for async routes),
+so they only touch memory: reloads query outside the index lock and take
+it just to swap the rows in, and a booking that lands while a reload is
+reading marks its day dirty again.
+
+Each worker process keeps its own index, and events from other workers
+never reach it:
+- before returning results, the candidates are re-checked against active
+  bookings in one query; slots booked elsewhere are dropped from the index;
+- slots freed elsewhere (cancellations, new availability) are found by
+  age: a search re-reads its specialty's days once they are older than
+  NEXT_AVAILABLE_STALE_SECONDS, and at that interval doctors created
+  elsewhere are picked up with one query. So a slot freed in another
+  worker is offered within that many seconds. Only the days up to the
+  last candidate are re-read, since a slot freed later in the window
+  cannot change the answer.
+"""
+import bisect
+import datetime
+import heapq
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import tuple_
+from sqlmodel import Session, select
+
+from app import events
+from app.database import db_session, read_only
+from app.models import Appointment, Doctor
+from app.slots import DEFAULT_SLOT_MINUTES, load_occupancy
+
+NEXT_AVAILABLE_HORIZON_DAYS = int(os.getenv("NEXT_AVAILABLE_HORIZON_DAYS", "90"))
+NEXT_AVAILABLE_STALE_SECONDS = float(os.getenv("NEXT_AVAILABLE_STALE_SECONDS", "30"))
+
+
+def _norm(specialty: Optional[str]) -> str:
+    return (specialty or "").strip().lower()
+
+
+class NextAvailableIndex:
+    def __init__(self, horizon_days: int = NEXT_AVAILABLE_HORIZON_DAYS, slot_minutes: int = DEFAULT_SLOT_MINUTES,
+                 stale_seconds: float = NEXT_AVAILABLE_STALE_SECONDS):
+        self.horizon_days = horizon_days
+        self.slot_minutes = slot_minutes
+        self.stale_seconds = stale_seconds
+        self._lock = threading.Lock()          # in-memory state; never held during a query
+        self._refresh_lock = threading.Lock()  # one reload at a time
+        self._reading = 0  # reloads in flight
+        self._built_on: Optional[datetime.date] = None
+        self._doctors: Dict[int, dict] = {}            # doctor_id -> {name, specialty, clinic_id}
+        self._by_specialty: Dict[str, Set[int]] = {}   # normalized specialty -> doctor IDs
+        self._free: Dict[int, List[datetime.datetime]] = {}  # doctor_id -> sorted free starts
+        self._dirty: Set[Tuple[int, datetime.date]] = set()
+        self._loaded_at = 0.0  # time.monotonic() of the last rebuild
+        self._read_at: Dict[Tuple[str, datetime.date], float] = {}  # (specialty, day) -> last re-read
+        self._doctors_read_at = 0.0
+
+    # -----------------------------------------------------------------
+    # building / refreshing
+    # -----------------------------------------------------------------
+
+    @property
+    def horizon(self) -> Tuple[datetime.date, datetime.date]:
+        start = self._built_on or datetime.date.today()
+        return start, start + datetime.timedelta(days=self.horizon_days - 1)
+
+    def _add_doctor(self, doctor_id, name, specialty, clinic_id):
+        self._doctors[doctor_id] = {"name": name, "specialty": specialty, "clinic_id": clinic_id}
+        self._by_specialty.setdefault(_norm(specialty), set()).add(doctor_id)
+        self._free.setdefault(doctor_id, [])
+
+    def _rebuild(self, session: Session, today: datetime.date):
+        start, end = today, today + datetime.timedelta(days=self.horizon_days - 1)
+        doctors = session.exec(select(Doctor.id, Doctor.name, Doctor.specialty, Doctor.clinic_id)).all()
+        occupancy = load_occupancy(session, [row[0] for row in doctors], start, end)
+        # End the WAL read snapshot: the reads after this one (the dirty days,
+        # the candidates' re-check) must see bookings committed meanwhile.
+        session.rollback()
+        free: Dict[int, List[datetime.datetime]] = {row[0]: [] for row in doctors}
+        for (doctor_id, date), day in occupancy.days.items():
+            if doctor_id in free:
+                free[doctor_id].extend(self._starts(date, day))
+        for starts in free.values():
+            starts.sort()
+        with self._lock:
+            self._reading -= 1
+            # doctors created while we were reading may be missing from `doctors`
+            created = {d: meta for d, meta in self._doctors.items() if d not in free}
+            self._doctors, self._by_specialty, self._free = {}, {}, free
+            for row in doctors:
+                self._add_doctor(*row)
+            for doctor_id, meta in created.items():
+                self._add_doctor(doctor_id, meta["name"], meta["specialty"], meta["clinic_id"])
+                self._dirty_range(doctor_id, start, end)
+            self._loaded_at = self._doctors_read_at = time.monotonic()
+            self._read_at = {}
+
+    def _starts(self, date, day) -> List[datetime.datetime]:
+        midnight = datetime.datetime.combine(date, datetime.time())
+        return [midnight + datetime.timedelta(minutes=m) for m in day.free_starts(self.slot_minutes)]
+
+    def _refresh_dirty(self, session: Session):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            start, end = self.horizon
+            dirty = {(d, day) for d, day in dirty if start <= day <= end and d in self._free}
+            if not dirty:
+                return
+            self._reading += 1
+        try:
+            doctor_ids = {d for d, _ in dirty}
+            dates = [day for _, day in dirty]
+            occupancy = load_occupancy(session, doctor_ids, min(dates), max(dates))
+            session.rollback()  # end the read snapshot, as in _rebuild
+        except BaseException:
+            with self._lock:
+                self._reading -= 1
+                self._dirty |= dirty
+            raise
+        with self._lock:
+            self._reading -= 1
+            for doctor_id, date in dirty:
+                starts = self._free[doctor_id]
+                lo = bisect.bisect_left(starts, datetime.datetime.combine(date, datetime.time()))
+                hi = bisect.bisect_left(starts, datetime.datetime.combine(date + datetime.timedelta(days=1),
+                                                                          datetime.time()))
+                day = occupancy.days.get((doctor_id, date))
+                starts[lo:hi] = self._starts(date, day) if day is not None else []
+
+    def _expire(self, specialty: str, date_from: datetime.date, date_to: datetime.date) -> bool:
+        """Mark the specialty's stale days dirty; True if there were any."""
+        now = time.monotonic()
+        start, end = self.horizon
+        key = _norm(specialty)
+        doctor_ids = self._by_specialty.get(key, ())
+        day, last = max(start, date_from), min(end, date_to)
+        expired = False
+        while day <= last:
+            if now - self._read_at.get((key, day), self._loaded_at) > self.stale_seconds:
+                self._read_at[key, day] = now
+                self._dirty.update((doctor_id, day) for doctor_id in doctor_ids)
+                expired = True
+            day += datetime.timedelta(days=1)
+        return expired
+
+    def _read_new_doctors(self, session: Session):
+        with self._lock:
+            known = max(self._doctors, default=0)
+        rows = session.exec(
+            select(Doctor.id, Doctor.name, Doctor.specialty, Doctor.clinic_id).where(Doctor.id > known)
+        ).all()
+        session.rollback()  # end the read snapshot, as in _rebuild
+        with self._lock:
+            start, end = self.horizon
+            for doctor_id, name, specialty, clinic_id in rows:
+                if doctor_id not in self._doctors:
+                    self._add_doctor(doctor_id, name, specialty, clinic_id)
+                    self._dirty_range(doctor_id, start, end)
+
+    def _prepare(self, session: Session):
+        """Bring the index up to date. Queries run outside self._lock."""
+        today = datetime.date.today()
+        with self._lock:
+            rebuild = self._built_on != today
+            read_doctors = not rebuild and time.monotonic() - self._doctors_read_at > self.stale_seconds
+            if rebuild:
+                previous, self._built_on, self._dirty = self._built_on, today, set()
+                self._reading += 1
+            elif read_doctors:
+                self._doctors_read_at = time.monotonic()
+        if rebuild:
+            try:
+                self._rebuild(session, today)
+            except BaseException:
+                with self._lock:
+                    self._reading -= 1
+                    self._built_on = previous
+                raise
+        elif read_doctors:
+            self._read_new_doctors(session)
+        self._refresh_dirty(session)
+
+    # -----------------------------------------------------------------
+    # event handlers (no I/O)
+    # -----------------------------------------------------------------
+
+    def on_booked(self, doctor_id, date, time, **_):
+        with self._lock:
+            self._take(doctor_id, datetime.datetime.combine(date, time))
+            if self._reading:
+                # a reload in flight may have read this day before the booking
+                self._dirty.add((doctor_id, date))
+
+    def _take(self, doctor_id, when: datetime.datetime):
+        starts = self._free.get(doctor_id)
+        if not starts:
+            return
+        span = datetime.timedelta(minutes=self.slot_minutes)
+        # every start whose slot overlaps [when, when + span)
+        lo = bisect.bisect_right(starts, when - span)
+        hi = bisect.bisect_left(starts, when + span)
+        del starts[lo:hi]
+
+    def on_changed(self, doctor_id, date=None, dates=(), **_):
+        with self._lock:
+            for day in ([date] if date else dates):
+                self._dirty.add((doctor_id, day))
+
+    def on_range_changed(self, doctor_id, date_from, date_to=None, **_):
+        # a template or override changed: every day it covers within the horizon
+        with self._lock:
+            self._dirty_range(doctor_id, date_from, date_to)
+
+    def _dirty_range(self, doctor_id, date_from, date_to):
+        if self._built_on is None:
+            return
+        start, end = self.horizon
+        day, last = max(start, date_from), min(end, date_to or end)
+        while day <= last:
+            self._dirty.add((doctor_id, day))
+            day += datetime.timedelta(days=1)
+
+    def on_doctor_created(self, doctor_id, name, specialty, clinic_id, **_):
+        with self._lock:
+            if self._built_on is not None:
+                self._add_doctor(doctor_id, name, specialty, clinic_id)
+
+    # -----------------------------------------------------------------
+    # search
+    # -----------------------------------------------------------------
+
+    def search(self, specialty: str, date_from: datetime.date, date_to: datetime.date,
+               clinic_id: Optional[int] = None, k: int = 10) -> List[dict]:
+        """
+        The k earliest free slots across doctors of a specialty.
+
+        The window is clipped to the index horizon. Results are ordered by
+        start time, then doctor ID.
+        """
+        with read_only(), db_session() as session:
+            with self._refresh_lock:
+                self._prepare(session)
+            with self._lock:
+                candidates = self._merge(specialty, clinic_id, date_from, date_to, k * 2)
+                # Re-read stale days up to the last candidate's; freed slots
+                # can only move the candidates earlier, so one pass is enough.
+                last = candidates[-1][0].date() if len(candidates) == k * 2 else date_to
+                expired = self._expire(specialty, date_from, last)
+            if expired:
+                with self._refresh_lock:
+                    self._refresh_dirty(session)
+                with self._lock:
+                    candidates = self._merge(specialty, clinic_id, date_from, date_to, k * 2)
+            if not candidates:
+                return []
+            taken = set(session.exec(
+                select(Appointment.doctor_id, Appointment.date, Appointment.time).where(
+                    tuple_(Appointment.doctor_id, Appointment.date, Appointment.time).in_(
+                        [(d, when.date(), when.time()) for when, d in candidates]),
+                    Appointment.status == "booked",
+                )
+            ).all())
+        if taken:
+            with self._lock:
+                for doctor_id, date, time in taken:
+                    self._take(doctor_id, datetime.datetime.combine(date, time))
+        results = []
+        for when, doctor_id in candidates:
+            if (doctor_id, when.date(), when.time()) in taken:
+                continue
+            meta = self._doctors[doctor_id]
+            results.append({"doctor_id": doctor_id, "doctor_name": meta["name"],
+                            "specialty": meta["specialty"], "clinic_id": meta["clinic_id"],
+                            "date": when.date(), "time": when.time()})
+            if len(results) == k:
+                break
+        return results
+
+    def _merge(self, specialty, clinic_id, date_from, date_to, limit) -> List[Tuple[datetime.datetime, int]]:
+        start = datetime.datetime.combine(date_from, datetime.time())
+        now = datetime.datetime.now()
+        if start < now:
+            start = now
+        end = datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time())
+        heap = []
+        for doctor_id in self._by_specialty.get(_norm(specialty), ()):
+            if clinic_id is not None and self._doctors[doctor_id]["clinic_id"] != clinic_id:
+                continue
+            starts = self._free[doctor_id]
+            i = bisect.bisect_left(starts, start)
+            if i < len(starts) and starts[i] < end:
+                heap.append((starts[i], doctor_id, i))
+        heapq.heapify(heap)
+        out = []
+        while heap and len(out) < limit:
+            when, doctor_id, i = heapq.heappop(heap)
+            out.append((when, doctor_id))
+            starts = self._free[doctor_id]
+            if i + 1 < len(starts) and starts[i + 1] < end:
+                heapq.heappush(heap, (starts[i + 1], doctor_id, i + 1))
+        return out
+
+
+index = NextAvailableIndex()
+
+events.subscribe(events.APPOINTMENT_BOOKED, index.on_booked)
+events.subscribe(events.APPOINTMENT_CANCELLED, index.on_changed)
+events.subscribe(events.AVAILABILITY_ADDED, index.on_changed)
+events.subscribe(events.AVAILABILITY_CHANGED, index.on_range_changed)
+events.subscribe(events.DOCTOR_CREATED, index.on_doctor_created)
@@ -0,0 +1,47 @@
+# app/openapi.py
+"""
+Precomputed OpenAPI document.
+
+Generating the OpenAPI schema walks every route and pydantic model, which
+costs every worker process the same time on its first /docs or
+/openapi.json request. The document only changes with the code, so it can
+be written once at build time:
+
+    python -m app.openapi openapi.json
+
+and served from disk by pointing OPENAPI_SCHEMA_PATH at the file. The file
+must come from the same code as the running app: regenerate it in the
+same build step that packages the code. When the variable is unset or the
+file is missing, main.custom_openapi() generates the schema as before.
+"""
+import argparse
+import json
+import os
+from typing import Optional
+
+OPENAPI_SCHEMA_PATH = os.getenv("OPENAPI_SCHEMA_PATH", "")
+
+
+def load_schema(path: str = OPENAPI_SCHEMA_PATH) -> Optional[dict]:
+    """The precomputed document at `path`, or None when there is none."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the app's OpenAPI document to a file.")
+    parser.add_argument("path", help="output file, e.g. openapi.json")
+    args = parser.parse_args()
+
+    os.environ["OPENAPI_SCHEMA_PATH"] = ""  # generate, never copy an old file
+    from app.main import app
+
+    with open(args.path, "w") as f:
+        json.dump(app.openapi(), f, separators=(",", ":"))
+    print(f"wrote {args.path}")
+
+
+if __name__ == "__main__":
+    main()
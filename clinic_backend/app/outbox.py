@@ -0,0 +1,361 @@
+# app/outbox.py
+"""
+Notification outbox worker.
+
+Notification rows are the outbox: the booking transaction writes one, and
+a worker delivers it later. Each pass of OutboxWorker.run_once():
+
+1. Claims up to `batch_size` deliverable rows with a single UPDATE that
+   stamps them with a fresh claim token and a lease expiry. Rows claimed
+   by another worker are skipped until that lease runs out, so any number
+   of workers (threads, processes or hosts) can run side by side without
+   sending a notification twice. On PostgreSQL the candidate rows are
+   also selected with FOR UPDATE SKIP LOCKED.
+2. Resolves every recipient of the batch with one joined query
+   (notification -> appointment -> user).
+3. Sends through the transport in chunks of `send_batch_size` messages
+   (one SMTP connection per chunk), with up to `concurrency` chunks in
+   flight.
+4. Commits the outcome of the whole batch in one transaction: delivered
+   rows are marked sent; failed rows release their claim, count the
+   attempt and are scheduled for retry after an exponential backoff,
+   until `max_attempts` is reached.
+
+Delivery is at least once: if a worker dies after sending but before
+committing, the lease expires and the batch is sent again.
+
+Run a worker from the command line:
+
+    python -m app.outbox                # poll forever
+    python -m app.outbox --once         # deliver what is pending and exit
+
+Transport selection (OUTBOX_TRANSPORT):
+    stub    log the message (default; same as send_email_stub)
+    smtp    SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD,
+            SMTP_STARTTLS, SMTP_FROM
+"""
+import argparse
+import datetime
+import logging
+import os
+import smtplib
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.mime.text import MIMEText
+from typing import List, Optional
+
+from sqlalchemy import and_, bindparam, or_, select, update
+
+from app.database import engine
+from app.logs import setup_logging
+from app.models import Appointment, Notification, User
+from app.utils import send_email_stub
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_SEND_BATCH_SIZE = int(os.getenv("OUTBOX_SEND_BATCH_SIZE", "25"))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "30"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "3600"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+
+logger = logging.getLogger(__name__)
+
+SUBJECT = "Notification"
+NO_RECIPIENT = "no recipient"
+
+
+@dataclass
+class OutgoingEmail:
+    notification_id: int
+    to: str
+    subject: str
+    body: str
+
+
+# ---------------------------------------------------------------------
+# TRANSPORTS
+# ---------------------------------------------------------------------
+
+class StubTransport:
+    """Logs each message (the behaviour of send_email_stub)."""
+
+    def send_many(self, messages: List[OutgoingEmail]) -> List[Optional[str]]:
+        """
+        Send a chunk of messages.
+
+        Returns:
+            List[Optional[str]]: Per message, None when delivered or an
+            error description.
+        """
+        for m in messages:
+            send_email_stub(m.to, m.subject, m.body)
+        return [None] * len(messages)
+
+
+class SMTPTransport:
+    """Sends each chunk of messages over one SMTP connection."""
+
+    def __init__(self, host: str = "localhost", port: int = 25, username: Optional[str] = None,
+                 password: Optional[str] = None, starttls: bool = False,
+                 sender: str = "no-reply@clinic.local", timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.sender = sender
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            host=os.getenv("SMTP_HOST", "localhost"),
+            port=int(os.getenv("SMTP_PORT", "25")),
+            username=os.getenv("SMTP_USERNAME") or None,
+            password=os.getenv("SMTP_PASSWORD") or None,
+            starttls=os.getenv("SMTP_STARTTLS", "0") == "1",
+            sender=os.getenv("SMTP_FROM", "no-reply@clinic.local"),
+        )
+
+    def send_many(self, messages: List[OutgoingEmail]) -> List[Optional[str]]:
+        errors: List[Optional[str]] = []
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+                if self.starttls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password or "")
+                for m in messages:
+                    # MIMEText (compat32 policy) is several times cheaper to
+                    # build than EmailMessage, whose header parsing dominated
+                    # the CPU cost of a send.
+                    email = MIMEText(m.body, "plain", "utf-8")
+                    email["From"] = self.sender
+                    email["To"] = m.to
+                    email["Subject"] = m.subject
+                    try:
+                        smtp.sendmail(self.sender, [m.to], email.as_string())
+                        errors.append(None)
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError,
+                            smtplib.SMTPSenderRefused) as exc:
+                        errors.append(f"{type(exc).__name__}: {exc}")
+        except (OSError, smtplib.SMTPException) as exc:
+            # connection-level failure: everything not yet sent failed
+            errors.extend([f"{type(exc).__name__}: {exc}"] * (len(messages) - len(errors)))
+        return errors
+
+
+def transport_from_env():
+    kind = os.getenv("OUTBOX_TRANSPORT", "stub")
+    if kind == "smtp":
+        return SMTPTransport.from_env()
+    if kind == "stub":
+        return StubTransport()
+    raise ValueError(f"unknown OUTBOX_TRANSPORT {kind!r}")
+
+
+# ---------------------------------------------------------------------
+# WORKER
+# ---------------------------------------------------------------------
+
+def retry_delay(attempts: int, base: float = OUTBOX_RETRY_BASE_SECONDS,
+                cap: float = OUTBOX_RETRY_MAX_SECONDS) -> float:
+    """Backoff before the next attempt, given the attempts made so far (>= 1)."""
+    return min(cap, base * 2 ** (attempts - 1))
+
+
+class OutboxWorker:
+    """
+    Claims, sends and settles batches of notifications.
+
+    Args:
+        transport: Object with send_many(List[OutgoingEmail]) -> List[Optional[str]].
+            Defaults to the one selected by OUTBOX_TRANSPORT.
+        batch_size (int): Notifications claimed per transaction.
+        send_batch_size (int): Messages handed to the transport per call.
+        concurrency (int): Transport calls in flight at once.
+        lease_seconds (float): How long a claim is honoured.
+        max_attempts (int): Failed sends after which a row is left alone.
+    """
+
+    def __init__(self, transport=None, batch_size: int = OUTBOX_BATCH_SIZE,
+                 send_batch_size: int = OUTBOX_SEND_BATCH_SIZE, concurrency: int = OUTBOX_CONCURRENCY,
+                 lease_seconds: float = OUTBOX_LEASE_SECONDS, max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+                 db_engine=None):
+        self.transport = transport or transport_from_env()
+        self.batch_size = batch_size
+        self.send_batch_size = send_batch_size
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.engine = db_engine or engine
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def _claimable(self, table, now):
+        return and_(
+            table.c.sent == False,  # noqa: E712
+            table.c.attempts < self.max_attempts,
+            or_(table.c.claim_expires_at.is_(None), table.c.claim_expires_at < now),
+            or_(table.c.next_attempt_at.is_(None), table.c.next_attempt_at <= now),
+        )
+
+    def claim(self) -> Optional[str]:
+        """
+        Claim the next batch.
+
+        Returns:
+            Optional[str]: The claim token, or None if nothing was claimable.
+        """
+        table = Notification.__table__
+        now = datetime.datetime.utcnow()
+        token = f"{self.worker_id}:{uuid.uuid4().hex[:12]}"
+        candidates = select(table.c.id).where(self._claimable(table, now)).order_by(table.c.id).limit(self.batch_size)
+        if self.engine.dialect.name == "postgresql":
+            candidates = candidates.with_for_update(skip_locked=True)
+        with self.engine.begin() as conn:
+            claimed = conn.execute(
+                update(table)
+                .where(table.c.id.in_(candidates), self._claimable(table, now))
+                .values(claimed_by=token, claim_expires_at=now + datetime.timedelta(seconds=self.lease_seconds))
+            ).rowcount
+        return token if claimed else None
+
+    def _load(self, conn, token) -> List[tuple]:
+        # one joined query resolves every recipient in the batch
+        return conn.execute(
+            select(Notification.id, Notification.message, Notification.attempts, User.email)
+            .outerjoin(Appointment, Appointment.id == Notification.appointment_id)
+            .outerjoin(User, User.id == Appointment.patient_id)
+            .where(Notification.claimed_by == token)
+            .order_by(Notification.id)
+        ).all()
+
+    def _send(self, pool, messages: List[OutgoingEmail]) -> dict:
+        chunks = [messages[i:i + self.send_batch_size] for i in range(0, len(messages), self.send_batch_size)]
+        results = {}
+        for chunk, errors in zip(chunks, pool.map(self._send_chunk, chunks)):
+            for m, error in zip(chunk, errors):
+                results[m.notification_id] = error
+        return results
+
+    def _send_chunk(self, chunk: List[OutgoingEmail]) -> List[Optional[str]]:
+        try:
+            errors = list(self.transport.send_many(chunk))
+        except Exception as exc:  # a transport bug must not strand the batch
+            return [f"{type(exc).__name__}: {exc}"] * len(chunk)
+        if len(errors) != len(chunk):
+            return [f"transport returned {len(errors)} results for {len(chunk)} messages"] * len(chunk)
+        return errors
+
+    def _settle(self, token, delivered: List[int], no_recipient: List[int], failed: List[dict]):
+        table = Notification.__table__
+        now = datetime.datetime.utcnow()
+        mine = table.c.claimed_by == token
+        released = {"claimed_by": None, "claim_expires_at": None}
+        with self.engine.begin() as conn:
+            if delivered:
+                conn.execute(update(table).where(table.c.id.in_(delivered), mine)
+                             .values(sent=True, sent_at=now, last_error=None, **released))
+            if no_recipient:
+                # nothing can be sent; settle it like the old dispatcher did
+                conn.execute(update(table).where(table.c.id.in_(no_recipient), mine)
+                             .values(sent=True, last_error=NO_RECIPIENT, **released))
+            if failed:
+                conn.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("failed_id"), mine)
+                    .values(attempts=table.c.attempts + 1, last_error=bindparam("error"),
+                            next_attempt_at=bindparam("retry_at"), **released),
+                    failed,
+                )
+
+    def run_once(self, pool: Optional[ThreadPoolExecutor] = None) -> dict:
+        """
+        Claim, send and settle one batch.
+
+        Returns:
+            dict: Counts of delivered, no_recipient and failed notifications
+            (all zero when nothing was pending).
+        """
+        outcome = {"delivered": 0, "no_recipient": 0, "failed": 0}
+        token = self.claim()
+        if token is None:
+            return outcome
+        with self.engine.connect() as conn:
+            rows = self._load(conn, token)
+
+        messages, no_recipient, attempts = [], [], {}
+        for notification_id, message, tries, email in rows:
+            attempts[notification_id] = tries
+            if email:
+                messages.append(OutgoingEmail(notification_id, email, SUBJECT, message))
+            else:
+                no_recipient.append(notification_id)
+
+        if pool is None:
+            with ThreadPoolExecutor(self.concurrency, thread_name_prefix="outbox") as own_pool:
+                results = self._send(own_pool, messages)
+        else:
+            results = self._send(pool, messages)
+
+        now = datetime.datetime.utcnow()
+        delivered = [i for i, error in results.items() if error is None]
+        failed = [
+            {"failed_id": i, "error": error[:500],
+             "retry_at": now + datetime.timedelta(seconds=retry_delay(attempts[i] + 1))}
+            for i, error in results.items() if error is not None
+        ]
+        self._settle(token, delivered, no_recipient, failed)
+        outcome.update(delivered=len(delivered), no_recipient=len(no_recipient), failed=len(failed))
+        return outcome
+
+    def drain(self, max_batches: Optional[int] = None) -> dict:
+        """
+        Run batches until nothing is claimable (or max_batches is reached).
+
+        Returns:
+            dict: Totals, batches, elapsed seconds and delivered per second.
+        """
+        totals = {"delivered": 0, "no_recipient": 0, "failed": 0, "batches": 0}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="outbox") as pool:
+            while max_batches is None or totals["batches"] < max_batches:
+                outcome = self.run_once(pool)
+                if not any(outcome.values()):
+                    break
+                totals["batches"] += 1
+                for key, count in outcome.items():
+                    totals[key] += count
+        elapsed = time.perf_counter() - started
+        totals["seconds"] = round(elapsed, 3)
+        totals["per_second"] = round(totals["delivered"] / elapsed, 1) if elapsed > 0 else 0.0
+        return totals
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Deliver pending notifications.")
+    parser.add_argument("--once", action="store_true", help="drain what is pending and exit")
+    parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=OUTBOX_CONCURRENCY)
+    parser.add_argument("--poll", type=float, default=OUTBOX_POLL_SECONDS, help="seconds between polls when idle")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    worker = OutboxWorker(batch_size=args.batch_size, concurrency=args.concurrency)
+    while True:
+        totals = worker.drain()
+        if totals["batches"]:
+            logger.info("delivered %d notifications in %d batches (%.1f/s)", totals["delivered"],
+                        totals["batches"], totals["per_second"], extra={"outbox": totals})
+        if args.once:
+            return 0
+        time.sleep(args.poll)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,147 @@
+# app/pagination.py
+"""
+Keyset pagination and streaming exports for list endpoints.
+
+Pages are addressed by an opaque cursor holding the sort key of the last
+row served, so fetching page N costs the same as page 1 (no OFFSET). The
+body stays a plain JSON array; the cursor for the next page is returned in
+the X-Next-Cursor header and as a Link: rel="next" header, and is absent
+on the last page.
+
+With format=ndjson or format=csv the endpoint streams every matching row
+instead. Rows are pulled from the database in chunks of STREAM_CHUNK_SIZE
+(yield_per), so memory use does not grow with the table.
+"""
+import base64
+import csv
+import datetime
+import io
+import json
+from typing import List, Optional, Sequence
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
+from sqlmodel import Session
+
+from app.database import db_session
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 1000
+
+FORMAT_PATTERN = "^(json|ndjson|csv)$"
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps(list(values), default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """
+    Raises:
+        HTTPException(400): The cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _after(key_columns, values):
+    if len(key_columns) == 1:
+        return key_columns[0] > values[0]
+    return tuple_(*key_columns) > tuple_(*values)
+
+
+def _page_statement(stmt, key_columns, limit, cursor):
+    if cursor:
+        stmt = stmt.where(_after(key_columns, decode_cursor(cursor, len(key_columns))))
+    return stmt.order_by(*key_columns).limit(limit + 1)
+
+
+def _split_page(rows, key_columns, limit):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]._mapping
+    return rows, encode_cursor([last[c.key] for c in key_columns])
+
+
+def paginate(session: Session, stmt, key_columns: list, limit: int, cursor: Optional[str]):
+    """
+    Run `stmt` for one page ordered by `key_columns` (which must be unique
+    together, e.g. end with the primary key).
+
+    Returns:
+        (rows, next_cursor): next_cursor is None on the last page.
+    """
+    rows = session.exec(_page_statement(stmt, key_columns, limit, cursor)).all()
+    return _split_page(rows, key_columns, limit)
+
+
+async def paginate_async(session, stmt, key_columns: list, limit: int, cursor: Optional[str]):
+    """paginate() for an AsyncSession."""
+    rows = (await session.exec(_page_statement(stmt, key_columns, limit, cursor))).all()
+    return _split_page(rows, key_columns, limit)
+
+
+def set_page_headers(request: Request, response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+
+def rows_as_dicts(rows) -> List[dict]:
+    return [dict(row._mapping) for row in rows]
+
+
+# ---------------------------------------------------------------------
+# STREAMING
+# ---------------------------------------------------------------------
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.time, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _stream(stmt, fmt: str, chunk_size: int):
+    # Runs in the threadpool, one chunk per iteration; the session lives
+    # for the duration of the stream.
+    with db_session() as session:
+        result = session.exec(stmt.execution_options(yield_per=chunk_size, stream_results=True))
+        columns = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if fmt == "csv" else None
+        if writer:
+            writer.writerow(columns)
+        for chunk in result.partitions(chunk_size):
+            for row in chunk:
+                if writer:
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, row)), default=_json_default))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+def stream_response(stmt, fmt: str, filename: str, chunk_size: int = STREAM_CHUNK_SIZE) -> StreamingResponse:
+    """Stream every row of `stmt` as NDJSON or CSV."""
+    if fmt == "csv":
+        return StreamingResponse(
+            _stream(stmt, fmt, chunk_size),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'},
+        )
+    return StreamingResponse(_stream(stmt, fmt, chunk_size), media_type="application/x-ndjson")
@@ -0,0 +1,130 @@
+# app/profiling.py
+"""
+Sampling profiler for one route, switched on and off at runtime.
+
+While a profile runs, a background thread wakes every `interval` seconds,
+takes the stack of every other thread (sys._current_frames()) and keeps
+the stacks that pass through the route's endpoint function, cut at the
+endpoint frame. That covers a sync endpoint on any threadpool thread and
+an async endpoint while it runs on the event loop, for every concurrent
+request to the route; the rest of the process is ignored. An async
+endpoint is not on any stack while it awaits, so for async routes the
+samples show CPU time in the endpoint, not time spent waiting.
+
+Samples are aggregated as folded stacks ("outer;inner;leaf" -> count),
+which flamegraph tools read directly. Nothing runs while no profile is
+active. Start and stop profiles with the /admin/profiler endpoints; one
+profile runs at a time, and it stops by itself after `seconds`.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+PROFILER_MAX_STACKS = int(os.getenv("PROFILER_MAX_STACKS", "50"))
+
+
+def _describe(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RouteProfiler:
+    """Samples the stacks of one endpoint function; see the module docstring."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.route = None
+        self.interval = 0.0
+        self.started_at = None
+        self.stopped_at = None
+        self.ticks = 0
+        self.stacks = Counter()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, route: str, endpoint, interval: float, seconds: float):
+        """
+        Start profiling `endpoint`, replacing any running profile.
+
+        Args:
+            route (str): Label for the report, e.g. "GET /doctors/doctors/".
+            endpoint: The route's endpoint function.
+            interval (float): Seconds between samples.
+            seconds (float): Stop automatically after this long.
+        """
+        self.stop()
+        with self._lock:
+            self.route = route
+            self.interval = interval
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.ticks = 0
+            self.stacks = Counter()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(endpoint.__code__, self._stop, seconds),
+                                            name="route-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the running profile, if any; its samples are kept for report()."""
+        thread = self._thread
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _run(self, target, stop, seconds):
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while not stop.wait(self.interval) and time.monotonic() < deadline:
+            sampled = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    if frame.f_code is target:
+                        sampled.append(";".join(_describe(code) for code in reversed(stack)))
+                        break
+                    frame = frame.f_back
+            with self._lock:
+                self.ticks += 1
+                self.stacks.update(sampled)
+        self.stopped_at = time.time()
+
+    def report(self, limit: int = PROFILER_MAX_STACKS) -> dict:
+        """
+        The current or last profile.
+
+        Returns:
+            dict: The route, whether it is still running, how many times
+            the threads were sampled ("ticks") and how many samples landed
+            in the endpoint, the `limit` most frequent folded stacks and
+            the functions most often at the top of a stack (self time).
+        """
+        with self._lock:
+            stacks = Counter(self.stacks)
+            ticks = self.ticks
+        leaves = Counter()
+        for stack, n in stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += n
+        return {
+            "route": self.route,
+            "running": self.running,
+            "interval_ms": round(self.interval * 1000, 3),
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "ticks": ticks,
+            "samples": sum(stacks.values()),
+            "stacks": [{"stack": s, "samples": n} for s, n in stacks.most_common(limit)],
+            "self": [{"function": f, "samples": n} for f, n in leaves.most_common(20)],
+        }
+
+
+profiler = RouteProfiler()
@@ -0,0 +1,266 @@
+# app/read_cache.py
+"""
+Read-through cache of public response bodies.
+
+GET /doctors/, GET /availability/{doctor_id} and its /slots change a few
+times an hour but are read on every page view. Their encoded bodies are
+cached here, so a repeated read costs a cache lookup instead of a query:
+
+    key, body = lookup("availability:7", params)
+    if body is None:
+        body = ...query and encode...
+        store(key, body)
+
+Keys are versioned. A namespace ("doctors", "availability:<doctor_id>",
+"slots:<doctor_id>") has a version number, and every key embeds it. A
+write bumps the version, so all of the namespace's bodies become
+unreachable at once, without finding and deleting them; they expire after
+READ_CACHE_TTL_SECONDS. A read racing a write can at worst store a stale
+body under the old version, which nobody reads any more.
+
+Versions are bumped from the domain events (app/events.py), which routes
+publish after they commit. Async routes publish on the event loop, so
+there a remote backend's bumps run in the loop's default executor rather
+than blocking the loop for a round-trip; they land a moment after the
+response instead of before it:
+    DOCTOR_CREATED                          doctors
+    AVAILABILITY_ADDED, AVAILABILITY_CHANGED  availability:<id>, slots:<id>
+    APPOINTMENT_BOOKED, APPOINTMENT_CANCELLED  slots:<id>
+
+Backends (READ_CACHE_BACKEND):
+- memory (default): an LRU of READ_CACHE_MAX_ENTRIES bodies per process.
+  Versions are per process too, so with several workers a write is seen
+  at once only by the worker that made it; the others serve the old
+  bodies until they expire.
+- redis: bodies and versions in a Redis-compatible server
+  (READ_CACHE_URL), shared by every worker, so a bump is seen by all of
+  them on their next read. Needs the `redis` package. Errors are logged
+  and treated as misses, so the cache never fails a request.
+- off: no caching.
+
+Lookups and hits by namespace kind are exported on /metrics
+(clinic_read_cache_requests_total); stats() is served by /admin/cache.
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app import events, metrics
+from app.cache import TTLCache
+
+try:
+    import redis
+except ImportError:  # optional: only needed for READ_CACHE_BACKEND=redis
+    redis = None
+
+READ_CACHE_BACKEND = os.getenv("READ_CACHE_BACKEND", "memory")
+READ_CACHE_URL = os.getenv("READ_CACHE_URL", "redis://localhost:6379/0")
+READ_CACHE_TTL_SECONDS = int(os.getenv("READ_CACHE_TTL_SECONDS", "60"))
+READ_CACHE_MAX_ENTRIES = int(os.getenv("READ_CACHE_MAX_ENTRIES", "10000"))
+READ_CACHE_TIMEOUT_SECONDS = float(os.getenv("READ_CACHE_TIMEOUT_SECONDS", "0.1"))
+
+PREFIX = "clinic:"
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------
+# BACKENDS
+# ---------------------------------------------------------------------
+
+class MemoryBackend:
+    """Bodies in a TTLCache, versions in a dict; this process only."""
+
+    remote = False
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.bodies = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.bodies.get(key)
+
+    def set(self, key: str, body: bytes):
+        self.bodies.set(key, body)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self.bodies.stats()}
+
+
+class RedisBackend:
+    """
+    Bodies and versions in Redis, shared by every worker.
+
+    Versions are plain counters (INCR) with no expiry; bodies are set with
+    EX ttl. The client's socket timeout is short, since a slow cache is
+    worse than none.
+    """
+
+    remote = True
+
+    def __init__(self, url: str, ttl: int, timeout: float):
+        if redis is None:
+            raise RuntimeError("READ_CACHE_BACKEND=redis needs the redis package (pip install redis)")
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.ttl = ttl
+        self.url = url
+
+    def version(self, namespace: str) -> int:
+        return int(self.client.get(PREFIX + "version:" + namespace) or 0)
+
+    def bump(self, namespace: str):
+        self.client.incr(PREFIX + "version:" + namespace)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, body: bytes):
+        self.client.set(key, body, ex=self.ttl)
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "url": self.url.rsplit("@", 1)[-1]}  # no credentials
+
+
+def make_backend(name: str):
+    if name == "memory":
+        return MemoryBackend(READ_CACHE_MAX_ENTRIES, READ_CACHE_TTL_SECONDS)
+    if name == "redis":
+        return RedisBackend(READ_CACHE_URL, READ_CACHE_TTL_SECONDS, READ_CACHE_TIMEOUT_SECONDS)
+    if name == "off":
+        return None
+    raise ValueError(f"READ_CACHE_BACKEND must be memory, redis or off, not {name!r}")
+
+
+backend = make_backend(READ_CACHE_BACKEND)
+
+
+# ---------------------------------------------------------------------
+# READ-THROUGH API
+# ---------------------------------------------------------------------
+
+_counts = {}  # namespace kind ("slots", never "slots:7") -> [hits, misses], this process
+_counts_lock = threading.Lock()
+
+
+def _count(namespace: str, hit: bool):
+    kind = namespace.split(":", 1)[0]
+    metrics.READ_CACHE_REQUESTS.inc(kind, "hit" if hit else "miss")
+    with _counts_lock:
+        _counts.setdefault(kind, [0, 0])[0 if hit else 1] += 1
+
+
+def lookup(namespace: str, params) -> Tuple[Optional[str], Optional[bytes]]:
+    """
+    The cached body for `params` in `namespace`.
+
+    Returns:
+        tuple: (key, body). Pass the key to store() after a miss (body
+            None). The key is None when caching is off or the backend
+            failed, and store() then does nothing.
+    """
+    if backend is None:
+        return None, None
+    try:
+        key = f"{PREFIX}{namespace}:v{backend.version(namespace)}:" + "|".join(map(str, params))
+        body = backend.get(key)
+    except Exception:
+        logger.warning("read cache lookup failed for %s", namespace, exc_info=True)
+        metrics.READ_CACHE_ERRORS.inc()
+        return None, None
+    _count(namespace, body is not None)
+    return key, body
+
+
+def store(key: Optional[str], body: bytes):
+    if key is None:
+        return
+    try:
+        backend.set(key, body)
+    except Exception:
+        logger.warning("read cache store failed", exc_info=True)
+        metrics.READ_CACHE_ERRORS.inc()
+
+
+async def lookup_async(namespace: str, params):
+    """lookup() for async routes; a remote backend is called from the threadpool."""
+    if backend is not None and backend.remote:
+        return await run_in_threadpool(lookup, namespace, params)
+    return lookup(namespace, params)
+
+
+async def store_async(key: Optional[str], body: bytes):
+    if backend is not None and backend.remote:
+        await run_in_threadpool(store, key, body)
+    else:
+        store(key, body)
+
+
+def invalidate(*namespaces: str):
+    """Bump the namespaces' versions, orphaning every body cached under them."""
+    if backend is None:
+        return
+    if backend.remote:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # a sync route's thread: block, as its reads do
+            loop = None
+        if loop is not None:
+            loop.run_in_executor(None, _bump, namespaces)
+            return
+    _bump(namespaces)
+
+
+def _bump(namespaces):
+    for namespace in namespaces:
+        try:
+            backend.bump(namespace)
+        except Exception:
+            # Other workers keep serving the old bodies until they expire.
+            logger.error("read cache invalidation failed for %s", namespace, exc_info=True)
+            metrics.READ_CACHE_ERRORS.inc()
+
+
+def stats() -> dict:
+    """Backend details, plus hits, misses and hit rate by namespace kind in this process."""
+    if backend is None:
+        return {"backend": "off"}
+    with _counts_lock:
+        counts = {kind: list(entry) for kind, entry in _counts.items()}
+    namespaces = {
+        kind: {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 4)}
+        for kind, (hits, misses) in sorted(counts.items())
+    }
+    return {**backend.stats(), "namespaces": namespaces}
+
+
+# ---------------------------------------------------------------------
+# INVALIDATION
+# ---------------------------------------------------------------------
+
+@events.subscribe(events.DOCTOR_CREATED)
+def _doctor_created(**_):
+    invalidate("doctors")
+
+
+@events.subscribe(events.AVAILABILITY_ADDED)
+@events.subscribe(events.AVAILABILITY_CHANGED)
+def _availability_changed(doctor_id, **_):
+    invalidate(f"availability:{doctor_id}", f"slots:{doctor_id}")
+
+
+@events.subscribe(events.APPOINTMENT_BOOKED)
+@events.subscribe(events.APPOINTMENT_CANCELLED)
+def _slot_changed(doctor_id, **_):
+    invalidate(f"slots:{doctor_id}")
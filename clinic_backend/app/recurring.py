@@ -0,0 +1,202 @@
+# app/recurring.py
+"""
+Recurring availability templates, expanded lazily.
+
+An AvailabilityTemplate row is one weekly window ("Tuesdays 09:00-12:00")
+with an effective date range; AvailabilityOverride rows replace a doctor's
+template windows on one date (a holiday, a short day). Nothing is
+materialised. Readers ask for the windows of a date range and get
+(doctor_id, date, start_time, end_time) rows shaped like
+slots.availability_query() rows, so both can be fed to build_occupancy().
+Concrete Availability rows stay additive: overrides replace template
+windows only.
+
+Expanded weeks are memoized per (doctor, week) in week_cache. Only the
+weeks that miss are loaded, with one query for templates and one for
+overrides across every missing doctor-week. An AVAILABILITY_CHANGED event
+bumps the doctor's generation, which is part of the cache key, so this
+process never reads that doctor's old weeks again; other worker processes
+pick the change up when their entries expire (RECURRING_CACHE_TTL_SECONDS).
+"""
+import datetime
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import or_
+from sqlmodel import select
+
+from app import events
+from app.cache import TTLCache
+from app.models import AvailabilityOverride, AvailabilityTemplate
+
+RECURRING_CACHE_TTL_SECONDS = float(os.getenv("RECURRING_CACHE_TTL_SECONDS", "60"))
+RECURRING_CACHE_MAX_WEEKS = int(os.getenv("RECURRING_CACHE_MAX_WEEKS", "100000"))
+
+Window = Tuple[datetime.time, datetime.time]
+Week = Dict[datetime.date, List[Window]]  # only days that have windows
+
+# (doctor_id, monday, generation) -> Week
+week_cache = TTLCache(maxsize=RECURRING_CACHE_MAX_WEEKS, ttl=RECURRING_CACHE_TTL_SECONDS)
+
+_generations: Dict[int, int] = defaultdict(int)
+_generations_lock = threading.Lock()
+
+ONE_WEEK = datetime.timedelta(days=7)
+
+
+def week_start(date: datetime.date) -> datetime.date:
+    return date - datetime.timedelta(days=date.weekday())
+
+
+def _weeks(date_from: datetime.date, date_to: datetime.date) -> List[datetime.date]:
+    monday, out = week_start(date_from), []
+    while monday <= date_to:
+        out.append(monday)
+        monday += ONE_WEEK
+    return out
+
+
+def expand_week(monday: datetime.date, templates: Iterable[tuple], overrides: Dict[datetime.date, List[tuple]]) -> Week:
+    """
+    Concrete windows of one doctor for the week starting `monday`.
+
+    Args:
+        monday (date): First day of the week.
+        templates: (weekday, start_time, end_time, effective_from,
+            effective_to) tuples of the doctor.
+        overrides: date -> [(start_time, end_time), ...]; a (None, None)
+            entry closes the day.
+
+    Returns:
+        Week: Sorted windows per date, for dates that have any.
+    """
+    templates = list(templates)
+    week = {}
+    for weekday in range(7):
+        date = monday + datetime.timedelta(days=weekday)
+        if date in overrides:
+            windows = [(s, e) for s, e in overrides[date] if s is not None and e is not None]
+        else:
+            windows = [(s, e) for day, s, e, first, last in templates
+                       if day == weekday and first <= date and (last is None or date <= last)]
+        if windows:
+            week[date] = sorted(windows)
+    return week
+
+
+# ---------------------------------------------------------------------
+# LOADING
+# ---------------------------------------------------------------------
+
+def template_query(doctor_ids: Iterable[int], date_from: datetime.date, date_to: datetime.date):
+    """Templates of the doctors in effect on any day of [date_from, date_to]."""
+    return select(AvailabilityTemplate.doctor_id, AvailabilityTemplate.weekday,
+                  AvailabilityTemplate.start_time, AvailabilityTemplate.end_time,
+                  AvailabilityTemplate.effective_from, AvailabilityTemplate.effective_to).where(
+        AvailabilityTemplate.doctor_id.in_(list(doctor_ids)),
+        AvailabilityTemplate.effective_from <= date_to,
+        or_(AvailabilityTemplate.effective_to.is_(None), AvailabilityTemplate.effective_to >= date_from),
+    )
+
+
+def override_query(doctor_ids: Iterable[int], date_from: datetime.date, date_to: datetime.date):
+    return select(AvailabilityOverride.doctor_id, AvailabilityOverride.date,
+                  AvailabilityOverride.start_time, AvailabilityOverride.end_time).where(
+        AvailabilityOverride.doctor_id.in_(list(doctor_ids)),
+        AvailabilityOverride.date >= date_from,
+        AvailabilityOverride.date <= date_to,
+    )
+
+
+def _lookup(doctor_ids, date_from, date_to):
+    """Cached weeks by (doctor_id, monday), and the cache keys that missed."""
+    weeks, missing = {}, []
+    mondays = _weeks(date_from, date_to)
+    for doctor_id in doctor_ids:
+        generation = _generations[doctor_id]
+        for monday in mondays:
+            key = (doctor_id, monday, generation)
+            week = week_cache.get(key)
+            if week is None:
+                missing.append(key)
+            else:
+                weeks[(doctor_id, monday)] = week
+    return weeks, missing
+
+
+def _missing_span(missing):
+    doctor_ids = sorted({d for d, _, _ in missing})
+    mondays = [m for _, m, _ in missing]
+    return doctor_ids, min(mondays), max(mondays) + datetime.timedelta(days=6)
+
+
+def _fill(weeks, missing, template_rows, override_rows):
+    templates = defaultdict(list)
+    for doctor_id, *template in template_rows:
+        templates[doctor_id].append(template)
+    overrides = defaultdict(lambda: defaultdict(list))
+    for doctor_id, date, start, end in override_rows:
+        overrides[doctor_id][date].append((start, end))
+    for key in missing:
+        doctor_id, monday, _ = key
+        week = expand_week(monday, templates.get(doctor_id, ()), overrides.get(doctor_id, {}))
+        # Stored under the generation read before loading: if the doctor
+        # changed meanwhile, the entry is simply never read.
+        week_cache.set(key, week)
+        weeks[(doctor_id, monday)] = week
+
+
+def _rows(doctor_ids, weeks, date_from, date_to):
+    rows = []
+    mondays = _weeks(date_from, date_to)
+    for doctor_id in doctor_ids:
+        for monday in mondays:
+            for date, windows in weeks[(doctor_id, monday)].items():
+                if date_from <= date <= date_to:
+                    rows.extend((doctor_id, date, start, end) for start, end in windows)
+    return rows
+
+
+def template_windows(session, doctor_ids, date_from, date_to) -> List[tuple]:
+    """
+    Windows generated by templates and overrides in [date_from, date_to].
+
+    Returns:
+        List[tuple]: (doctor_id, date, start_time, end_time) rows, by doctor
+        and date. Costs no query when every week is cached, otherwise two.
+    """
+    doctor_ids = list(doctor_ids)
+    weeks, missing = _lookup(doctor_ids, date_from, date_to)
+    if missing:
+        ids, start, end = _missing_span(missing)
+        _fill(weeks, missing,
+              session.exec(template_query(ids, start, end)).all(),
+              session.exec(override_query(ids, start, end)).all())
+    return _rows(doctor_ids, weeks, date_from, date_to)
+
+
+async def template_windows_async(session, doctor_ids, date_from, date_to) -> List[tuple]:
+    """template_windows() for an AsyncSession."""
+    doctor_ids = list(doctor_ids)
+    weeks, missing = _lookup(doctor_ids, date_from, date_to)
+    if missing:
+        ids, start, end = _missing_span(missing)
+        _fill(weeks, missing,
+              (await session.exec(template_query(ids, start, end))).all(),
+              (await session.exec(override_query(ids, start, end))).all())
+    return _rows(doctor_ids, weeks, date_from, date_to)
+
+
+# ---------------------------------------------------------------------
+# INVALIDATION
+# ---------------------------------------------------------------------
+
+def forget(doctor_id, **_):
+    """Make every cached week of a doctor unreachable."""
+    with _generations_lock:
+        _generations[doctor_id] += 1
+
+
+events.subscribe(events.AVAILABILITY_CHANGED, forget)
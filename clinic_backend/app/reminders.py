@@ -0,0 +1,427 @@
+# app/reminders.py
+"""
+Appointment reminders, 24 hours and 1 hour before by default.
+
+Rather than polling the appointment table for reminders that have come
+due, each worker keeps the reminders of the appointments that start in
+the next REMINDER_WINDOW_HOURS in a min-heap ordered by due time, and a
+thread sleeps until the earliest one is due:
+
+- At startup, and again whenever half of the window has passed, the next
+  slice of booked appointments is loaded with one range query over
+  ix_appointment_booked_start (booked rows by date and time). The table
+  is never scanned, however many appointments it holds.
+- APPOINTMENT_BOOKED and APPOINTMENT_CANCELLED (app/events.py) add and
+  remove an appointment's reminders as they happen. Cancelled entries are
+  only marked, and are dropped when they come due.
+- Due reminders are written to the notification outbox in batches, and
+  app/outbox.py delivers them. Each insert re-reads the appointment in the
+  same statement and writes nothing unless it is still booked for that
+  time, so cancellations and moves made by other workers count too.
+  uq_notification_reminder (appointment, kind, due time) makes the write
+  idempotent: every worker, and a restarted one, may try the same reminder.
+
+Reminders that came due while no worker was running are still written
+after a restart if they are less than REMINDER_CATCH_UP_MINUTES late and
+the appointment has not started. A booking made after one of its
+reminders was due does not get that reminder.
+
+Heap entries are single ints packing the due time, the appointment ID and
+the reminder kind: about 45 bytes each, so a million reminders take tens
+of megabytes, and the heap compares ints rather than tuples.
+
+Run a scheduler in every worker (REMINDERS_ENABLED=1, the default): a
+worker knows about bookings in its loaded window only when it made them
+itself. Other workers' bookings reach it with the next slice, or after a
+restart.
+"""
+import datetime
+import heapq
+import logging
+import os
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy import Boolean, DateTime, Integer, bindparam, literal, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import events, metrics
+from app.database import engine
+from app.models import Appointment, Notification
+
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "1") == "1"
+REMINDER_LEADS_MINUTES = [int(m) for m in os.getenv("REMINDER_LEADS_MINUTES", "1440,60").split(",") if m.strip()]
+REMINDER_WINDOW_HOURS = float(os.getenv("REMINDER_WINDOW_HOURS", "48"))
+REMINDER_CATCH_UP_MINUTES = float(os.getenv("REMINDER_CATCH_UP_MINUTES", "30"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+REMINDER_MAX_SLEEP_SECONDS = float(os.getenv("REMINDER_MAX_SLEEP_SECONDS", "60"))
+REMINDER_FETCH_SIZE = 10000  # rows fetched at a time while loading a slice
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------
+# HEAP ENTRIES
+# ---------------------------------------------------------------------
+# due seconds | appointment ID (40 bits) | kind index (4 bits). Ordering
+# the ints orders by due time first.
+
+EPOCH = datetime.datetime(2000, 1, 1)
+_EPOCH_DAY = EPOCH.toordinal()
+_ID_BITS = 40
+_KIND_BITS = 4
+_KIND_MASK = (1 << _KIND_BITS) - 1
+_ID_MASK = (1 << _ID_BITS) - 1
+_DUE_SHIFT = _ID_BITS + _KIND_BITS
+
+
+def to_seconds(moment: datetime.datetime) -> int:
+    """Seconds since EPOCH of a naive local time (appointment times are naive)."""
+    return (moment - EPOCH) // datetime.timedelta(seconds=1)
+
+
+def slot_seconds(date: datetime.date, time_: datetime.time) -> int:
+    """to_seconds() of an appointment's date and time, without building a datetime."""
+    return (date.toordinal() - _EPOCH_DAY) * 86400 + time_.hour * 3600 + time_.minute * 60 + time_.second
+
+
+def from_seconds(seconds: int) -> datetime.datetime:
+    return EPOCH + datetime.timedelta(seconds=seconds)
+
+
+def pack(due: int, appointment_id: int, kind: int) -> int:
+    return (due << _DUE_SHIFT) | (appointment_id << _KIND_BITS) | kind
+
+
+def unpack(key: int):
+    """Returns: tuple: (due seconds, appointment ID, kind index)."""
+    return key >> _DUE_SHIFT, (key >> _KIND_BITS) & _ID_MASK, key & _KIND_MASK
+
+
+def kind_name(lead_minutes: int) -> str:
+    """Notification.kind of a reminder sent `lead_minutes` ahead: reminder_24h, reminder_90m, ..."""
+    if lead_minutes % 60 == 0:
+        return f"reminder_{lead_minutes // 60}h"
+    return f"reminder_{lead_minutes}m"
+
+
+# ---------------------------------------------------------------------
+# SCHEDULER
+# ---------------------------------------------------------------------
+
+class ReminderScheduler:
+    """
+    Min-heap of upcoming reminders, fed by range queries and booking events.
+
+    schedule() and unschedule() are called from request threads and the
+    event loop; the heap is only touched under the lock. The scheduler's
+    own thread (start()) loads the window and writes due reminders.
+
+    Args:
+        leads_minutes (List[int]): How long before an appointment each
+            reminder is due; at most 16.
+        window_hours (float): Appointments starting this far ahead are
+            kept in memory.
+        catch_up_minutes (float): How late a reminder may still be written
+            when loaded at startup.
+        batch_size (int): Reminders written per transaction.
+    """
+
+    def __init__(self, leads_minutes: List[int], window_hours: float, catch_up_minutes: float,
+                 batch_size: int, db_engine=None):
+        if not leads_minutes or len(leads_minutes) > _KIND_MASK + 1:
+            raise ValueError(f"REMINDER_LEADS_MINUTES needs 1 to {_KIND_MASK + 1} values")
+        self.leads = sorted(set(leads_minutes), reverse=True)
+        self.kinds = [kind_name(lead) for lead in self.leads]
+        self._lead_seconds = [(kind, lead * 60) for kind, lead in enumerate(self.leads)]
+        self.window = int(window_hours * 3600)
+        self.catch_up = int(catch_up_minutes * 60)
+        self.batch_size = max(1, batch_size)
+        self.engine = db_engine or engine
+        self._heap: List[int] = []
+        self._removed = set()  # keys of cancelled entries still in the heap
+        self._loaded_until: Optional[int] = None  # appointments starting before this are in the heap
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_refill = {}
+        self.written = 0
+        self.skipped = 0
+
+    def __len__(self):
+        return len(self._heap) - len(self._removed)
+
+    def _keys(self, appointment_id: int, start: int, due_after: int) -> List[int]:
+        return [pack(start - lead, appointment_id, kind) for kind, lead in self._lead_seconds
+                if start - lead > due_after]
+
+    # -- booking events ------------------------------------------------
+
+    def schedule(self, appointment_id: int, date: datetime.date, time_: datetime.time):
+        """Queue the reminders of a new booking that are not yet due."""
+        start = slot_seconds(date, time_)
+        now = to_seconds(datetime.datetime.now())
+        with self._lock:
+            if self._loaded_until is None or start >= self._loaded_until:
+                return  # not loaded yet; its slice will be
+            head = self._heap[0] if self._heap else None
+            for key in self._keys(appointment_id, start, now):
+                if key in self._removed:
+                    self._removed.discard(key)  # cancelled and booked again: the entry is still queued
+                else:
+                    heapq.heappush(self._heap, key)
+            earlier = bool(self._heap) and self._heap[0] != head
+        if earlier:
+            self._wakeup.set()
+
+    def unschedule(self, appointment_id: int, date: datetime.date, time_: datetime.time):
+        """Mark a cancelled booking's queued reminders; they are dropped when due."""
+        start = slot_seconds(date, time_)
+        now = to_seconds(datetime.datetime.now())
+        with self._lock:
+            if self._loaded_until is None or start >= self._loaded_until:
+                return
+            self._removed.update(self._keys(appointment_id, start, now))
+
+    # -- window --------------------------------------------------------
+
+    def _booked_between(self, start: int, end: int):
+        """Yields (id, date, time) of the booked appointments starting in [start, end), a few rows at a time."""
+        begin, stop = from_seconds(start), from_seconds(end)
+        slot = tuple_(Appointment.date, Appointment.time)
+        stmt = select(Appointment.id, Appointment.date, Appointment.time).where(
+            Appointment.status == "booked",
+            slot >= tuple_(literal(begin.date()), literal(begin.time())),
+            slot < tuple_(literal(stop.date()), literal(stop.time())),
+        )
+        with self.engine.connect() as conn:
+            result = conn.execution_options(yield_per=REMINDER_FETCH_SIZE).execute(stmt)
+            for partition in result.partitions():
+                yield from partition
+
+    def refill(self, now: Optional[int] = None) -> int:
+        """
+        Load the next slice of the window, if half of it has passed (or
+        everything, the first time).
+
+        The window is extended before the query runs, so a booking that
+        commits during the query is queued by schedule() if the query
+        missed it (and may be queued twice, which is harmless).
+
+        Returns:
+            int: Reminders added to the heap.
+        """
+        now = to_seconds(datetime.datetime.now()) if now is None else now
+        with self._lock:
+            previous = self._loaded_until
+            if previous is None:
+                start, due_after = now, now - self.catch_up
+            elif previous - now > self.window // 2:
+                return 0
+            else:
+                start, due_after = previous, now
+            end = now + self.window
+            self._loaded_until = end
+            # Forget marks that can no longer match a queued entry.
+            self._removed = {key for key in self._removed if key >> _DUE_SHIFT >= now}
+
+        started = time.perf_counter()
+        keys, appointments = [], 0
+        try:
+            # _keys() inlined: this runs once per appointment in the window.
+            for appointment_id, date, time_ in self._booked_between(start, end):
+                appointments += 1
+                slot = slot_seconds(date, time_)
+                entry = appointment_id << _KIND_BITS
+                for kind, lead in self._lead_seconds:
+                    if slot - lead > due_after:
+                        keys.append(((slot - lead) << _DUE_SHIFT) | entry | kind)
+        except Exception:
+            with self._lock:
+                self._loaded_until = previous  # retried on the next pass
+            raise
+        with self._lock:
+            self._heap.extend(keys)
+            heapq.heapify(self._heap)
+        elapsed = time.perf_counter() - started
+        self._last_refill = {"appointments": appointments, "reminders": len(keys), "seconds": round(elapsed, 3),
+                             "from": from_seconds(start), "to": from_seconds(end)}
+        metrics.REMINDERS_LOADED.inc(amount=len(keys))
+        logger.info("loaded %d reminders of %d appointments in %.2f s", len(keys), appointments, elapsed)
+        return len(keys)
+
+    # -- due reminders -------------------------------------------------
+
+    def _pop_due(self, now: int) -> List[int]:
+        limit = pack(now + 1, 0, 0)
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0] < limit and len(due) < self.batch_size:
+                key = heapq.heappop(self._heap)
+                if key in self._removed:
+                    self._removed.discard(key)
+                    self.skipped += 1
+                    metrics.REMINDERS_SKIPPED.inc("cancelled")
+                else:
+                    due.append(key)
+        return due
+
+    def _insert(self):
+        """INSERT ... SELECT of one reminder, if its appointment is still booked for that time."""
+        table = Notification.__table__
+        dialects = {"sqlite": sqlite, "postgresql": postgresql}
+        dialect = dialects.get(self.engine.dialect.name)
+        if dialect is None:
+            raise NotImplementedError(f"no reminder insert for dialect {self.engine.dialect.name}")
+        source = select(
+            Appointment.id,
+            bindparam("message"),
+            bindparam("kind"),
+            bindparam("remind_at", type_=DateTime()),
+            literal(False, Boolean()),
+            bindparam("created_at", type_=DateTime()),
+            literal(0, Integer()),
+        ).where(
+            Appointment.id == bindparam("appointment_id"),
+            Appointment.status == "booked",
+            Appointment.date == bindparam("date"),
+            Appointment.time == bindparam("time"),
+        )
+        columns = ["appointment_id", "message", "kind", "remind_at", "sent", "created_at", "attempts"]
+        return dialect.insert(table).from_select(columns, source).on_conflict_do_nothing()
+
+    def _write(self, keys: List[int]) -> int:
+        created_at = datetime.datetime.utcnow()
+        rows = []
+        for key in keys:
+            due, appointment_id, kind = unpack(key)
+            start = from_seconds(due + self.leads[kind] * 60)
+            rows.append({
+                "appointment_id": appointment_id,
+                "date": start.date(),
+                "time": start.time(),
+                "kind": self.kinds[kind],
+                "remind_at": from_seconds(due),
+                "created_at": created_at,
+                "message": f"Reminder: your appointment is on {start.date()} at {start.time()}",
+            })
+        with self.engine.begin() as conn:
+            written = conn.execute(self._insert(), rows).rowcount
+        return written
+
+    def fire_due(self, now: Optional[int] = None) -> int:
+        """
+        Write every reminder due by `now` to the outbox.
+
+        Returns:
+            int: Notifications written. Reminders of appointments that are
+            no longer booked for that time, and ones already written, are
+            counted as skipped.
+        """
+        now = to_seconds(datetime.datetime.now()) if now is None else now
+        total = 0
+        while True:
+            keys = self._pop_due(now)
+            if not keys:
+                return total
+            try:
+                written = self._write(keys)
+            except Exception:
+                with self._lock:
+                    for key in keys:
+                        heapq.heappush(self._heap, key)  # retried on the next pass
+                raise
+            total += written
+            self.written += written
+            self.skipped += len(keys) - written
+            metrics.REMINDERS_WRITTEN.inc(amount=written)
+            metrics.REMINDERS_SKIPPED.inc("stale_or_written", amount=len(keys) - written)
+
+    # -- thread --------------------------------------------------------
+
+    def _sleep_seconds(self, now: int) -> float:
+        sleep = REMINDER_MAX_SLEEP_SECONDS
+        with self._lock:
+            if self._heap:
+                sleep = min(sleep, (self._heap[0] >> _DUE_SHIFT) - now)
+            if self._loaded_until is not None:
+                sleep = min(sleep, self._loaded_until - self.window // 2 - now)
+        return max(0.0, sleep)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                now = to_seconds(datetime.datetime.now())
+                self.refill(now)
+                self.fire_due(now)
+                timeout = self._sleep_seconds(to_seconds(datetime.datetime.now()))
+            except Exception:
+                logger.exception("reminder pass failed")
+                timeout = min(5.0, REMINDER_MAX_SLEEP_SECONDS)
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def start(self):
+        """Load the window and keep writing due reminders, in a daemon thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="reminders", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        """Queued reminders, the loaded window, the next due time and totals, for /admin/reminders."""
+        with self._lock:
+            head = self._heap[0] if self._heap else None
+            loaded_until = self._loaded_until
+            queued = len(self._heap) - len(self._removed)
+            cancelled = len(self._removed)
+        return {
+            "running": self._thread is not None,
+            "leads_minutes": self.leads,
+            "queued": queued,
+            "cancelled_in_heap": cancelled,
+            "loaded_until": from_seconds(loaded_until) if loaded_until is not None else None,
+            "next_due": from_seconds(head >> _DUE_SHIFT) if head is not None else None,
+            "written": self.written,
+            "skipped": self.skipped,
+            "last_refill": self._last_refill,
+        }
+
+
+scheduler = ReminderScheduler(REMINDER_LEADS_MINUTES, REMINDER_WINDOW_HOURS, REMINDER_CATCH_UP_MINUTES,
+                              REMINDER_BATCH_SIZE)
+
+
+def start():
+    """Called by the app's lifespan (main.py)."""
+    if REMINDERS_ENABLED:
+        scheduler.start()
+
+
+def stop():
+    scheduler.stop()
+
+
+# ---------------------------------------------------------------------
+# DOMAIN EVENTS
+# ---------------------------------------------------------------------
+
+@events.subscribe(events.APPOINTMENT_BOOKED)
+def _booked(appointment_id, date, time, **_):
+    scheduler.schedule(appointment_id, date, time)
+
+
+@events.subscribe(events.APPOINTMENT_CANCELLED)
+def _cancelled(appointment_id, date, time, **_):
+    scheduler.unschedule(appointment_id, date, time)
@@ -0,0 +1,287 @@
+# app/reservations.py
+"""
+In-process slot reservation and booking admission.
+
+Two requests for the same (doctor, date, time) should not both reach the
+database: the loser would only wait on SQLite's write lock and then fail
+the unique index anyway. SlotLocks hands out one non-blocking lock per
+slot, so a contending request is rejected immediately while the winner
+commits. The database index remains the real guarantee across processes;
+this only keeps a single worker from piling up on itself.
+
+When a popular doctor's calendar opens, hundreds of bookings for that
+doctor arrive at once, and most of them are going to lose. Two layers run
+in front of the booking transaction:
+- taken_slots remembers slots known to be booked: booked in this process,
+  or found booked by the conflict check. It forgets them when they are
+  cancelled here, or after BOOKING_TAKEN_TTL_SECONDS (5 s by default),
+  since cancellations in other workers are not seen here. A request for
+  a known-taken slot gets 409 without touching the database.
+- BookingAdmission gives each doctor a bounded queue. At most
+  BOOKING_DOCTOR_CONCURRENCY bookings per doctor are processed at once,
+  and up to BOOKING_QUEUE_LIMIT more wait their turn. Past that, or after
+  waiting BOOKING_QUEUE_TIMEOUT_SECONDS, a request is shed with
+  BookingOverloaded (429 with Retry-After, see main.py). Retry-After
+  estimates how long the queue ahead of it takes to drain. Sync routes
+  wait on a threadpool thread, so across all doctors at most
+  BOOKING_MAX_WAITING_THREADS of them wait at once; past that, requests
+  that would wait are shed too, and the pool stays free for other routes.
+
+Routes take admission first and the slot lock once admitted: a request
+that waits in the queue, and may yet be shed, holds no slot, so requests
+for the same slot are not refused on its behalf.
+
+Queue depth, queue wait and rejections by reason are exported on /metrics
+(clinic_booking_*).
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from app import events, metrics
+from app.cache import TTLCache
+
+BOOKING_DOCTOR_CONCURRENCY = int(os.getenv("BOOKING_DOCTOR_CONCURRENCY", "2"))
+BOOKING_QUEUE_LIMIT = int(os.getenv("BOOKING_QUEUE_LIMIT", "20"))
+BOOKING_QUEUE_TIMEOUT_SECONDS = float(os.getenv("BOOKING_QUEUE_TIMEOUT_SECONDS", "5"))
+BOOKING_MAX_WAITING_THREADS = int(os.getenv("BOOKING_MAX_WAITING_THREADS", "10"))
+BOOKING_TAKEN_TTL_SECONDS = float(os.getenv("BOOKING_TAKEN_TTL_SECONDS", "5"))
+BOOKING_TAKEN_MAX_SLOTS = int(os.getenv("BOOKING_TAKEN_MAX_SLOTS", "100000"))
+
+
+class SlotBusy(Exception):
+    """Raised when another request in this process is booking the same slot."""
+
+
+class BookingOverloaded(Exception):
+    """Raised when a doctor's booking queue is full or a request waited too long in it."""
+
+    def __init__(self, doctor_id: int, retry_after: int):
+        super().__init__(f"booking queue for doctor {doctor_id} is full")
+        self.doctor_id = doctor_id
+        self.retry_after = retry_after
+
+
+class SlotLocks:
+    """
+    Registry of per-slot locks.
+
+    Locks are created on demand and dropped again once no request holds or
+    waits on them, so the registry only ever contains slots that are being
+    booked right now.
+    """
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {}  # key -> [lock, refcount]
+
+    def __len__(self):
+        return len(self._locks)
+
+    @contextmanager
+    def hold(self, doctor_id, date, time):
+        """
+        Hold the lock for one slot for the duration of the block.
+
+        Raises:
+            SlotBusy: another request already holds this slot.
+        """
+        key = (doctor_id, date, time)
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            if not entry[0].acquire(blocking=False):
+                metrics.BOOKING_REJECTED.inc("slot_busy")
+                raise SlotBusy(key)
+            try:
+                yield
+            finally:
+                entry[0].release()
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._locks.pop(key, None)
+
+
+# ---------------------------------------------------------------------
+# KNOWN-TAKEN SLOTS
+# ---------------------------------------------------------------------
+
+taken_slots = TTLCache(maxsize=BOOKING_TAKEN_MAX_SLOTS, ttl=BOOKING_TAKEN_TTL_SECONDS)
+
+
+def is_known_taken(doctor_id, date, time) -> bool:
+    """True if the slot is remembered as booked; counts the rejection."""
+    if taken_slots.get((doctor_id, date, time)) is None:
+        return False
+    metrics.BOOKING_REJECTED.inc("known_taken")
+    return True
+
+
+def mark_taken(doctor_id, date, time, **_):
+    taken_slots.set((doctor_id, date, time), True)
+
+
+def _forget_taken(doctor_id, date, time, **_):
+    taken_slots.delete((doctor_id, date, time))
+
+
+events.subscribe(events.APPOINTMENT_BOOKED, mark_taken)
+events.subscribe(events.APPOINTMENT_CANCELLED, _forget_taken)
+
+
+# ---------------------------------------------------------------------
+# PER-DOCTOR ADMISSION
+# ---------------------------------------------------------------------
+
+class BookingAdmission:
+    """
+    Per-doctor bounded queues in front of the booking transaction.
+
+    A doctor's lane (a semaphore of `concurrency` permits plus the number
+    of requests holding or waiting for one) exists only while it has
+    requests. admit() is for sync routes, whose threads block while they
+    wait; admit_async() is for async routes. Use one instance per kind,
+    since a lane's semaphore is either a threading or an asyncio one.
+
+    Args:
+        concurrency (int): Bookings per doctor processed at once.
+        queue_limit (int): Bookings per doctor allowed to wait beyond those.
+        timeout (float): Longest wait for a permit, in seconds.
+        semaphore: Semaphore class (threading.Semaphore or asyncio.Semaphore).
+        max_waiting (int, optional): Requests allowed to wait across all
+            doctors; None for no limit beyond each doctor's queue.
+    """
+
+    def __init__(self, concurrency: int, queue_limit: int, timeout: float, semaphore, max_waiting: int = None):
+        self.concurrency = max(1, concurrency)
+        self.queue_limit = max(0, queue_limit)
+        self.timeout = timeout
+        self.max_waiting = max_waiting
+        self._semaphore = semaphore
+        self._guard = threading.Lock()
+        self._lanes = {}  # doctor_id -> [semaphore, requests holding or waiting]
+        self._waiting = 0  # requests waiting for a permit, all doctors
+        self.service_seconds = 0.05  # moving average of one booking's time in the lane
+
+    def __len__(self):
+        return len(self._lanes)
+
+    def depth(self, doctor_id: int) -> int:
+        """Requests waiting for a permit for `doctor_id`."""
+        lane = self._lanes.get(doctor_id)
+        return max(0, lane[1] - self.concurrency) if lane else 0
+
+    def retry_after(self, waiting: int) -> int:
+        """Seconds until a queue of `waiting` requests has probably drained."""
+        return max(1, math.ceil((waiting + 1) / self.concurrency * self.service_seconds))
+
+    def _enter(self, doctor_id: int):
+        with self._guard:
+            lane = self._lanes.get(doctor_id)
+            if lane is None:
+                lane = self._lanes[doctor_id] = [self._semaphore(self.concurrency), 0]
+            waiting = max(0, lane[1] - self.concurrency + 1)  # including this request
+            if waiting > self.queue_limit:
+                metrics.BOOKING_REJECTED.inc("queue_full")
+                raise BookingOverloaded(doctor_id, self.retry_after(waiting - 1))
+            if waiting and self.max_waiting is not None and self._waiting >= self.max_waiting:
+                metrics.BOOKING_REJECTED.inc("waiting_limit")
+                raise BookingOverloaded(doctor_id, self.retry_after(waiting - 1))
+            lane[1] += 1
+            if waiting:
+                self._waiting += 1
+        metrics.BOOKING_QUEUE_DEPTH_SEEN.observe(waiting)
+        if waiting:
+            metrics.BOOKING_QUEUE_DEPTH.add()
+        return lane, waiting > 0
+
+    def _dequeued(self):
+        with self._guard:
+            self._waiting -= 1
+        metrics.BOOKING_QUEUE_DEPTH.add(amount=-1)
+
+    def _leave(self, doctor_id: int, lane):
+        with self._guard:
+            lane[1] -= 1
+            if lane[1] == 0:
+                self._lanes.pop(doctor_id, None)
+
+    def _admitted(self, arrived: float):
+        metrics.BOOKING_QUEUE_WAIT.observe(time.perf_counter() - arrived)
+        metrics.BOOKING_ACTIVE.add()
+
+    def _timed_out(self, doctor_id: int):
+        metrics.BOOKING_REJECTED.inc("queue_timeout")
+        return BookingOverloaded(doctor_id, self.retry_after(self.depth(doctor_id)))
+
+    def _done(self, started: float):
+        metrics.BOOKING_ACTIVE.add(amount=-1)
+        # Races between threads only blur the average; no lock needed.
+        self.service_seconds += 0.1 * ((time.perf_counter() - started) - self.service_seconds)
+
+    @contextmanager
+    def admit(self, doctor_id: int):
+        """
+        Hold one of the doctor's permits for the duration of the block.
+
+        Raises:
+            BookingOverloaded: The queue is full, or no permit came within
+                the timeout.
+        """
+        arrived = time.perf_counter()
+        lane, queued = self._enter(doctor_id)
+        try:
+            try:
+                acquired = lane[0].acquire(timeout=self.timeout)
+            finally:
+                if queued:
+                    self._dequeued()
+            if not acquired:
+                raise self._timed_out(doctor_id)
+            self._admitted(arrived)
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                lane[0].release()
+                self._done(started)
+        finally:
+            self._leave(doctor_id, lane)
+
+    @asynccontextmanager
+    async def admit_async(self, doctor_id: int):
+        """admit() for async routes; waiting does not block the event loop."""
+        arrived = time.perf_counter()
+        lane, queued = self._enter(doctor_id)
+        try:
+            try:
+                await asyncio.wait_for(lane[0].acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise self._timed_out(doctor_id)
+            finally:
+                if queued:
+                    self._dequeued()
+            self._admitted(arrived)
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                lane[0].release()
+                self._done(started)
+        finally:
+            self._leave(doctor_id, lane)
+
+
+# Shared by every booking route in this process. Only sync waits hold a
+# thread, so only they count against BOOKING_MAX_WAITING_THREADS.
+slot_locks = SlotLocks()
+admission = BookingAdmission(BOOKING_DOCTOR_CONCURRENCY, BOOKING_QUEUE_LIMIT, BOOKING_QUEUE_TIMEOUT_SECONDS,
+                             threading.Semaphore, max_waiting=BOOKING_MAX_WAITING_THREADS)
+async_admission = BookingAdmission(BOOKING_DOCTOR_CONCURRENCY, BOOKING_QUEUE_LIMIT, BOOKING_QUEUE_TIMEOUT_SECONDS,
+                                   asyncio.Semaphore)
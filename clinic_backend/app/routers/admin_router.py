@@ -1,27 +1,134 @@
 # app/routers/admin_router.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from app.database import engine
-from app.models import User, Appointment, Doctor
-from app.auth import require_role
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlmodel import select
+from typing import List, Optional
+import datetime
+from app.database import db_session
+from app.models import User, Appointment
+from app.auth import require_role, principal_cache, token_cache
+from app.profiling import profiler
+from app.schemas import AdminAppointmentOut, ProfilerIn, UserOut
+from app.serialization import RowSerializer
+from app.reservations import taken_slots
+from app import read_cache, reminders
+from app.stats import BUCKET_PATTERN, stats_cache, summary
+from app.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, FORMAT_PATTERN,
+    paginate, set_page_headers, stream_response,
+)
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
-@router.get("/users")
-def all_users(admin = Depends(require_role("admin"))):
-    with Session(engine) as session:
-        return session.exec(select(User)).all()
+# List endpoints are keyset-paginated (see app/pagination.py): pass the
+# X-Next-Cursor header of one page as ?cursor= to get the next. With
+# format=ndjson or format=csv every matching row is streamed instead.
 
-@router.get("/appointments")
-def all_appointments(admin = Depends(require_role("admin"))):
-    with Session(engine) as session:
-        return session.exec(select(Appointment)).all()
+USER_COLUMNS = (User.id, User.name, User.email, User.role)  # never expose password_hash
+APPOINTMENT_COLUMNS = (Appointment.id, Appointment.patient_id, Appointment.doctor_id, Appointment.date,
+                       Appointment.time, Appointment.status, Appointment.version, Appointment.created_at)
+USER_ROWS = RowSerializer(UserOut)  # same column order as above; see app/serialization.py
+APPOINTMENT_ROWS = RowSerializer(AdminAppointmentOut)
+
+@router.get("/users", response_model=List[UserOut])
+def all_users(
+    request: Request,
+    response: Response,
+    role: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: str = Query("json", pattern=FORMAT_PATTERN),
+    admin = Depends(require_role("admin")),
+):
+    stmt = select(*USER_COLUMNS)
+    if role:
+        stmt = stmt.where(User.role == role)
+    if format != "json":
+        return stream_response(stmt.order_by(User.id), format, "users")
+    with db_session() as session:
+        rows, next_cursor = paginate(session, stmt, [User.id], limit, cursor)
+    set_page_headers(request, response, next_cursor)
+    return USER_ROWS.response(rows, response)
+
+@router.get("/appointments", response_model=List[AdminAppointmentOut])
+def all_appointments(
+    request: Request,
+    response: Response,
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+    status: Optional[str] = None,
+    doctor_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: str = Query("json", pattern=FORMAT_PATTERN),
+    admin = Depends(require_role("admin")),
+):
+    stmt = select(*APPOINTMENT_COLUMNS)
+    if date_from:
+        stmt = stmt.where(Appointment.date >= date_from)
+    if date_to:
+        stmt = stmt.where(Appointment.date <= date_to)
+    if status:
+        stmt = stmt.where(Appointment.status == status)
+    if doctor_id is not None:
+        stmt = stmt.where(Appointment.doctor_id == doctor_id)
+    if format != "json":
+        return stream_response(stmt.order_by(Appointment.id), format, "appointments")
+    with db_session() as session:
+        rows, next_cursor = paginate(session, stmt, [Appointment.id], limit, cursor)
+    set_page_headers(request, response, next_cursor)
+    return APPOINTMENT_ROWS.response(rows, response)
 
 @router.get("/stats")
-def stats(admin = Depends(require_role("admin"))):
-    with Session(engine) as session:
-        total_users = session.exec(select(User)).count()
-        total_doctors = session.exec(select(Doctor)).count()
-        total_appointments = session.exec(select(Appointment)).count()
-        return {"users": total_users, "doctors": total_doctors, "appointments": total_appointments}
+def stats(
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+    doctor_id: Optional[int] = None,
+    bucket: str = Query("day", pattern=BUCKET_PATTERN),
+    admin = Depends(require_role("admin")),
+):
+    # Aggregates over the appointment rollup (app/stats.py); the dashboard
+    # polls this, so results are cached for STATS_CACHE_TTL_SECONDS.
+    key = (date_from, date_to, doctor_id, bucket)
+    result = stats_cache.get(key)
+    if result is None:
+        with db_session() as session:
+            result = summary(session, date_from, date_to, doctor_id, bucket)
+        stats_cache.set(key, result)
+    return result
+
+@router.get("/cache")
+def cache_stats(admin = Depends(require_role("admin"))):
+    # Hit/miss counters of the in-process caches and the public read cache
+    return {"principals": principal_cache.stats(), "tokens": token_cache.stats(), "stats": stats_cache.stats(),
+            "taken_slots": taken_slots.stats(), "read_cache": read_cache.stats()}
+
+@router.get("/reminders")
+def reminder_stats(admin = Depends(require_role("admin"))):
+    # The reminder scheduler of this worker (app/reminders.py)
+    return reminders.scheduler.stats()
+
+# ---------------------------------------------------------------------
+# ROUTE PROFILER
+# ---------------------------------------------------------------------
+# Sampling profiler for one route at a time (app/profiling.py). Start it,
+# send traffic, then read the folded stacks with GET or stop with DELETE.
+
+@router.post("/profiler")
+def start_profiler(payload: ProfilerIn, request: Request, admin = Depends(require_role("admin"))):
+    method = payload.method.upper()
+    # the first matching route is the one Starlette serves (async routes shadow sync ones)
+    route = next((r for r in request.app.routes
+                  if getattr(r, "path", None) == payload.route and method in getattr(r, "methods", ())), None)
+    if route is None:
+        raise HTTPException(status_code=404, detail=f"No route {method} {payload.route}")
+    profiler.start(f"{method} {payload.route}", route.endpoint, payload.interval_ms / 1000, payload.seconds)
+    return profiler.report()
+
+@router.get("/profiler")
+def profiler_report(admin = Depends(require_role("admin"))):
+    return profiler.report()
 
+@router.delete("/profiler")
+def stop_profiler(admin = Depends(require_role("admin"))):
+    profiler.stop()
+    return profiler.report()
@@ -1,58 +1,417 @@
 # app/routers/appointments_router.py
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from sqlmodel import Session, select
-from app.database import engine
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query, Request, Response
+from sqlmodel import select
+from sqlalchemy import bindparam, insert, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from app.database import db_session, read_only
 from app.models import Appointment, Doctor, User, Notification
-from app.schemas import AppointmentIn, AppointmentOut
-from typing import List
+from app.schemas import (
+    AppointmentIn, AppointmentOut, RescheduleIn, RescheduleMoveIn, BatchRescheduleIn, BatchRescheduleOut,
+)
+from typing import List, Optional
+from collections import defaultdict
+from contextlib import ExitStack
+from dataclasses import dataclass
 from app.auth import get_current_user
 from app.utils import send_email_stub
+from app.reservations import admission, is_known_taken, mark_taken, slot_locks, SlotBusy
+from app.slots import BOOKING_REQUIRE_AVAILABILITY, fits_window, is_available, load_windows
+from app import events, stats
+from app.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, FORMAT_PATTERN,
+    paginate, set_page_headers, stream_response,
+)
+from app.serialization import RowSerializer, json_response
 from datetime import datetime, timedelta, time as dt_time
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
+APPOINTMENT_COLUMNS = (Appointment.id, Appointment.patient_id, Appointment.doctor_id, Appointment.date,
+                       Appointment.time, Appointment.status, Appointment.version)
+APPOINTMENT_ROWS = RowSerializer(AppointmentOut)  # same column order as above; see app/serialization.py
+
 @router.post("/", response_model=dict)
 def book_appointment(payload: AppointmentIn, background_tasks: BackgroundTasks, user: User = Depends(get_current_user)):
-    with Session(engine) as session:
+    # Slots known to be taken are refused without a transaction, the rest
+    # queue per doctor and are shed with 429 when the queue is full, and
+    # once admitted, contending requests for the same slot in this process
+    # fail fast instead of queueing on the database write lock
+    # (app/reservations.py). The slot lock is taken after admission, so a
+    # request shed from the queue never held it.
+    slot = (payload.doctor_id, payload.date, payload.time)
+    if is_known_taken(*slot):
+        raise HTTPException(status_code=409, detail="Time slot not available")
+    try:
+        with admission.admit(payload.doctor_id), slot_locks.hold(*slot):
+            return _reserve_slot(payload, background_tasks, user)
+    except SlotBusy:
+        raise HTTPException(status_code=409, detail="Time slot not available")
+
+
+def _reserve_slot(payload: AppointmentIn, background_tasks: BackgroundTasks, user: User):
+    # Checks run in a read-only session first, so the write transaction (and
+    # SQLite's write lock) covers only the inserts.
+    with read_only(), db_session() as session:
         doctor = session.get(Doctor, payload.doctor_id)
         if not doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
+        doctor_name = doctor.name
+        if BOOKING_REQUIRE_AVAILABILITY and not is_available(session, payload.doctor_id, payload.date, payload.time):
+            raise HTTPException(status_code=409, detail="Doctor is not available at that time")
         # parse date/time already typed by pydantic (datetime.date/time)
-        conflict = session.exec(select(Appointment).where(
+        conflict = session.exec(select(Appointment.id).where(
             Appointment.doctor_id == payload.doctor_id,
             Appointment.date == payload.date,
             Appointment.time == payload.time,
             Appointment.status == "booked"
         )).first()
         if conflict:
+            mark_taken(payload.doctor_id, payload.date, payload.time)
             raise HTTPException(status_code=409, detail="Time slot not available")
+    with db_session() as session:
         appt = Appointment(patient_id=user.id, doctor_id=payload.doctor_id, date=payload.date, time=payload.time)
         session.add(appt)
-        session.commit()
-        session.refresh(appt)
-        # schedule background sending of confirmation email (stub)
-        background_tasks.add_task(send_email_stub, user.email, "Appointment Confirmed", f"Your appointment with {doctor.name} on {payload.date} at {payload.time} is confirmed.")
-        # create notification record
-        note = Notification(appointment_id=appt.id, message=f"Appointment created for {payload.date} {payload.time}")
-        session.add(note)
-        session.commit()
-        return {"message":"booked", "appointment_id": appt.id}
+        # the appointment and its notification are written in one transaction;
+        # uq_appointment_active_slot rejects a booking that won the slot since the check
+        try:
+            session.flush()
+            appointment_id = appt.id
+            note = Notification(appointment_id=appointment_id, message=f"Appointment created for {payload.date} {payload.time}")
+            session.add(note)
+            stats.record(session, payload.date, payload.doctor_id, None, "booked")
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            mark_taken(payload.doctor_id, payload.date, payload.time)
+            raise HTTPException(status_code=409, detail="Time slot not available")
+    events.publish(events.APPOINTMENT_BOOKED, appointment_id=appointment_id, patient_id=user.id,
+                   doctor_id=payload.doctor_id, date=payload.date, time=payload.time)
+    # schedule background sending of confirmation email (stub)
+    background_tasks.add_task(send_email_stub, user.email, "Appointment Confirmed", f"Your appointment with {doctor_name} on {payload.date} at {payload.time} is confirmed.")
+    return {"message":"booked", "appointment_id": appointment_id}
 
 @router.get("/me", response_model=List[AppointmentOut])
-def my_appointments(user: User = Depends(get_current_user)):
-    with Session(engine) as session:
-        apps = session.exec(select(Appointment).where(Appointment.patient_id == user.id)).all()
-        return apps
+def my_appointments(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: str = Query("json", pattern=FORMAT_PATTERN),
+    user: User = Depends(get_current_user),
+):
+    # Keyset-paginated by appointment ID; see app/pagination.py
+    stmt = select(*APPOINTMENT_COLUMNS).where(Appointment.patient_id == user.id)
+    if format != "json":
+        return stream_response(stmt.order_by(Appointment.id), format, "appointments")
+    with db_session() as session:
+        rows, next_cursor = paginate(session, stmt, [Appointment.id], limit, cursor)
+    set_page_headers(request, response, next_cursor)
+    return APPOINTMENT_ROWS.response(rows, response)
+
+# One guarded UPDATE, like MOVE_STATEMENT: it cancels only a booked row
+# (and only the caller's, unless they are an admin), and returns the slot
+# it actually freed, so a concurrent reschedule cannot make the route
+# publish or count the old one.
+CANCEL_STATEMENT = (
+    update(Appointment.__table__)
+    .where(Appointment.__table__.c.id == bindparam("appointment_id"), Appointment.__table__.c.status == "booked")
+    .values(status="cancelled", version=Appointment.__table__.c.version + 1)
+    .returning(Appointment.__table__.c.patient_id, Appointment.__table__.c.doctor_id,
+               Appointment.__table__.c.date, Appointment.__table__.c.time)
+)
 
 @router.delete("/{appointment_id}")
-def cancel_appointment(appointment_id: int, user: User = Depends(get_current_user)):
-    with Session(engine) as session:
-        appt = session.get(Appointment, appointment_id)
-        if not appt:
-            raise HTTPException(status_code=404, detail="Not found")
-        if appt.patient_id != user.id and user.role != "admin":
-            raise HTTPException(status_code=403, detail="Not authorized")
-        appt.status = "cancelled"
-        session.add(appt)
+def cancel_appointment(appointment_id: int, version: Optional[int] = Query(None, description="Fail with 409 if the appointment has changed since"),
+                       user: User = Depends(get_current_user)):
+    """
+    Cancel a booked appointment. Cancelling one that is no longer booked
+    changes nothing: its version stays, and no event or stats are recorded.
+    """
+    stmt = CANCEL_STATEMENT
+    if user.role != "admin":
+        stmt = stmt.where(Appointment.__table__.c.patient_id == user.id)
+    if version is not None:
+        stmt = stmt.where(Appointment.__table__.c.version == version)
+    with db_session() as session:
+        freed = session.exec(stmt, params={"appointment_id": appointment_id}).first()
+        if freed is None:
+            session.rollback()
+            current = session.exec(select(Appointment.patient_id, Appointment.status, Appointment.version)
+                                   .where(Appointment.id == appointment_id)).first()
+            if current is None:
+                raise HTTPException(status_code=404, detail="Not found")
+            patient_id, status, current_version = current
+            if patient_id != user.id and user.role != "admin":
+                raise HTTPException(status_code=403, detail="Not authorized")
+            if status == "booked" and version is not None and version != current_version:
+                raise HTTPException(status_code=409, detail="Appointment has changed; reload it")
+            return {"message": "cancelled"}
+        patient_id, doctor_id, date, time = freed
+        stats.record(session, date, doctor_id, "booked", "cancelled")
         session.commit()
-        return {"message": "cancelled"}
+    events.publish(events.APPOINTMENT_CANCELLED, appointment_id=appointment_id, patient_id=patient_id,
+                   doctor_id=doctor_id, date=date, time=time)
+    return {"message": "cancelled"}
+
+# ---------------------------------------------------------------------
+# RESCHEDULING
+# ---------------------------------------------------------------------
+# A move changes an appointment's doctor, date and time in place, in one
+# transaction: an UPDATE guarded by the status and by the version the
+# checks read, one notification, and the stats rollups. The appointment
+# keeps its ID and patient, and its old slot is never free before the new
+# one is held: if the new slot was booked since the checks,
+# uq_appointment_active_slot rejects the UPDATE and nothing changes.
+# After commit each move is published as APPOINTMENT_CANCELLED for the old
+# slot and APPOINTMENT_BOOKED for the new one, so taken slots, slot
+# streams, caches and reminders follow it.
+
+STAFF_ROLES = ("doctor", "admin")  # may move any appointment, and use the batch route
+MAX_BATCH_MOVES = 500
+
+@dataclass
+class Move:
+    appointment_id: int
+    patient_id: int
+    version: int  # as read by the checks
+    old: tuple  # (doctor_id, date, time)
+    new: tuple
+
+    def row(self):
+        """The appointment after the move, as an APPOINTMENT_COLUMNS row."""
+        return (self.appointment_id, self.patient_id, *self.new, "booked", self.version + 1)
+
+def plan_moves(rows, requests: List[RescheduleMoveIn], user: User):
+    """
+    Moves for the requested changes, given the appointments' current rows.
+
+    Returns:
+        tuple: (moves, refusals), refusals being (appointment_id, status
+        code, reason) for the requests that cannot be moved.
+    """
+    current = {row[0]: row for row in rows}
+    moves, refused = [], []
+    for request in requests:
+        row = current.get(request.appointment_id)
+        if row is None:
+            refused.append((request.appointment_id, 404, "Not found"))
+            continue
+        appointment_id, patient_id, doctor_id, date, time, status, version = row
+        new = (request.doctor_id or doctor_id, request.date, request.time)
+        if patient_id != user.id and user.role not in STAFF_ROLES:
+            refused.append((appointment_id, 403, "Not authorized"))
+        elif status != "booked":
+            refused.append((appointment_id, 409, f"Appointment is {status}"))
+        elif request.version is not None and request.version != version:
+            refused.append((appointment_id, 409, "Appointment has changed; reload it"))
+        elif new == (doctor_id, date, time):
+            refused.append((appointment_id, 400, "Appointment is already at that time"))
+        else:
+            moves.append(Move(appointment_id, patient_id, version, (doctor_id, date, time), new))
+    return moves, refused
+
+def check_targets(moves: List[Move], doctor_ids, windows, booked):
+    """
+    Refusals for the moves' new slots: the doctor does not exist, is not
+    available then, the slot is booked by an appointment that is not moving
+    away, or two moves want it.
+
+    Args:
+        doctor_ids: The target doctors that exist.
+        windows: Their windows on the target dates, as load_windows() rows.
+        booked: Appointment ID of each target slot booked now, by
+            (doctor_id, date, time).
+    """
+    moving = {m.appointment_id for m in moves}
+    days = defaultdict(list)
+    for window in windows:
+        days[window[0], window[1]].append(window)
+    refused, wanted = [], set()
+    for m in moves:
+        doctor_id, date, time = m.new
+        holder = booked.get(m.new)
+        if doctor_id not in doctor_ids:
+            refused.append((m.appointment_id, 404, "Doctor not found"))
+        elif BOOKING_REQUIRE_AVAILABILITY and not fits_window(days[doctor_id, date], time):
+            refused.append((m.appointment_id, 409, "Doctor is not available at that time"))
+        elif (holder is not None and holder not in moving) or m.new in wanted:
+            refused.append((m.appointment_id, 409, "Time slot not available"))
+        wanted.add(m.new)
+    return refused
+
+def order_moves(moves: List[Move]) -> Optional[List[Move]]:
+    """
+    The moves in an order that never has two booked appointments on one
+    slot: a move into a slot that another move vacates runs after it.
+
+    Returns:
+        list: The moves, or None if some of them form a cycle (say, two
+        appointments swapping slots), which no order can run.
+    """
+    vacating = {m.old: m for m in moves}
+    ordered, placed = [], set()
+    for m in moves:
+        chain, on_chain = [], set()
+        while m is not None and m.appointment_id not in placed:
+            if m.appointment_id in on_chain:
+                return None
+            chain.append(m)
+            on_chain.add(m.appointment_id)
+            m = vacating.get(m.new)
+        for m in reversed(chain):
+            ordered.append(m)
+            placed.add(m.appointment_id)
+    return ordered
+
+def moves_query(ids):
+    return select(*APPOINTMENT_COLUMNS).where(Appointment.id.in_(ids))
+
+def targets_queries(moves: List[Move]):
+    """Queries for check_targets(): existing target doctors, and booked target slots."""
+    doctor_ids = {m.new[0] for m in moves}
+    doctors = select(Doctor.id).where(Doctor.id.in_(doctor_ids))
+    booked = select(Appointment.doctor_id, Appointment.date, Appointment.time, Appointment.id).where(
+        Appointment.status == "booked",
+        tuple_(Appointment.doctor_id, Appointment.date, Appointment.time).in_([m.new for m in moves]),
+    )
+    return doctor_ids, doctors, booked
+
+def target_dates(moves: List[Move]):
+    dates = [m.new[1] for m in moves]
+    return min(dates), max(dates)
+
+def refuse(refused, batch: bool):
+    """Raise the HTTP error for refused moves; for a batch, every refusal is listed."""
+    if not batch:
+        _, status_code, reason = refused[0]
+        raise HTTPException(status_code=status_code, detail=reason)
+    raise HTTPException(status_code=409, detail={
+        "message": f"{len(refused)} move(s) refused; nothing was moved",
+        "refused": [{"appointment_id": a, "reason": reason} for a, _, reason in refused],
+    })
+
+def check_batch(payload: BatchRescheduleIn, user: User):
+    """400/403 for batch requests that are refused before any query."""
+    if user.role not in STAFF_ROLES:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if not payload.moves:
+        raise HTTPException(status_code=400, detail="Provide moves")
+    if len(payload.moves) > MAX_BATCH_MOVES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_MOVES} moves per request")
+    if len({m.appointment_id for m in payload.moves}) < len(payload.moves):
+        raise HTTPException(status_code=400, detail="Each appointment may be moved once per request")
+
+# One UPDATE per move, on the table rather than the model, so the session
+# neither evaluates nor refreshes rows it does not hold.
+MOVE_STATEMENT = (
+    update(Appointment.__table__)
+    .where(
+        Appointment.__table__.c.id == bindparam("appointment_id"),
+        Appointment.__table__.c.version == bindparam("read_version"),
+        Appointment.__table__.c.status == "booked",
+    )
+    .values(doctor_id=bindparam("new_doctor_id"), date=bindparam("new_date"), time=bindparam("new_time"),
+            version=Appointment.__table__.c.version + 1)
+)
+
+def move_params(m: Move):
+    doctor_id, date, time = m.new
+    return {"appointment_id": m.appointment_id, "read_version": m.version,
+            "new_doctor_id": doctor_id, "new_date": date, "new_time": time}
+
+def move_notifications(moves: List[Move]):
+    return [{"appointment_id": m.appointment_id,
+             "message": f"Appointment moved from {m.old[1]} {m.old[2]} to {m.new[1]} {m.new[2]}"
+                        + (" with another doctor" if m.new[0] != m.old[0] else "")}
+            for m in moves]
+
+def stat_moves(moves: List[Move]):
+    return [((m.old[1], m.old[0]), (m.new[1], m.new[0])) for m in moves]
+
+def publish_moves(moves: List[Move]):
+    # Every old slot is freed before any new one is taken: a slot one move
+    # vacates and another fills must end up taken.
+    for m in moves:
+        doctor_id, date, time = m.old
+        events.publish(events.APPOINTMENT_CANCELLED, appointment_id=m.appointment_id, patient_id=m.patient_id,
+                       doctor_id=doctor_id, date=date, time=time)
+    for m in moves:
+        doctor_id, date, time = m.new
+        events.publish(events.APPOINTMENT_BOOKED, appointment_id=m.appointment_id, patient_id=m.patient_id,
+                       doctor_id=doctor_id, date=date, time=time)
+
+def check_moves(session, requests: List[RescheduleMoveIn], user: User, batch: bool) -> List[Move]:
+    """plan_moves() and check_targets() against the database, in dependency order; raises refuse()."""
+    moves, refused = plan_moves(session.exec(moves_query([r.appointment_id for r in requests])).all(),
+                                requests, user)
+    if moves:
+        doctor_ids, doctors, booked = targets_queries(moves)
+        windows = load_windows(session, doctor_ids, *target_dates(moves)) if BOOKING_REQUIRE_AVAILABILITY else []
+        booked = {(d, day, t): a for d, day, t, a in session.exec(booked).all()}
+        refused += check_targets(moves, set(session.exec(doctors).all()), windows, booked)
+    if refused:
+        refuse(refused, batch)
+    ordered = order_moves(moves)
+    if ordered is None:
+        raise HTTPException(status_code=409, detail="Moves form a cycle; move one appointment to a free slot first")
+    return ordered
+
+def write_moves(moves: List[Move], batch: bool):
+    """Run the moves, their notifications and the stats in one transaction."""
+    with db_session() as session:
+        try:
+            for m in moves:
+                if session.exec(MOVE_STATEMENT, params=move_params(m)).rowcount != 1:
+                    session.rollback()
+                    refuse([(m.appointment_id, 409, "Appointment has changed; reload it")], batch)
+            session.exec(insert(Notification), params=move_notifications(moves))
+            stats.record_moves(session, stat_moves(moves))
+            session.commit()
+        except IntegrityError:
+            # A new slot was booked since the checks.
+            session.rollback()
+            if not batch:
+                mark_taken(*moves[0].new)
+            raise HTTPException(status_code=409, detail="Time slot not available")
+    publish_moves(moves)
+
+@router.patch("/{appointment_id}/reschedule", response_model=AppointmentOut)
+def reschedule_appointment(appointment_id: int, payload: RescheduleIn, user: User = Depends(get_current_user)):
+    """
+    Move an appointment to another time, and optionally another doctor, in
+    one transaction. Pass the `version` last read to fail with 409 if the
+    appointment has changed since. The patient, doctors and admins may
+    move it.
+    """
+    request = RescheduleMoveIn(appointment_id=appointment_id, **payload.model_dump())
+    with read_only(), db_session() as session:
+        move, = check_moves(session, [request], user, batch=False)
+    try:
+        # Like booking: the new doctor's admission queue applies, then
+        # contending requests for the new slot fail fast.
+        with admission.admit(move.new[0]), slot_locks.hold(*move.new):
+            write_moves([move], batch=False)
+    except SlotBusy:
+        raise HTTPException(status_code=409, detail="Time slot not available")
+    return json_response(APPOINTMENT_ROWS.dump_one(move.row()))
+
+@router.patch("/reschedule", response_model=BatchRescheduleOut)
+def reschedule_batch(payload: BatchRescheduleIn, user: User = Depends(get_current_user)):
+    """
+    Move many appointments in one transaction, all or nothing: for example a
+    sick doctor's day to another doctor or another day. Doctors and admins
+    only. Moves may go into slots that other moves in the batch vacate.
+    A refused move fails the whole request with 409, listing every refused
+    move and why.
+    """
+    check_batch(payload, user)
+    with read_only(), db_session() as session:
+        moves = check_moves(session, payload.moves, user, batch=True)
+    try:
+        with ExitStack() as held:
+            for slot in sorted(m.new for m in moves):
+                held.enter_context(slot_locks.hold(*slot))
+            write_moves(moves, batch=True)
+    except SlotBusy:
+        raise HTTPException(status_code=409, detail="Time slot not available")
+    return {"moved": len(moves), "appointments": [dict(zip(APPOINTMENT_ROWS.fields, m.row())) for m in moves]}
@@ -0,0 +1,142 @@
+# app/routers/async_appointments_router.py
+# Async (DB_MODE=async) versions of the booking and reschedule routes in
+# appointments_router.py.
+from contextlib import ExitStack
+from typing import List
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from app.database import async_db_session, get_async_session, read_only
+from app.models import Appointment, Doctor, User, Notification
+from app.schemas import (
+    AppointmentIn, AppointmentOut, RescheduleIn, RescheduleMoveIn, BatchRescheduleIn, BatchRescheduleOut,
+)
+from app.auth import get_current_user_async
+from app.utils import send_email_stub
+from app.reservations import async_admission, is_known_taken, mark_taken, slot_locks, SlotBusy
+from app.slots import BOOKING_REQUIRE_AVAILABILITY, is_available_async, load_windows_async
+from app.serialization import json_response
+from app.routers.appointments_router import (
+    APPOINTMENT_ROWS, MOVE_STATEMENT, Move, check_batch, check_targets, move_notifications, move_params,
+    moves_query, order_moves, plan_moves, publish_moves, refuse, stat_moves, target_dates, targets_queries,
+)
+from app import events, stats
+
+router = APIRouter(prefix="/appointments", tags=["appointments"])
+
+@router.post("/", response_model=dict)
+async def book_appointment(payload: AppointmentIn, background_tasks: BackgroundTasks, user: User = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    slot = (payload.doctor_id, payload.date, payload.time)
+    if is_known_taken(*slot):
+        raise HTTPException(status_code=409, detail="Time slot not available")
+    try:
+        async with async_admission.admit_async(payload.doctor_id):
+            with slot_locks.hold(*slot):
+                return await _reserve_slot(session, payload, background_tasks, user)
+    except SlotBusy:
+        raise HTTPException(status_code=409, detail="Time slot not available")
+
+
+async def _reserve_slot(session: AsyncSession, payload: AppointmentIn, background_tasks: BackgroundTasks, user: User):
+    # Checks run in a read-only session first, so the write transaction on
+    # `session` (and SQLite's write lock) covers only the inserts.
+    with read_only():
+        async with async_db_session() as check:
+            doctor = await check.get(Doctor, payload.doctor_id)
+            if not doctor:
+                raise HTTPException(status_code=404, detail="Doctor not found")
+            if BOOKING_REQUIRE_AVAILABILITY and not await is_available_async(check, payload.doctor_id, payload.date, payload.time):
+                raise HTTPException(status_code=409, detail="Doctor is not available at that time")
+            conflict = (await check.exec(select(Appointment.id).where(
+                Appointment.doctor_id == payload.doctor_id,
+                Appointment.date == payload.date,
+                Appointment.time == payload.time,
+                Appointment.status == "booked"
+            ))).first()
+            if conflict:
+                mark_taken(payload.doctor_id, payload.date, payload.time)
+                raise HTTPException(status_code=409, detail="Time slot not available")
+    appt = Appointment(patient_id=user.id, doctor_id=payload.doctor_id, date=payload.date, time=payload.time)
+    session.add(appt)
+    try:
+        await session.flush()
+        session.add(Notification(appointment_id=appt.id, message=f"Appointment created for {payload.date} {payload.time}"))
+        await stats.record_async(session, payload.date, payload.doctor_id, None, "booked")
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        mark_taken(payload.doctor_id, payload.date, payload.time)
+        raise HTTPException(status_code=409, detail="Time slot not available")
+    events.publish(events.APPOINTMENT_BOOKED, appointment_id=appt.id, patient_id=user.id,
+                   doctor_id=payload.doctor_id, date=payload.date, time=payload.time)
+    background_tasks.add_task(send_email_stub, user.email, "Appointment Confirmed", f"Your appointment with {doctor.name} on {payload.date} at {payload.time} is confirmed.")
+    return {"message": "booked", "appointment_id": appt.id}
+
+
+async def check_moves(session: AsyncSession, requests: List[RescheduleMoveIn], user: User, batch: bool) -> List[Move]:
+    """check_moves() of appointments_router.py for an AsyncSession."""
+    rows = (await session.exec(moves_query([r.appointment_id for r in requests]))).all()
+    moves, refused = plan_moves(rows, requests, user)
+    if moves:
+        doctor_ids, doctors, booked = targets_queries(moves)
+        windows = (await load_windows_async(session, doctor_ids, *target_dates(moves))
+                   if BOOKING_REQUIRE_AVAILABILITY else [])
+        booked = {(d, day, t): a for d, day, t, a in (await session.exec(booked)).all()}
+        refused += check_targets(moves, set((await session.exec(doctors)).all()), windows, booked)
+    if refused:
+        refuse(refused, batch)
+    ordered = order_moves(moves)
+    if ordered is None:
+        raise HTTPException(status_code=409, detail="Moves form a cycle; move one appointment to a free slot first")
+    return ordered
+
+
+async def write_moves(session: AsyncSession, moves: List[Move], batch: bool):
+    """write_moves() of appointments_router.py on `session`."""
+    try:
+        for m in moves:
+            if (await session.exec(MOVE_STATEMENT, params=move_params(m))).rowcount != 1:
+                await session.rollback()
+                refuse([(m.appointment_id, 409, "Appointment has changed; reload it")], batch)
+        await session.exec(insert(Notification), params=move_notifications(moves))
+        await stats.record_moves_async(session, stat_moves(moves))
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        if not batch:
+            mark_taken(*moves[0].new)
+        raise HTTPException(status_code=409, detail="Time slot not available")
+    publish_moves(moves)
+
+
+@router.patch("/{appointment_id}/reschedule", response_model=AppointmentOut)
+async def reschedule_appointment(appointment_id: int, payload: RescheduleIn, user: User = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    request = RescheduleMoveIn(appointment_id=appointment_id, **payload.model_dump())
+    with read_only():
+        async with async_db_session() as check:
+            move, = await check_moves(check, [request], user, batch=False)
+    try:
+        async with async_admission.admit_async(move.new[0]):
+            with slot_locks.hold(*move.new):
+                await write_moves(session, [move], batch=False)
+    except SlotBusy:
+        raise HTTPException(status_code=409, detail="Time slot not available")
+    return json_response(APPOINTMENT_ROWS.dump_one(move.row()))
+
+
+@router.patch("/reschedule", response_model=BatchRescheduleOut)
+async def reschedule_batch(payload: BatchRescheduleIn, user: User = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    check_batch(payload, user)
+    with read_only():
+        async with async_db_session() as check:
+            moves = await check_moves(check, payload.moves, user, batch=True)
+    try:
+        with ExitStack() as held:
+            for slot in sorted(m.new for m in moves):
+                held.enter_context(slot_locks.hold(*slot))
+            await write_moves(session, moves, batch=True)
+    except SlotBusy:
+        raise HTTPException(status_code=409, detail="Time slot not available")
+    return {"moved": len(moves), "appointments": [dict(zip(APPOINTMENT_ROWS.fields, m.row())) for m in moves]}
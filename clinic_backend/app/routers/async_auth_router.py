@@ -0,0 +1,45 @@
+# app/routers/async_auth_router.py
+# Async (DB_MODE=async) versions of the routes in auth_router.py.
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import get_async_session
+from app.models import User
+from app.schemas import RegisterIn, LoginIn, TokenOut
+from app.utils import create_access_token
+from app import hashing
+
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+@router.post("/register", response_model=TokenOut)
+async def register(payload: RegisterIn, session: AsyncSession = Depends(get_async_session)):
+    existing = (await session.exec(select(User.id).where(User.email == payload.email))).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    # release the connection while hashing; the session reconnects for the insert
+    await session.close()
+    # bcrypt is CPU-bound; it runs in app.hashing's process pool
+    password_hash = await hashing.hash_password_async(payload.password)
+    user = User(name=payload.name, email=payload.email, password_hash=password_hash, role=payload.role)
+    session.add(user)
+    await session.commit()
+    token = create_access_token({"id": user.id, "role": user.role})
+    return {"access_token": token, "token_type": "bearer"}
+
+@router.post("/login", response_model=TokenOut)
+async def login(payload: LoginIn, session: AsyncSession = Depends(get_async_session)):
+    user = (await session.exec(select(User).where(User.email == payload.email))).first()
+    # release the connection while verifying; `user` stays readable (detached)
+    await session.close()
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    ok, new_hash = await hashing.verify_password_async(payload.password, user.password_hash)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    token = create_access_token({"id": user.id, "role": user.role})
+    if new_hash:
+        # stored hash uses an outdated bcrypt cost; upgrade it in place
+        user.password_hash = new_hash
+        session.add(user)
+        await session.commit()
+    return {"access_token": token, "token_type": "bearer"}
@@ -0,0 +1,95 @@
+# app/routers/async_availability_router.py
+# Async (DB_MODE=async) versions of the routes in availability_router.py.
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy import insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+import datetime
+from app.database import get_async_session
+from app.models import Availability, Doctor
+from app.schemas import AvailabilityIn, BulkAvailabilityIn, BulkAvailabilityOut, DoctorSlotsOut
+from app.slots import DEFAULT_SLOT_MINUTES, load_windows_async, load_occupancy_async
+from app.routers.availability_router import (
+    MAX_SLOT_DOCTORS, slot_range, doctor_slots, slots_body, windows_body,
+    check_can_set, expand_bulk, resolve_overlaps, bulk_rows, bulk_summary,
+)
+from app.auth import get_current_user_async
+from app.serialization import json_response
+from app import events, read_cache
+
+router = APIRouter(prefix="/availability", tags=["availability"])
+
+@router.post("/", response_model=AvailabilityIn)
+async def add_availability(payload: AvailabilityIn, doctor = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    check_can_set(doctor, payload.doctor_id)
+    doc = await session.get(Doctor, payload.doctor_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    avail = Availability(doctor_id=payload.doctor_id, date=payload.date, start_time=payload.start_time, end_time=payload.end_time)
+    session.add(avail)
+    await session.commit()
+    events.publish(events.AVAILABILITY_ADDED, doctor_id=payload.doctor_id, dates=[payload.date])
+    return payload
+
+@router.post("/bulk", response_model=BulkAvailabilityOut)
+async def add_availability_bulk(payload: BulkAvailabilityIn, doctor = Depends(get_current_user_async), session: AsyncSession = Depends(get_async_session)):
+    check_can_set(doctor, payload.doctor_id)
+    windows = expand_bulk(payload)
+    dates = [d for d, _, _ in windows]
+    if not await session.get(Doctor, payload.doctor_id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    existing = await load_windows_async(session, [payload.doctor_id], min(dates), max(dates))
+    accepted, overlaps = resolve_overlaps(windows, existing, payload.on_overlap)
+    if accepted:
+        await session.exec(insert(Availability), params=bulk_rows(payload.doctor_id, accepted))
+    await session.commit()
+    if accepted:
+        events.publish(events.AVAILABILITY_ADDED, doctor_id=payload.doctor_id,
+                       dates=sorted({d for d, _, _ in accepted}))
+    return bulk_summary(payload.doctor_id, accepted, overlaps)
+
+# Declared before /{doctor_id} so "slots" is not parsed as a doctor ID.
+@router.get("/slots", response_model=List[DoctorSlotsOut])
+async def get_slots_batch(
+    doctor_ids: List[int] = Query(...),
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+    slot_minutes: int = Query(DEFAULT_SLOT_MINUTES, ge=5, le=480),
+    session: AsyncSession = Depends(get_async_session),
+):
+    if len(doctor_ids) > MAX_SLOT_DOCTORS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SLOT_DOCTORS} doctors per request")
+    date_from, date_to = slot_range(date_from, date_to)
+    doctor_ids = list(dict.fromkeys(doctor_ids))
+    occupancy = await load_occupancy_async(session, doctor_ids, date_from, date_to)
+    return doctor_slots(occupancy, doctor_ids, date_from, date_to, slot_minutes)
+
+@router.get("/{doctor_id}/slots", response_model=DoctorSlotsOut)
+async def get_slots(
+    doctor_id: int,
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+    slot_minutes: int = Query(DEFAULT_SLOT_MINUTES, ge=5, le=480),
+    session: AsyncSession = Depends(get_async_session),
+):
+    date_from, date_to = slot_range(date_from, date_to)
+    cache_key, body = await read_cache.lookup_async(f"slots:{doctor_id}", (date_from, date_to, slot_minutes))
+    if body is None:
+        occupancy = await load_occupancy_async(session, [doctor_id], date_from, date_to)
+        body = slots_body(occupancy, doctor_id, date_from, date_to, slot_minutes)
+        await read_cache.store_async(cache_key, body)
+    return json_response(body)
+
+@router.get("/{doctor_id}", response_model=List[AvailabilityIn])
+async def get_availability(
+    doctor_id: int,
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    date_from, date_to = slot_range(date_from, date_to)
+    cache_key, body = await read_cache.lookup_async(f"availability:{doctor_id}", (date_from, date_to))
+    if body is None:
+        body = windows_body(await load_windows_async(session, [doctor_id], date_from, date_to))
+        await read_cache.store_async(cache_key, body)
+    return json_response(body)
@@ -0,0 +1,48 @@
+# app/routers/async_doctors_router.py
+# Async (DB_MODE=async) version of the public doctor listing in doctors_router.py.
+
+from fastapi import APIRouter, Query, Request, Response
+from app.database import async_db_session
+from app.schemas import DoctorOut
+from app.serialization import json_response
+from app.directory import DOCTOR_ROWS, KEY_COLUMNS, doctor_query, not_modified, pack_page, tag_page, unpack_page
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate_async, set_page_headers
+from typing import List, Optional
+from app import read_cache
+
+router = APIRouter(prefix="/doctors", tags=["doctors"])
+
+
+# ---------------------------------------------------------------------
+# LIST ALL DOCTORS (PUBLIC)
+# ---------------------------------------------------------------------
+@router.get("/", response_model=List[DoctorOut])
+async def list_doctors(
+    request: Request,
+    response: Response,
+    specialty: Optional[str] = None,
+    clinic_id: Optional[int] = None,
+    name: Optional[str] = Query(None, min_length=1, description="Case-sensitive name prefix"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    Retrieves one page of the doctor directory; same parameters, query,
+    ETag handling and read cache as the sync route. The session is opened
+    only when the page is neither answered with 304 nor found in the cache.
+    """
+    key = (specialty, clinic_id, name, limit, cursor)
+    cached = not_modified(request, key)
+    if cached:
+        return cached
+
+    cache_key, page = await read_cache.lookup_async("doctors", key)
+    if page is None:
+        async with async_db_session() as session:
+            rows, next_cursor = await paginate_async(session, doctor_query(specialty, clinic_id, name), KEY_COLUMNS, limit, cursor)
+        body = DOCTOR_ROWS.dump(rows)
+        await read_cache.store_async(cache_key, pack_page(body, next_cursor))
+    else:
+        body, next_cursor = unpack_page(page)
+    set_page_headers(request, response, next_cursor)
+    return tag_page(request, response, key, body, next_cursor) or json_response(body, response)
@@ -1,31 +1,50 @@
 # app/routers/auth_router.py
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from app.database import engine
+from sqlmodel import select
+from app.database import db_session
 from app.models import User
 from app.schemas import RegisterIn, LoginIn, TokenOut
-from app.utils import hash_password, verify_password, create_access_token
+from app.utils import create_access_token
+from app import hashing
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+# bcrypt runs in app.hashing's process pool; when it is saturated these
+# routes raise HashingBusy, which main.py answers with 503 + Retry-After.
+# No database session is open while a hash is computed, so a login storm
+# cannot drain the connection pool that every other route needs.
+
 @router.post("/register", response_model=TokenOut)
 def register(payload: RegisterIn):
-    with Session(engine) as session:
-        existing = session.exec(select(User).where(User.email == payload.email)).first()
-        if existing:
-            raise HTTPException(status_code=400, detail="Email already registered")
-        user = User(name=payload.name, email=payload.email, password_hash=hash_password(payload.password), role=payload.role)
+    with db_session() as session:
+        existing = session.exec(select(User.id).where(User.email == payload.email)).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    password_hash = hashing.hash_password(payload.password)
+    with db_session() as session:
+        user = User(name=payload.name, email=payload.email, password_hash=password_hash, role=payload.role)
         session.add(user)
         session.commit()
         session.refresh(user)
         token = create_access_token({"id": user.id, "role": user.role})
-        return {"access_token": token}
+        return {"access_token": token, "token_type": "bearer"}
 
 @router.post("/login", response_model=TokenOut)
 def login(payload: LoginIn):
-    with Session(engine) as session:
+    with db_session() as session:
         user = session.exec(select(User).where(User.email == payload.email)).first()
-        if not user or not verify_password(payload.password, user.password_hash):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        token = create_access_token({"id": user.id, "role": user.role})
-        return {"access_token": token}
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    ok, new_hash = hashing.verify_password(payload.password, user.password_hash)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    token = create_access_token({"id": user.id, "role": user.role})
+    if new_hash:
+        # stored hash uses an outdated bcrypt cost; upgrade it in place
+        with db_session() as session:
+            stored = session.get(User, user.id)
+            if stored and stored.password_hash == user.password_hash:
+                stored.password_hash = new_hash
+                session.add(stored)
+                session.commit()
+    return {"access_token": token, "token_type": "bearer"}
@@ -1,32 +1,371 @@
 # app/routers/availability_router.py
-from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import Session, select
-from typing import List
-from app.database import engine
-from app.models import Availability, Doctor
-from app.schemas import AvailabilityIn
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import delete, insert
+from sqlmodel import select
+from typing import List, Optional
+import datetime
+from app.database import db_session
+from app.models import Availability, AvailabilityOverride, AvailabilityTemplate, Doctor
+from app.schemas import (
+    AvailabilityIn, BulkAvailabilityIn, BulkAvailabilityOut, DoctorSlotsOut,
+    AvailabilityTemplateIn, AvailabilityTemplateOut, TemplateEndIn, OverrideWindowIn,
+)
+from app.recurring import template_query
+from app.schedules import expand_rule, split_overlaps
+from app.slots import DEFAULT_SLOT_MINUTES, load_windows, load_occupancy, resolve_range
 from app.auth import get_current_user, require_role
+from app.serialization import RowSerializer, json_response
+from app.streams import broker
+from app import events, read_cache
 
 router = APIRouter(prefix="/availability", tags=["availability"])
 
-@router.post("/", response_model=AvailabilityIn)
-def add_availability(payload: AvailabilityIn, doctor = Depends(get_current_user)):
+def check_can_set(user, doctor_id):
     # Ensure the user is the doctor setting availability (or admin)
-    if doctor.role not in ("doctor", "admin") and doctor.id != payload.doctor_id:
+    if user.role not in ("doctor", "admin") and user.id != doctor_id:
         raise HTTPException(status_code=403, detail="Not authorized to set availability")
-    with Session(engine) as session:
+
+@router.post("/", response_model=AvailabilityIn)
+def add_availability(payload: AvailabilityIn, doctor = Depends(get_current_user)):
+    check_can_set(doctor, payload.doctor_id)
+    with db_session() as session:
         doc = session.get(Doctor, payload.doctor_id)
         if not doc:
             raise HTTPException(status_code=404, detail="Doctor not found")
         avail = Availability(doctor_id=payload.doctor_id, date=payload.date, start_time=payload.start_time, end_time=payload.end_time)
         session.add(avail)
         session.commit()
-        session.refresh(avail)
+        events.publish(events.AVAILABILITY_ADDED, doctor_id=payload.doctor_id, dates=[payload.date])
         return payload
 
+# ---------------------------------------------------------------------
+# BULK IMPORT
+# ---------------------------------------------------------------------
+
+MAX_BULK_WINDOWS = 20000
+MAX_REPORTED_OVERLAPS = 50
+
+def expand_bulk(payload: BulkAvailabilityIn):
+    """Explicit windows plus expanded rules, validated (400 on bad input)."""
+    windows = [(w.date, w.start_time, w.end_time) for w in payload.windows]
+    if any(end <= start for _, start, end in windows):
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+    try:
+        for rule in payload.rules:
+            windows.extend(expand_rule(rule.weekdays, rule.start_time, rule.end_time,
+                                       rule.date_from, rule.date_to, rule.exceptions))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not windows:
+        raise HTTPException(status_code=400, detail="Provide windows or rules")
+    if len(windows) > MAX_BULK_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_WINDOWS} windows per request")
+    return windows
+
+def resolve_overlaps(windows, existing_rows, on_overlap):
+    """Accepted windows and overlap report; 409 if any overlap and on_overlap is "reject"."""
+    accepted, overlaps = split_overlaps(windows, [(d, s, e) for _, d, s, e in existing_rows])
+    if overlaps and on_overlap == "reject":
+        raise HTTPException(status_code=409, detail={
+            "message": f"{len(overlaps)} window(s) overlap; nothing was inserted",
+            "overlaps": jsonable_encoder(overlaps[:MAX_REPORTED_OVERLAPS]),
+        })
+    return accepted, overlaps
+
+def bulk_rows(doctor_id, accepted):
+    return [{"doctor_id": doctor_id, "date": d, "start_time": s, "end_time": e} for d, s, e in accepted]
+
+def bulk_summary(doctor_id, accepted, overlaps):
+    dates = [d for d, _, _ in accepted]
+    return {
+        "doctor_id": doctor_id,
+        "inserted": len(accepted),
+        "skipped": len(overlaps),
+        "date_from": min(dates) if dates else None,
+        "date_to": max(dates) if dates else None,
+        "overlaps": overlaps[:MAX_REPORTED_OVERLAPS],
+    }
+
+@router.post("/bulk", response_model=BulkAvailabilityOut)
+def add_availability_bulk(payload: BulkAvailabilityIn, doctor = Depends(get_current_user)):
+    """
+    Insert many availability windows for one doctor in one transaction.
+
+    Windows come from `windows` and/or recurrence `rules` (weekdays, time
+    range, date range, exception dates) expanded server-side. They are
+    checked in memory against each other and against the doctor's existing
+    windows, concrete and recurring, then inserted with a single executemany. With
+    on_overlap="reject" (default) any overlap fails the whole request with
+    409; with "skip" overlapping windows are left out and counted.
+    """
+    check_can_set(doctor, payload.doctor_id)
+    windows = expand_bulk(payload)
+    dates = [d for d, _, _ in windows]
+    with db_session() as session:
+        if not session.get(Doctor, payload.doctor_id):
+            raise HTTPException(status_code=404, detail="Doctor not found")
+        existing = load_windows(session, [payload.doctor_id], min(dates), max(dates))
+        accepted, overlaps = resolve_overlaps(windows, existing, payload.on_overlap)
+        if accepted:
+            session.exec(insert(Availability), params=bulk_rows(payload.doctor_id, accepted))
+        session.commit()
+    if accepted:
+        events.publish(events.AVAILABILITY_ADDED, doctor_id=payload.doctor_id,
+                       dates=sorted({d for d, _, _ in accepted}))
+    return bulk_summary(payload.doctor_id, accepted, overlaps)
+
+# ---------------------------------------------------------------------
+# RECURRING TEMPLATES
+# ---------------------------------------------------------------------
+# Weekly windows with an effective date range, plus per-date overrides,
+# expanded on read by app/recurring.py. Declared before /{doctor_id}.
+
+def template_windows_in(payload: AvailabilityTemplateIn):
+    """(weekday, start, end) windows of the payload, validated (400 on bad input)."""
+    if not payload.windows:
+        raise HTTPException(status_code=400, detail="Provide at least one window")
+    if payload.effective_to and payload.effective_to < payload.effective_from:
+        raise HTTPException(status_code=400, detail="effective_to must not be before effective_from")
+    windows = [(w.weekday, w.start_time, w.end_time) for w in payload.windows]
+    if any(end <= start for _, start, end in windows):
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+    return windows
+
+def reject_template_overlaps(windows, existing_rows):
+    """409 if a window overlaps another one, or an existing template in effect on the same weekday."""
+    _, overlaps = split_overlaps(windows, [(w, s, e) for _, w, s, e, _, _ in existing_rows])
+    if overlaps:
+        raise HTTPException(status_code=409, detail={
+            "message": f"{len(overlaps)} window(s) overlap; nothing was saved",
+            "overlaps": jsonable_encoder([
+                {"weekday": o["date"], "start_time": o["start_time"], "end_time": o["end_time"], "overlaps": o["overlaps"]}
+                for o in overlaps[:MAX_REPORTED_OVERLAPS]
+            ]),
+        })
+
+def get_template(session, template_id, user):
+    template = session.get(AvailabilityTemplate, template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    check_can_set(user, template.doctor_id)
+    return template
+
+@router.post("/templates", response_model=List[AvailabilityTemplateOut])
+def add_template(payload: AvailabilityTemplateIn, user = Depends(get_current_user)):
+    """
+    Add weekly windows for a doctor, in effect from `effective_from` to
+    `effective_to` (inclusive; open-ended when omitted). One row is stored
+    per weekday window however long the range is. Overlapping windows on
+    the same weekday, within the request or with a template in effect over
+    the same dates, fail the request with 409.
+    """
+    check_can_set(user, payload.doctor_id)
+    windows = template_windows_in(payload)
+    with db_session() as session:
+        if not session.get(Doctor, payload.doctor_id):
+            raise HTTPException(status_code=404, detail="Doctor not found")
+        existing = session.exec(template_query(
+            [payload.doctor_id], payload.effective_from, payload.effective_to or datetime.date.max)).all()
+        reject_template_overlaps(windows, existing)
+        templates = [AvailabilityTemplate(doctor_id=payload.doctor_id, weekday=w, start_time=s, end_time=e,
+                                          effective_from=payload.effective_from, effective_to=payload.effective_to)
+                     for w, s, e in windows]
+        session.add_all(templates)
+        session.flush()
+        created = [t.model_dump() for t in templates]
+        session.commit()
+    events.publish(events.AVAILABILITY_CHANGED, doctor_id=payload.doctor_id,
+                   date_from=payload.effective_from, date_to=payload.effective_to)
+    return created
+
+@router.get("/templates/{doctor_id}", response_model=List[AvailabilityTemplateOut])
+def list_templates(doctor_id: int):
+    with db_session() as session:
+        return session.exec(select(AvailabilityTemplate).where(AvailabilityTemplate.doctor_id == doctor_id).order_by(
+            AvailabilityTemplate.effective_from, AvailabilityTemplate.weekday, AvailabilityTemplate.start_time)).all()
+
+@router.patch("/templates/{template_id}", response_model=AvailabilityTemplateOut)
+def end_template(template_id: int, payload: TemplateEndIn, user = Depends(get_current_user)):
+    """
+    Move a template's `effective_to`, e.g. to end it before a new weekly
+    pattern takes over. `null` makes it open-ended again.
+    """
+    with db_session() as session:
+        template = get_template(session, template_id, user)
+        if payload.effective_to and payload.effective_to < template.effective_from:
+            raise HTTPException(status_code=400, detail="effective_to must not be before effective_from")
+        others = session.exec(template_query(
+            [template.doctor_id], template.effective_from, payload.effective_to or datetime.date.max,
+        ).where(AvailabilityTemplate.id != template_id)).all()
+        reject_template_overlaps([(template.weekday, template.start_time, template.end_time)], others)
+        template.effective_to = payload.effective_to
+        session.add(template)
+        session.commit()
+        session.refresh(template)
+        result = template.model_dump()
+    events.publish(events.AVAILABILITY_CHANGED, doctor_id=result["doctor_id"],
+                   date_from=result["effective_from"], date_to=None)
+    return result
+
+@router.delete("/templates/{template_id}")
+def delete_template(template_id: int, user = Depends(get_current_user)):
+    with db_session() as session:
+        template = get_template(session, template_id, user)
+        changed = dict(doctor_id=template.doctor_id, date_from=template.effective_from, date_to=template.effective_to)
+        session.delete(template)
+        session.commit()
+    events.publish(events.AVAILABILITY_CHANGED, **changed)
+    return {"message": "deleted"}
+
+@router.put("/overrides/{doctor_id}/{date}", response_model=List[OverrideWindowIn])
+def set_override(doctor_id: int, date: datetime.date, windows: List[OverrideWindowIn], user = Depends(get_current_user)):
+    """
+    Replace the doctor's template windows on one date with `windows`; an
+    empty list closes the day. Concrete windows added with POST / are not
+    affected.
+    """
+    check_can_set(user, doctor_id)
+    spans = [(date, w.start_time, w.end_time) for w in windows]
+    if any(end <= start for _, start, end in spans):
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+    if split_overlaps(spans, [])[1]:
+        raise HTTPException(status_code=409, detail="Override windows overlap")
+    with db_session() as session:
+        if not session.get(Doctor, doctor_id):
+            raise HTTPException(status_code=404, detail="Doctor not found")
+        session.exec(delete(AvailabilityOverride).where(
+            AvailabilityOverride.doctor_id == doctor_id, AvailabilityOverride.date == date))
+        rows = [{"doctor_id": doctor_id, "date": date, "start_time": s, "end_time": e} for _, s, e in spans]
+        session.exec(insert(AvailabilityOverride), params=rows or [{"doctor_id": doctor_id, "date": date}])
+        session.commit()
+    events.publish(events.AVAILABILITY_CHANGED, doctor_id=doctor_id, date_from=date, date_to=date)
+    return windows
+
+@router.delete("/overrides/{doctor_id}/{date}")
+def delete_override(doctor_id: int, date: datetime.date, user = Depends(get_current_user)):
+    """Go back to the template windows on that date."""
+    check_can_set(user, doctor_id)
+    with db_session() as session:
+        removed = session.exec(delete(AvailabilityOverride).where(
+            AvailabilityOverride.doctor_id == doctor_id, AvailabilityOverride.date == date)).rowcount
+        session.commit()
+    if not removed:
+        raise HTTPException(status_code=404, detail="No override on that date")
+    events.publish(events.AVAILABILITY_CHANGED, doctor_id=doctor_id, date_from=date, date_to=date)
+    return {"message": "deleted"}
+
+# Batch limit for /slots so one request cannot ask for the whole directory
+MAX_SLOT_DOCTORS = 200
+
+def slot_range(date_from, date_to):
+    try:
+        return resolve_range(date_from, date_to)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+def doctor_slots(occupancy, doctor_ids, date_from, date_to, slot_minutes):
+    return [
+        {"doctor_id": d, "slot_minutes": slot_minutes,
+         "days": occupancy.free_slots(d, date_from, date_to, slot_minutes)}
+        for d in doctor_ids
+    ]
+
+SLOTS_JSON = TypeAdapter(DoctorSlotsOut)
+
+def slots_body(occupancy, doctor_id, date_from, date_to, slot_minutes):
+    """One doctor's slots, encoded for the read cache."""
+    slots = doctor_slots(occupancy, [doctor_id], date_from, date_to, slot_minutes)[0]
+    return SLOTS_JSON.dump_json(SLOTS_JSON.validate_python(slots))
+
+# Declared before /{doctor_id} so "slots" is not parsed as a doctor ID.
+@router.get("/slots", response_model=List[DoctorSlotsOut])
+def get_slots_batch(
+    doctor_ids: List[int] = Query(..., description="Repeat for each doctor: ?doctor_ids=1&doctor_ids=2"),
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+    slot_minutes: int = Query(DEFAULT_SLOT_MINUTES, ge=5, le=480),
+):
+    """
+    Bookable start times for several doctors, using one query per table
+    regardless of how many doctors are requested.
+    """
+    if len(doctor_ids) > MAX_SLOT_DOCTORS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SLOT_DOCTORS} doctors per request")
+    date_from, date_to = slot_range(date_from, date_to)
+    doctor_ids = list(dict.fromkeys(doctor_ids))
+    with db_session() as session:
+        occupancy = load_occupancy(session, doctor_ids, date_from, date_to)
+    return doctor_slots(occupancy, doctor_ids, date_from, date_to, slot_minutes)
+
+@router.get("/{doctor_id}/slots", response_model=DoctorSlotsOut)
+def get_slots(
+    doctor_id: int,
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+    slot_minutes: int = Query(DEFAULT_SLOT_MINUTES, ge=5, le=480),
+):
+    """
+    Bookable start times for one doctor between `from` and `to` (inclusive,
+    default: today and the following 13 days). Active appointments are
+    subtracted from the doctor's availability windows. Served from the
+    read cache (app/read_cache.py) until the doctor's windows or bookings
+    change.
+    """
+    date_from, date_to = slot_range(date_from, date_to)
+    cache_key, body = read_cache.lookup(f"slots:{doctor_id}", (date_from, date_to, slot_minutes))
+    if body is None:
+        with db_session() as session:
+            occupancy = load_occupancy(session, [doctor_id], date_from, date_to)
+        body = slots_body(occupancy, doctor_id, date_from, date_to, slot_minutes)
+        read_cache.store(cache_key, body)
+    return json_response(body)
+
+def doctor_exists(doctor_id):
+    with db_session() as session:
+        return session.get(Doctor, doctor_id) is not None
+
+@router.get("/{doctor_id}/events", response_class=StreamingResponse)
+async def stream_events(doctor_id: int):
+    """
+    Server-sent events for the doctor's slots: `slot.taken`, `slot.freed`,
+    `availability.added`, `availability.changed`, and `resync` when the
+    client fell behind and events were dropped (see app/streams.py).
+    Once the stream has opened, fetch GET /availability/{doctor_id} and
+    apply the events to it.
+    """
+    if not await run_in_threadpool(doctor_exists, doctor_id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    broker.check_capacity()
+    return StreamingResponse(broker.stream(doctor_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+WINDOW_ROWS = RowSerializer(AvailabilityIn)  # (doctor_id, date, start_time, end_time) rows
+
+def windows_body(rows):
+    return WINDOW_ROWS.dump(sorted(rows, key=lambda r: r[1:]))
+
 @router.get("/{doctor_id}", response_model=List[AvailabilityIn])
-def get_availability(doctor_id: int):
-    with Session(engine) as session:
-        avails = session.exec(select(Availability).where(Availability.doctor_id == doctor_id)).all()
-        return avails
+def get_availability(
+    doctor_id: int,
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+):
+    """
+    The doctor's windows between `from` and `to` (inclusive, default: today
+    and the following 13 days): concrete windows plus the windows generated
+    by recurring templates, ordered by date and start time. Served from
+    the read cache (app/read_cache.py) until the doctor's windows change.
+    """
+    date_from, date_to = slot_range(date_from, date_to)
+    cache_key, body = read_cache.lookup(f"availability:{doctor_id}", (date_from, date_to))
+    if body is None:
+        with db_session() as session:
+            rows = load_windows(session, [doctor_id], date_from, date_to)
+        body = windows_body(rows)
+        read_cache.store(cache_key, body)
+    return json_response(body)
 
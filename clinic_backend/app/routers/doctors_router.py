@@ -1,12 +1,17 @@
 # app/routers/doctors_router.py
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import Session, select
-from app.database import engine
-from app.models import Doctor, Clinic
-from app.schemas import DoctorOut
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from app.database import db_session
+from app.models import Doctor
+from app.directory import DOCTOR_ROWS, KEY_COLUMNS, doctor_query, not_modified, pack_page, tag_page, unpack_page
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate, set_page_headers
+from app.schemas import DoctorOut, NextSlotOut
+from app.serialization import json_response
+from typing import List, Optional
 from app.auth import require_role, get_current_user
+from app import events, read_cache
+from app.next_available import index as next_available_index
+import datetime
 
 # Router for all doctor-related endpoints
 router = APIRouter(prefix="/doctors", tags=["doctors"])
@@ -30,11 +35,13 @@ def create_doctor(payload: Doctor, admin=Depends(require_role("admin"))):
         DoctorOut: A clean representation of the doctor, including clinic name.
     """
 
-    with Session(engine) as session:
+    with db_session() as session:
         # Add and save doctor to the database
         session.add(payload)
         session.commit()
         session.refresh(payload)
+        events.publish(events.DOCTOR_CREATED, doctor_id=payload.id, name=payload.name,
+                       specialty=payload.specialty, clinic_id=payload.clinic_id)
 
         # Format response with clinic name for readability
         return {
@@ -46,43 +53,84 @@ def create_doctor(payload: Doctor, admin=Depends(require_role("admin"))):
 
 
 # ---------------------------------------------------------------------
-# LIST ALL DOCTORS (PUBLIC)
+# NEXT AVAILABLE APPOINTMENT (PUBLIC)
 # ---------------------------------------------------------------------
-@router.get("/", response_model=List[DoctorOut])
-def list_doctors():
+@router.get("/next-available", response_model=List[NextSlotOut])
+def next_available(
+    specialty: str,
+    clinic_id: Optional[int] = None,
+    date_from: Optional[datetime.date] = Query(None, alias="from"),
+    date_to: Optional[datetime.date] = Query(None, alias="to"),
+    k: int = Query(10, ge=1, le=100),
+):
     """
-    Retrieves a list of all doctors in the system.
-
-    This endpoint is public (does not require login).
+    Returns the k earliest open slots across all doctors of a specialty.
 
-    For each doctor:
-        - Fetches doctor details
-        - If the doctor belongs to a clinic, retrieves the clinic name
+    Args:
+        specialty (str): Specialty to search (case-insensitive).
+        clinic_id (int, optional): Restrict to one clinic.
+        from / to (date, optional): Search window; defaults to today and
+            the index horizon (NEXT_AVAILABLE_HORIZON_DAYS).
+        k (int): Number of slots to return.
 
     Returns:
-        List[DoctorOut]: A list of doctors with their clinic names.
+        List[NextSlotOut]: Slots ordered by start time.
     """
+    horizon_start, horizon_end = next_available_index.horizon
+    date_from = max(date_from or horizon_start, horizon_start)
+    date_to = min(date_to or horizon_end, horizon_end)
+    if date_to < date_from:
+        return []
+    return next_available_index.search(specialty, date_from, date_to, clinic_id=clinic_id, k=k)
 
-    with Session(engine) as session:
-        # Query all doctors
-        docs = session.exec(select(Doctor)).all()
 
-        formatted = []
+# ---------------------------------------------------------------------
+# LIST ALL DOCTORS (PUBLIC)
+# ---------------------------------------------------------------------
+@router.get("/", response_model=List[DoctorOut])
+def list_doctors(
+    request: Request,
+    response: Response,
+    specialty: Optional[str] = None,
+    clinic_id: Optional[int] = None,
+    name: Optional[str] = Query(None, min_length=1, description="Case-sensitive name prefix"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    Retrieves one page of the doctor directory, ordered by name.
 
-        # Build output with clinic name included
-        for d in docs:
-            clinic_name = None
+    This endpoint is public (does not require login).
 
-            # If doctor has an associated clinic, retrieve its name
-            if d.clinic_id:
-                clinic = session.get(Clinic, d.clinic_id)
-                clinic_name = clinic.name if clinic else None
+    Doctors and their clinic names are fetched in a single joined query
+    (see app/directory.py). The cursor for the next page is returned in the
+    X-Next-Cursor header. Pages carry an ETag; a request with a matching
+    If-None-Match gets 304 Not Modified, without a database query when the
+    ETag is still remembered. Other requests are served from the read
+    cache (app/read_cache.py) until a doctor is created.
 
-            formatted.append({
-                "id": d.id,
-                "name": d.name,
-                "specialty": d.specialty,
-                "clinic": clinic_name,
-            })
+    Args:
+        specialty (str, optional): Exact specialty.
+        clinic_id (int, optional): Restrict to one clinic.
+        name (str, optional): Name prefix.
+        limit (int): Page size.
+        cursor (str, optional): X-Next-Cursor of the previous page.
 
-        return formatted
+    Returns:
+        List[DoctorOut]: A page of doctors with their clinic names.
+    """
+    key = (specialty, clinic_id, name, limit, cursor)
+    cached = not_modified(request, key)
+    if cached:
+        return cached
+
+    cache_key, page = read_cache.lookup("doctors", key)
+    if page is None:
+        with db_session() as session:
+            rows, next_cursor = paginate(session, doctor_query(specialty, clinic_id, name), KEY_COLUMNS, limit, cursor)
+        body = DOCTOR_ROWS.dump(rows)
+        read_cache.store(cache_key, pack_page(body, next_cursor))
+    else:
+        body, next_cursor = unpack_page(page)
+    set_page_headers(request, response, next_cursor)
+    return tag_page(request, response, key, body, next_cursor) or json_response(body, response)
@@ -2,9 +2,7 @@
 
 from fastapi import APIRouter, BackgroundTasks
 from app.utils import send_email_stub
-from app.database import engine
-from sqlmodel import Session, select
-from app.models import Notification, Appointment, User
+from app.outbox import OutboxWorker
 
 # Router for all notification-related endpoints
 router = APIRouter(prefix="/notifications", tags=["notifications"])
@@ -43,50 +41,23 @@ def send_notification(email: str, subject: str, message: str, background_tasks:
 @router.post("/dispatch_pending")
 def dispatch_pending():
     """
-    Sends all notifications that are marked as 'pending' in the database.
+    Delivers every pending notification through the outbox worker.
 
-    This simulates how a real system would send queued notifications.
-    For each pending notification:
-        - Finds the related appointment
-        - Retrieves the associated user (patient)
-        - Sends an email
-        - Marks the notification as 'sent'
+    Notifications are claimed in batches, their recipients resolved with one
+    joined query per batch, sent with bounded concurrency and settled with
+    one commit per batch (see app/outbox.py). Failed sends are retried
+    later with backoff. A long-running `python -m app.outbox` worker does
+    the same job continuously; both can run at once.
 
     Returns:
-        dict: Count of notifications that were processed
+        dict: Notifications sent, skipped (no recipient) and failed, the
+        number of batches and the delivery rate in notifications per second.
     """
-
-    with Session(engine) as session:
-
-        # Fetch notifications that have not yet been sent
-        pending = session.exec(
-            select(Notification).where(Notification.sent == False)
-        ).all()
-
-        # Loop through each pending notification
-        for n in pending:
-
-            # Check if notification is linked to an appointment
-            if n.appointment_id:
-                appt = session.get(Appointment, n.appointment_id)
-
-                # If appointment exists, find the user who booked it
-                if appt:
-                    user = session.get(User, appt.patient_id)
-
-                    # If user exists, send email
-                    if user:
-                        send_email_stub(
-                            user.email,
-                            "Notification",
-                            n.message
-                        )
-
-            # Mark notification as sent
-            n.sent = True
-            session.add(n)
-
-        # Commit the updated records to the database
-        session.commit()
-
-    return {"sent": len(pending)}
+    totals = OutboxWorker().drain()
+    return {
+        "sent": totals["delivered"],
+        "no_recipient": totals["no_recipient"],
+        "failed": totals["failed"],
+        "batches": totals["batches"],
+        "per_second": totals["per_second"],
+    }
@@ -0,0 +1,96 @@
+# app/schedules.py
+"""
+Schedule expansion and overlap checks for bulk availability imports.
+
+A recurrence rule ("Mondays and Thursdays, 09:00-12:00, from 1 March to
+31 May, except 18 April") expands to one window per matching day. Windows
+are half-open [start, end), so 09:00-12:00 and 12:00-15:00 do not overlap.
+
+Overlaps are found in memory: the doctor's existing windows for the
+affected dates are loaded with one query, and each new window is checked
+by bisecting the existing windows of its day and sweeping the new windows
+of the day in start order.
+"""
+import bisect
+import datetime
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from app.slots import MAX_RANGE_DAYS
+
+Window = Tuple[datetime.date, datetime.time, datetime.time]
+
+
+def expand_rule(weekdays: Iterable[int], start_time: datetime.time, end_time: datetime.time,
+                date_from: datetime.date, date_to: datetime.date,
+                exceptions: Iterable[datetime.date] = ()) -> List[Window]:
+    """
+    Windows for every day in [date_from, date_to] whose weekday (Monday = 0)
+    is in `weekdays`, except the `exceptions` dates.
+
+    Raises:
+        ValueError: Empty or inverted time range, date range longer than
+            MAX_RANGE_DAYS, or a weekday outside 0-6.
+    """
+    if end_time <= start_time:
+        raise ValueError("end_time must be after start_time")
+    if date_to < date_from:
+        raise ValueError("date_to must not be before date_from")
+    if (date_to - date_from).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f"a rule may span at most {MAX_RANGE_DAYS} days")
+    days = set(weekdays)
+    if not days <= set(range(7)):
+        raise ValueError("weekdays must be 0 (Monday) to 6 (Sunday)")
+    skip = set(exceptions)
+    windows = []
+    date = date_from
+    one_day = datetime.timedelta(days=1)
+    while date <= date_to:
+        if date.weekday() in days and date not in skip:
+            windows.append((date, start_time, end_time))
+        date += one_day
+    return windows
+
+
+def split_overlaps(new: List[Window], existing: Iterable[Window]) -> Tuple[List[Window], List[dict]]:
+    """
+    Separate new windows that overlap an existing window, or an earlier new
+    window of the same day, from those that do not.
+
+    Returns:
+        (accepted, overlaps): accepted windows in (date, start) order, and
+        one {"date", "start_time", "end_time", "overlaps"} entry per rejected
+        window, where "overlaps" is "existing" or "request".
+    """
+    taken: Dict[datetime.date, List[Tuple[datetime.time, datetime.time]]] = defaultdict(list)
+    for date, start, end in existing:
+        taken[date].append((start, end))
+    # Existing windows may overlap each other; keep, per day, the largest
+    # end seen so far so one bisect answers "does anything cover [s, e)?".
+    prefix_end: Dict[datetime.date, Tuple[List[datetime.time], List[datetime.time]]] = {}
+    for date, spans in taken.items():
+        spans.sort()
+        starts, ends, furthest = [], [], None
+        for start, end in spans:
+            furthest = end if furthest is None or end > furthest else furthest
+            starts.append(start)
+            ends.append(furthest)
+        prefix_end[date] = (starts, ends)
+
+    accepted, overlaps = [], []
+    last_end: Dict[datetime.date, datetime.time] = {}
+    for date, start, end in sorted(new):
+        reason = None
+        if date in prefix_end:
+            starts, ends = prefix_end[date]
+            i = bisect.bisect_left(starts, end)  # existing windows starting before our end
+            if i and ends[i - 1] > start:
+                reason = "existing"
+        if reason is None and date in last_end and last_end[date] > start:
+            reason = "request"
+        if reason:
+            overlaps.append({"date": date, "start_time": start, "end_time": end, "overlaps": reason})
+            continue
+        accepted.append((date, start, end))
+        last_end[date] = max(end, last_end.get(date, end))
+    return accepted, overlaps
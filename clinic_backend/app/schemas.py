@@ -1,6 +1,6 @@
 # app/schemas.py
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Literal
 from pydantic import BaseModel
 import datetime
 
@@ -34,6 +34,85 @@ class AvailabilityIn(BaseModel):
     start_time: datetime.time
     end_time: datetime.time
 
+class WindowIn(BaseModel):
+    date: datetime.date
+    start_time: datetime.time
+    end_time: datetime.time
+
+class RecurrenceIn(BaseModel):
+    weekdays: List[int]  # 0 = Monday ... 6 = Sunday
+    start_time: datetime.time
+    end_time: datetime.time
+    date_from: datetime.date
+    date_to: datetime.date
+    exceptions: List[datetime.date] = []
+
+class BulkAvailabilityIn(BaseModel):
+    doctor_id: int
+    windows: List[WindowIn] = []
+    rules: List[RecurrenceIn] = []
+    on_overlap: Literal["reject", "skip"] = "reject"
+
+class OverlapOut(BaseModel):
+    date: datetime.date
+    start_time: datetime.time
+    end_time: datetime.time
+    overlaps: str  # "existing" or "request"
+
+class BulkAvailabilityOut(BaseModel):
+    doctor_id: int
+    inserted: int
+    skipped: int
+    date_from: Optional[datetime.date]
+    date_to: Optional[datetime.date]
+    overlaps: List[OverlapOut]  # first MAX_REPORTED_OVERLAPS only
+
+# Recurring availability templates
+class TemplateWindowIn(BaseModel):
+    weekday: int = Field(ge=0, le=6)  # 0 = Monday ... 6 = Sunday
+    start_time: datetime.time
+    end_time: datetime.time
+
+class AvailabilityTemplateIn(BaseModel):
+    doctor_id: int
+    effective_from: datetime.date
+    effective_to: Optional[datetime.date] = None  # open-ended
+    windows: List[TemplateWindowIn]
+
+class AvailabilityTemplateOut(BaseModel):
+    id: int
+    doctor_id: int
+    weekday: int
+    start_time: datetime.time
+    end_time: datetime.time
+    effective_from: datetime.date
+    effective_to: Optional[datetime.date]
+
+class TemplateEndIn(BaseModel):
+    effective_to: Optional[datetime.date]
+
+class OverrideWindowIn(BaseModel):
+    start_time: datetime.time
+    end_time: datetime.time
+
+# Free slots
+class SlotDayOut(BaseModel):
+    date: datetime.date
+    times: List[datetime.time]
+
+class DoctorSlotsOut(BaseModel):
+    doctor_id: int
+    slot_minutes: int
+    days: List[SlotDayOut]
+
+class NextSlotOut(BaseModel):
+    doctor_id: int
+    doctor_name: str
+    specialty: Optional[str]
+    clinic_id: Optional[int]
+    date: datetime.date
+    time: datetime.time
+
 # Appointment
 class AppointmentIn(BaseModel):
     doctor_id: int
@@ -47,4 +126,39 @@ class AppointmentOut(BaseModel):
     date: datetime.date
     time: datetime.time
     status: str
+    version: int
+
+class RescheduleIn(BaseModel):
+    date: datetime.date
+    time: datetime.time
+    doctor_id: Optional[int] = None  # the appointment's doctor when omitted
+    version: Optional[int] = None  # as last read; 409 if the appointment changed since
+
+class RescheduleMoveIn(RescheduleIn):
+    appointment_id: int
+
+class BatchRescheduleIn(BaseModel):
+    moves: List[RescheduleMoveIn]
+
+class BatchRescheduleOut(BaseModel):
+    moved: int
+    appointments: List[AppointmentOut]
+
+
+# Admin lists
+class UserOut(BaseModel):
+    id: int
+    name: str
+    email: str
+    role: str
+
+class AdminAppointmentOut(AppointmentOut):
+    created_at: datetime.datetime
+
 
+# Admin profiler
+class ProfilerIn(BaseModel):
+    route: str  # path template, e.g. "/doctors/doctors/{doctor_id}"
+    method: str = "GET"
+    interval_ms: float = Field(5, ge=1, le=1000)
+    seconds: float = Field(60, gt=0, le=3600)
@@ -0,0 +1,81 @@
+# app/serialization.py
+"""
+Fast JSON encoding for API responses.
+
+When a route returns a list of dicts with `response_model=List[X]`,
+FastAPI validates every dict into an X instance and dumps it back to
+JSON-compatible Python. Then JSONResponse encodes the result with the
+stdlib json module. For rows that come straight from a column query, that
+validation redoes work the query already did. The list endpoints skip it:
+- the query selects the columns of X as plain row tuples, with no ORM
+  instances;
+- a RowSerializer built once per model turns the rows into JSON bytes in
+  one pydantic-core call. It uses a TypeAdapter over a TypedDict with X's
+  fields, so X stays the contract: only its fields are written, encoded
+  by their declared types;
+- the route returns the bytes as a Response (json_response()).
+
+`response_model` stays on those routes for the OpenAPI document.
+
+JSONResponse is the app's default response class (main.py). It encodes
+with orjson when orjson is installed and with the stdlib json module
+otherwise.
+"""
+from typing import List, Optional, Sequence, Type
+
+from fastapi import Response
+from fastapi.responses import JSONResponse as StdJSONResponse, ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+
+try:
+    import orjson
+except ImportError:  # optional: responses fall back to the stdlib encoder
+    orjson = None
+
+JSONResponse = ORJSONResponse if orjson is not None else StdJSONResponse
+
+MEDIA_TYPE = "application/json"
+
+
+def json_response(body: bytes, response: Optional[Response] = None) -> Response:
+    """
+    A 200 response with an already encoded JSON body.
+
+    Args:
+        body (bytes): The encoded body.
+        response (Response, optional): The route's injected Response;
+            headers set on it (pagination, ETag) are carried over, since
+            FastAPI ignores it once a route returns a Response itself.
+    """
+    headers = dict(response.headers) if response is not None else None
+    return Response(content=body, media_type=MEDIA_TYPE, headers=headers)
+
+
+class RowSerializer:
+    """
+    Encodes lists of row tuples as a JSON array of `model` objects, or
+    one row tuple as a single object (dump_one()).
+
+    Rows are read by position in the order of the model's fields, so
+    select the columns in that order (as the list queries do).
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        fields = {name: field.annotation for name, field in model.model_fields.items()}
+        self.model = model
+        self.fields = tuple(fields)
+        row_type = TypedDict(f"{model.__name__}Row", fields)
+        self.adapter = TypeAdapter(List[row_type])
+        self.row_adapter = TypeAdapter(row_type)
+
+    def dump(self, rows: Sequence[tuple]) -> bytes:
+        fields = self.fields
+        return self.adapter.dump_json([dict(zip(fields, row)) for row in rows])
+
+    def dump_one(self, row: tuple) -> bytes:
+        return self.row_adapter.dump_json(dict(zip(self.fields, row)))
+
+    def response(self, rows: Sequence[tuple], response: Optional[Response] = None) -> Response:
+        """dump() as a Response; see json_response()."""
+        return json_response(self.dump(rows), response)
@@ -0,0 +1,182 @@
+# app/serve.py
+"""
+Production launcher:
+
+    python -m app.serve
+
+run.py is for development: one process on 127.0.0.1 that reloads on code
+changes. This binds SERVER_HOST:SERVER_PORT and runs SERVER_WORKERS worker
+processes behind the one listening socket:
+
+- The schema is created and migrated once, here, before any worker starts
+  (unless DB_INIT_SCHEMA=0), and the workers skip it, so they never race
+  each other's migrations.
+- With gunicorn installed (SERVER_MANAGER=auto or gunicorn), the app is
+  imported once in the master and the workers are forked from it: they
+  start without importing anything and share the master's memory pages
+  until they write to them. Without it (or SERVER_MANAGER=uvicorn),
+  uvicorn's own supervisor starts the workers as fresh interpreters that
+  each import the app.
+- The event loop and HTTP parser are uvloop and httptools when installed
+  (SERVER_LOOP and SERVER_HTTP "auto"), asyncio and h11 otherwise.
+- A worker that has served SERVER_MAX_REQUESTS requests, plus a random
+  0..SERVER_MAX_REQUESTS_JITTER so they do not all go at once, stops
+  accepting, finishes its requests and is replaced. This bounds slow
+  leaks and per-process cache growth.
+- Idle keep-alive connections are kept SERVER_KEEPALIVE_SECONDS. Behind a
+  load balancer, make it longer than the balancer's idle timeout, or the
+  balancer sends requests on connections the worker has just closed.
+- Up to SERVER_BACKLOG connections wait in the kernel for a worker to
+  accept them; the kernel caps it at net.core.somaxconn.
+- On SIGTERM, and when recycled, a worker has SERVER_GRACEFUL_TIMEOUT
+  seconds to finish its requests. Event streams never finish on their
+  own, so they are cut then; their clients reconnect.
+
+Load balancers and orchestrators should probe GET /healthz (liveness) and
+GET /readyz (readiness), see main.py. The app's own loggers cover requests
+(app.requests at DEBUG), so the server's access log is off unless
+SERVER_ACCESS_LOG=1.
+"""
+import os
+import sys
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1)))
+SERVER_MANAGER = os.getenv("SERVER_MANAGER", "auto")  # auto, gunicorn or uvicorn
+SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")  # auto, uvloop or asyncio
+SERVER_HTTP = os.getenv("SERVER_HTTP", "auto")  # auto, httptools or h11
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+SERVER_KEEPALIVE_SECONDS = int(os.getenv("SERVER_KEEPALIVE_SECONDS", "75"))
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", "50000"))  # 0: never recycle
+SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "5000"))
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+SERVER_ACCESS_LOG = os.getenv("SERVER_ACCESS_LOG", "0") == "1"
+
+APP = "app.main:app"
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # optional: without it, uvicorn's supervisor runs the workers
+    BaseApplication = None
+
+
+def prepare_database():
+    """
+    Create and migrate the schema once, in this process, then have every
+    worker skip it. Must run before app.database is imported anywhere
+    else, since the workers' DB_INIT_SCHEMA is read at import time.
+    """
+    init = os.environ.get("DB_INIT_SCHEMA", "1") == "1"
+    os.environ["DB_INIT_SCHEMA"] = "0"
+    if init:
+        from app.database import create_db_and_tables, engine
+
+        create_db_and_tables()
+        engine.dispose()  # forked workers must not inherit open connections
+
+
+def uvicorn_options() -> dict:
+    """uvicorn.Config arguments shared by both managers."""
+    return {
+        "loop": SERVER_LOOP,
+        "http": SERVER_HTTP,
+        "backlog": SERVER_BACKLOG,
+        "timeout_keep_alive": SERVER_KEEPALIVE_SECONDS,
+        "timeout_graceful_shutdown": SERVER_GRACEFUL_TIMEOUT,
+        "access_log": SERVER_ACCESS_LOG,
+    }
+
+
+# ---------------------------------------------------------------------
+# GUNICORN: PRELOAD AND FORK
+# ---------------------------------------------------------------------
+
+def worker_class():
+    """gunicorn's uvicorn worker, with this launcher's loop, parser and timeouts."""
+    try:
+        from uvicorn_worker import UvicornWorker
+    except ImportError:  # older uvicorn releases ship it themselves
+        from uvicorn.workers import UvicornWorker
+
+    options = uvicorn_options()
+    options.pop("backlog")  # gunicorn binds the socket
+    options.pop("timeout_keep_alive")  # set from gunicorn's keepalive
+
+    class Worker(UvicornWorker):
+        CONFIG_KWARGS = options
+
+    return Worker
+
+
+def run_gunicorn():
+    class Application(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": f"{SERVER_HOST}:{SERVER_PORT}",
+                "workers": SERVER_WORKERS,
+                "worker_class": worker_class(),
+                "preload_app": True,
+                "backlog": SERVER_BACKLOG,
+                "keepalive": SERVER_KEEPALIVE_SECONDS,
+                "max_requests": SERVER_MAX_REQUESTS,
+                "max_requests_jitter": SERVER_MAX_REQUESTS_JITTER,
+                "graceful_timeout": SERVER_GRACEFUL_TIMEOUT,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+
+            return app
+
+    Application().run()
+
+
+# ---------------------------------------------------------------------
+# UVICORN: SPAWNED WORKERS
+# ---------------------------------------------------------------------
+
+def run_uvicorn():
+    import uvicorn
+    from uvicorn.supervisors import Multiprocess
+
+    config = uvicorn.Config(
+        APP,
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        workers=SERVER_WORKERS,
+        limit_max_requests=SERVER_MAX_REQUESTS or None,
+        limit_max_requests_jitter=SERVER_MAX_REQUESTS_JITTER,
+        **uvicorn_options(),
+    )
+    # The supervisor even for one worker: uvicorn.run() would serve in this
+    # process, which simply exits when it reaches its request limit.
+    Multiprocess(config, sockets=[config.bind_socket()]).run()
+
+
+def main(argv):
+    if argv:  # configured from the environment only
+        print(__doc__)
+        return 1
+    manager = SERVER_MANAGER
+    if manager == "auto":
+        manager = "gunicorn" if BaseApplication is not None else "uvicorn"
+    if manager == "gunicorn" and BaseApplication is None:
+        print("SERVER_MANAGER=gunicorn needs the gunicorn package (pip install gunicorn uvicorn-worker)")
+        return 1
+    if manager not in ("gunicorn", "uvicorn"):
+        print(f"SERVER_MANAGER must be auto, gunicorn or uvicorn, not {manager!r}")
+        return 1
+
+    prepare_database()
+    if manager == "gunicorn":
+        run_gunicorn()
+    else:
+        run_uvicorn()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,229 @@
+# app/slots.py
+"""
+Free-slot computation.
+
+A doctor's day is represented as two 1440-bit integers, one bit per
+minute: `available` has a bit set for every minute covered by an
+Availability window, `booked` for every minute taken by an active
+appointment. A slot starting at minute s is bookable when all of
+[s, s + slot_minutes) is set in `available` and clear in `booked`, which
+is a single mask-and-compare on Python ints. Candidate start times step
+through each window from its start in slot_minutes increments.
+Appointments have no duration column, so each booking is taken to occupy
+slot_minutes from its start time.
+
+Windows come from concrete Availability rows plus the recurring
+templates expanded for the requested range (app/recurring.py). The
+loaders issue one query per table for any number of doctors and days;
+template weeks that are already expanded cost no query.
+"""
+import datetime
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from sqlmodel import select
+
+from app.models import Appointment, Availability
+from app.recurring import template_windows, template_windows_async
+
+DEFAULT_SLOT_MINUTES = 30
+MINUTES_PER_DAY = 24 * 60
+MAX_RANGE_DAYS = 366
+# Reject bookings that do not fit inside one of the doctor's windows. Off by
+# default: clients that book doctors without published availability keep working.
+BOOKING_REQUIRE_AVAILABILITY = os.getenv("BOOKING_REQUIRE_AVAILABILITY", "0") != "0"
+
+
+def to_minute(t: datetime.time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def to_time(minute: int) -> datetime.time:
+    return datetime.time(minute // 60, minute % 60)
+
+
+def _span(start: int, end: int) -> int:
+    """Bitmask with bits [start, end) set."""
+    start, end = max(0, start), min(MINUTES_PER_DAY, end)
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+class DayOccupancy:
+    """Availability windows and booked start times of one doctor on one day."""
+
+    __slots__ = ("windows", "available", "booked")
+
+    def __init__(self):
+        self.windows: List[Tuple[int, int]] = []  # (start_minute, end_minute)
+        self.available = 0
+        self.booked: Dict[int, int] = {}  # start minute -> number of active bookings
+
+    def add_window(self, start: datetime.time, end: datetime.time):
+        s, e = to_minute(start), to_minute(end)
+        if e <= s:
+            return
+        self.windows.append((s, e))
+        self.available |= _span(s, e)
+
+    def add_booking(self, start: datetime.time):
+        m = to_minute(start)
+        self.booked[m] = self.booked.get(m, 0) + 1
+
+    def remove_booking(self, start: datetime.time):
+        m = to_minute(start)
+        count = self.booked.get(m, 0) - 1
+        if count > 0:
+            self.booked[m] = count
+        else:
+            self.booked.pop(m, None)
+
+    def booked_mask(self, slot_minutes: int) -> int:
+        mask = 0
+        for m in self.booked:
+            mask |= _span(m, m + slot_minutes)
+        return mask
+
+    def free_starts(self, slot_minutes: int = DEFAULT_SLOT_MINUTES) -> List[int]:
+        """Bookable start minutes, ascending."""
+        if not self.available:
+            return []
+        free = self.available & ~self.booked_mask(slot_minutes)
+        need = (1 << slot_minutes) - 1
+        starts = set()
+        for s, e in self.windows:
+            for m in range(s, e - slot_minutes + 1, slot_minutes):
+                if (free >> m) & need == need:
+                    starts.add(m)
+        return sorted(starts)
+
+
+class Occupancy:
+    """DayOccupancy per (doctor_id, date)."""
+
+    def __init__(self):
+        self.days: Dict[Tuple[int, datetime.date], DayOccupancy] = defaultdict(DayOccupancy)
+
+    def day(self, doctor_id: int, date: datetime.date) -> DayOccupancy:
+        return self.days[(doctor_id, date)]
+
+    def free_slots(self, doctor_id: int, date_from: datetime.date, date_to: datetime.date,
+                   slot_minutes: int = DEFAULT_SLOT_MINUTES) -> List[dict]:
+        """
+        Bookable start times per day in [date_from, date_to].
+
+        Returns:
+            List[dict]: {"date", "times"} for each day that has a free slot.
+        """
+        out = []
+        date = date_from
+        while date <= date_to:
+            day = self.days.get((doctor_id, date))
+            if day is not None:
+                starts = day.free_starts(slot_minutes)
+                if starts:
+                    out.append({"date": date, "times": [to_time(m) for m in starts]})
+            date += datetime.timedelta(days=1)
+        return out
+
+
+# ---------------------------------------------------------------------
+# LOADING
+# ---------------------------------------------------------------------
+
+def availability_query(doctor_ids: Iterable[int], date_from: datetime.date, date_to: datetime.date):
+    return select(Availability.doctor_id, Availability.date, Availability.start_time, Availability.end_time).where(
+        Availability.doctor_id.in_(list(doctor_ids)),
+        Availability.date >= date_from,
+        Availability.date <= date_to,
+    )
+
+
+def bookings_query(doctor_ids: Iterable[int], date_from: datetime.date, date_to: datetime.date):
+    return select(Appointment.doctor_id, Appointment.date, Appointment.time).where(
+        Appointment.doctor_id.in_(list(doctor_ids)),
+        Appointment.date >= date_from,
+        Appointment.date <= date_to,
+        Appointment.status == "booked",
+    )
+
+
+def build_occupancy(availability_rows, booking_rows) -> Occupancy:
+    occupancy = Occupancy()
+    for doctor_id, date, start, end in availability_rows:
+        occupancy.day(doctor_id, date).add_window(start, end)
+    for doctor_id, date, time in booking_rows:
+        occupancy.day(doctor_id, date).add_booking(time)
+    return occupancy
+
+
+def load_windows(session, doctor_ids, date_from, date_to) -> List[tuple]:
+    """Concrete and template windows as (doctor_id, date, start_time, end_time)."""
+    doctor_ids = list(doctor_ids)
+    return [*session.exec(availability_query(doctor_ids, date_from, date_to)).all(),
+            *template_windows(session, doctor_ids, date_from, date_to)]
+
+
+async def load_windows_async(session, doctor_ids, date_from, date_to) -> List[tuple]:
+    """load_windows() for an AsyncSession."""
+    doctor_ids = list(doctor_ids)
+    return [*(await session.exec(availability_query(doctor_ids, date_from, date_to))).all(),
+            *(await template_windows_async(session, doctor_ids, date_from, date_to))]
+
+
+def load_occupancy(session, doctor_ids, date_from, date_to) -> Occupancy:
+    """Load occupancy for many doctors with one query per table."""
+    doctor_ids = list(doctor_ids)
+    return build_occupancy(
+        load_windows(session, doctor_ids, date_from, date_to),
+        session.exec(bookings_query(doctor_ids, date_from, date_to)).all(),
+    )
+
+
+async def load_occupancy_async(session, doctor_ids, date_from, date_to) -> Occupancy:
+    """load_occupancy() for an AsyncSession."""
+    doctor_ids = list(doctor_ids)
+    return build_occupancy(
+        await load_windows_async(session, doctor_ids, date_from, date_to),
+        (await session.exec(bookings_query(doctor_ids, date_from, date_to))).all(),
+    )
+
+
+def fits_window(window_rows, time: datetime.time, slot_minutes: int = DEFAULT_SLOT_MINUTES) -> bool:
+    """Whether [time, time + slot_minutes) lies inside the given windows of one day."""
+    start = to_minute(time)
+    if start + slot_minutes > MINUTES_PER_DAY:
+        return False
+    day = DayOccupancy()
+    for _, _, window_start, window_end in window_rows:
+        day.add_window(window_start, window_end)
+    need = _span(start, start + slot_minutes)
+    return day.available & need == need
+
+
+def is_available(session, doctor_id: int, date: datetime.date, time: datetime.time) -> bool:
+    """Booking validation: does a slot at `time` fit the doctor's windows that day?"""
+    return fits_window(load_windows(session, [doctor_id], date, date), time)
+
+
+async def is_available_async(session, doctor_id: int, date: datetime.date, time: datetime.time) -> bool:
+    """is_available() for an AsyncSession."""
+    return fits_window(await load_windows_async(session, [doctor_id], date, date), time)
+
+
+def resolve_range(date_from, date_to):
+    """
+    Default and validate a [from, to] range for slot queries.
+
+    Raises:
+        ValueError: to is before from, or the range is longer than MAX_RANGE_DAYS.
+    """
+    date_from = date_from or datetime.date.today()
+    date_to = date_to or date_from + datetime.timedelta(days=13)
+    if date_to < date_from:
+        raise ValueError("'to' must not be before 'from'")
+    if (date_to - date_from).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f"range is limited to {MAX_RANGE_DAYS} days")
+    return date_from, date_to
@@ -0,0 +1,231 @@
+# app/stats.py
+"""
+Appointment statistics for the admin dashboard.
+
+Counts live in two rollups: AppointmentDailyStat, one row per (slot date,
+status), and DoctorDailyStat, one row per (slot date, doctor, status). The
+booking and cancellation routes adjust both with upserts inside their own
+transaction, so the rollups are always consistent with the appointment
+table, and every dashboard query is a GROUP BY over rows bounded by days x
+doctors x statuses however many appointments exist. Unfiltered figures
+come from the small overall table; the per-doctor table is only read for
+the doctor breakdown, or when filtering by doctor. Periods are by
+appointment (slot) date; week and month buckets are folded from the daily
+rows.
+
+If the rollups are ever suspected to have drifted (e.g. after rows were
+edited by hand), rebuild them from the appointment table:
+
+    python -m app.stats rebuild
+"""
+import datetime
+import os
+import sys
+from collections import Counter
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+
+from app.cache import TTLCache
+from app.database import engine
+from app.models import Appointment, AppointmentDailyStat, Doctor, DoctorDailyStat, User
+
+STATS_CACHE_TTL_SECONDS = float(os.getenv("STATS_CACHE_TTL_SECONDS", "5"))
+
+BUCKET_PATTERN = "^(day|week|month)$"
+
+stats_cache = TTLCache(maxsize=256, ttl=STATS_CACHE_TTL_SECONDS)
+
+
+# ---------------------------------------------------------------------
+# INCREMENTAL COUNTERS
+# ---------------------------------------------------------------------
+
+def _upsert(model, delta: int, **key):
+    table = model.__table__
+    dialects = {"sqlite": sqlite, "postgresql": postgresql}
+    dialect = dialects.get(engine.dialect.name)
+    if dialect is None:
+        raise NotImplementedError(f"no upsert for dialect {engine.dialect.name}")
+    stmt = dialect.insert(table).values(count=delta, **key)
+    return stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+
+
+def _bump(date: datetime.date, doctor_id: int, status: str, delta: int):
+    return [
+        _upsert(AppointmentDailyStat, delta, date=date, status=status),
+        _upsert(DoctorDailyStat, delta, date=date, doctor_id=doctor_id, status=status),
+    ]
+
+
+def changes(date, doctor_id, old_status: Optional[str], new_status: Optional[str]):
+    """Upsert statements moving one appointment from old_status to new_status."""
+    stmts = []
+    if old_status == new_status:
+        return stmts
+    if old_status:
+        stmts.extend(_bump(date, doctor_id, old_status, -1))
+    if new_status:
+        stmts.extend(_bump(date, doctor_id, new_status, 1))
+    return stmts
+
+
+def record(session, date, doctor_id, old_status: Optional[str], new_status: Optional[str]):
+    """
+    Apply a status change to the rollups in the session's transaction.
+    Call it before commit so the counters and the appointment row commit
+    (or roll back) together.
+    """
+    for stmt in changes(date, doctor_id, old_status, new_status):
+        session.exec(stmt)
+
+
+async def record_async(session, date, doctor_id, old_status: Optional[str], new_status: Optional[str]):
+    """record() for an AsyncSession."""
+    for stmt in changes(date, doctor_id, old_status, new_status):
+        await session.exec(stmt)
+
+
+def move_changes(moves: Iterable[Tuple[tuple, tuple]], status: str = "booked"):
+    """
+    Upsert statements moving appointments of one status between slot dates
+    and doctors. `moves` holds ((date, doctor_id), (new_date, new_doctor_id))
+    pairs; they are netted first, so a day moved as a whole costs one pair
+    of upserts per table, and moves within a day and doctor none.
+    """
+    deltas = Counter()
+    for old, new in moves:
+        deltas[old] -= 1
+        deltas[new] += 1
+    return [stmt for (date, doctor_id), delta in deltas.items() if delta
+            for stmt in _bump(date, doctor_id, status, delta)]
+
+
+def record_moves(session, moves: Iterable[Tuple[tuple, tuple]]):
+    """Apply move_changes() in the session's transaction, before commit."""
+    for stmt in move_changes(moves):
+        session.exec(stmt)
+
+
+async def record_moves_async(session, moves: Iterable[Tuple[tuple, tuple]]):
+    """record_moves() for an AsyncSession."""
+    for stmt in move_changes(moves):
+        await session.exec(stmt)
+
+
+def rebuild(conn):
+    """Recompute both rollups from the appointment table."""
+    conn.execute(delete(DoctorDailyStat))
+    conn.execute(insert(DoctorDailyStat).from_select(
+        ["date", "doctor_id", "status", "count"],
+        select(Appointment.date, Appointment.doctor_id, Appointment.status, func.count())
+        .group_by(Appointment.date, Appointment.doctor_id, Appointment.status),
+    ))
+    conn.execute(delete(AppointmentDailyStat))
+    conn.execute(insert(AppointmentDailyStat).from_select(
+        ["date", "status", "count"],
+        select(DoctorDailyStat.date, DoctorDailyStat.status, func.sum(DoctorDailyStat.count))
+        .group_by(DoctorDailyStat.date, DoctorDailyStat.status),
+    ))
+
+
+# ---------------------------------------------------------------------
+# QUERIES
+# ---------------------------------------------------------------------
+
+def bucket_start(date: datetime.date, bucket: str) -> datetime.date:
+    if bucket == "week":
+        return date - datetime.timedelta(days=date.weekday())  # ISO week, Monday
+    if bucket == "month":
+        return date.replace(day=1)
+    return date
+
+
+def _range(stat, date_from, date_to) -> list:
+    filters = []
+    if date_from:
+        filters.append(stat.date >= date_from)
+    if date_to:
+        filters.append(stat.date <= date_to)
+    return filters
+
+
+def _breakdown(statuses: dict) -> dict:
+    total = sum(statuses.values())
+    return {"total": total, **statuses}
+
+
+def summary(session, date_from: Optional[datetime.date] = None, date_to: Optional[datetime.date] = None,
+            doctor_id: Optional[int] = None, bucket: str = "day") -> dict:
+    """
+    Dashboard figures from COUNT / SUM ... GROUP BY queries.
+
+    Appointment figures honour the date range and doctor filter; user and
+    doctor totals do not.
+
+    Returns:
+        dict: users, doctors, appointments, by_status, cancellation_rate,
+        by_period (one entry per bucket with a count) and by_doctor.
+    """
+    # The per-doctor table is only needed to filter by doctor.
+    stat = AppointmentDailyStat if doctor_id is None else DoctorDailyStat
+    filters = _range(stat, date_from, date_to)
+    if doctor_id is not None:
+        filters.append(stat.doctor_id == doctor_id)
+
+    periods = {}
+    by_status = {}
+    for date, status, count in session.exec(
+        select(stat.date, stat.status, func.sum(stat.count)).where(*filters).group_by(stat.date, stat.status)
+    ):
+        if count:
+            day = periods.setdefault(bucket_start(date, bucket), {})
+            day[status] = day.get(status, 0) + int(count)
+            by_status[status] = by_status.get(status, 0) + int(count)
+
+    doctors = {}
+    filters = _range(DoctorDailyStat, date_from, date_to)
+    if doctor_id is not None:
+        filters.append(DoctorDailyStat.doctor_id == doctor_id)
+    for doc_id, status, count in session.exec(
+        select(DoctorDailyStat.doctor_id, DoctorDailyStat.status, func.sum(DoctorDailyStat.count))
+        .where(*filters)
+        .group_by(DoctorDailyStat.doctor_id, DoctorDailyStat.status)
+    ):
+        if count:
+            doctors.setdefault(doc_id, {})[status] = int(count)
+    names = dict(session.exec(select(Doctor.id, Doctor.name).where(Doctor.id.in_(list(doctors)))).all()) if doctors else {}
+
+    total = sum(by_status.values())
+    return {
+        "users": session.exec(select(func.count()).select_from(User)).one(),
+        "doctors": session.exec(select(func.count()).select_from(Doctor)).one(),
+        "appointments": total,
+        "by_status": by_status,
+        "cancellation_rate": round(by_status.get("cancelled", 0) / total, 4) if total else 0.0,
+        "bucket": bucket,
+        "by_period": [{"period": start, **_breakdown(periods[start])} for start in sorted(periods)],
+        "by_doctor": [
+            {"doctor_id": doc_id, "doctor_name": names.get(doc_id), **_breakdown(doctors[doc_id])}
+            for doc_id in sorted(doctors)
+        ],
+    }
+
+
+def main(argv):
+    if argv[:1] == ["rebuild"]:
+        with engine.begin() as conn:
+            rebuild(conn)
+        print("appointment statistics rebuilt")
+        return 0
+    print(__doc__)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
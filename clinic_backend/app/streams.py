@@ -0,0 +1,245 @@
+# app/streams.py
+"""
+Server-sent event streams of a doctor's slot changes.
+
+Booking pages used to poll GET /availability/{doctor_id} every few
+seconds. With GET /availability/{doctor_id}/events they can fetch the
+availability once and then apply changes as they are pushed:
+
+    slot.taken            {"date", "time"}          a slot was booked
+    slot.freed            {"date", "time"}          a booking was cancelled
+    availability.added    {"dates"}                 new windows on those dates
+    availability.changed  {"date_from", "date_to"}  templates or overrides changed;
+                                                    date_to null: open-ended
+    resync                {"dropped"}               events were lost; refetch
+
+The broker subscribes to the domain events (app/events.py), so routes
+publish nothing themselves. Each event is encoded once per process and
+the same bytes are appended to every subscriber of that doctor.
+
+Every subscriber has a buffer of STREAM_BUFFER_SIZE events. A client that
+falls further behind loses the oldest events and is sent `resync` before
+the newest ones, so a stalled connection never holds more than its buffer.
+Idle streams cost one parked task each; a comment line is sent every
+STREAM_HEARTBEAT_SECONDS to keep proxies from closing them and to notice
+clients that are gone. Past STREAM_MAX_SUBSCRIBERS open streams, new ones
+get 503 with Retry-After (StreamsFull, see main.py).
+
+Streams are per worker process: a subscriber only sees changes made by
+the worker it is connected to. With several workers, clients should still
+poll occasionally, and refetch on reconnect and on `resync`. Event IDs
+are per process, and Last-Event-ID is not replayed.
+"""
+import asyncio
+import itertools
+import json
+import os
+from collections import deque
+
+from app import events, metrics
+
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "64"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "20000"))
+STREAM_RETRY_AFTER = 5  # seconds, also sent to clients as the SSE reconnection delay
+
+SLOT_TAKEN = "slot.taken"
+SLOT_FREED = "slot.freed"
+AVAILABILITY_ADDED = "availability.added"
+AVAILABILITY_CHANGED = "availability.changed"
+RESYNC = "resync"
+
+HEARTBEAT = b": keepalive\n\n"
+PREAMBLE = f"retry: {STREAM_RETRY_AFTER * 1000}\n\n".encode()
+
+
+class StreamsFull(Exception):
+    """Raised when this process already holds STREAM_MAX_SUBSCRIBERS streams."""
+
+    def __init__(self, retry_after: int = STREAM_RETRY_AFTER):
+        super().__init__("too many open event streams")
+        self.retry_after = retry_after
+
+
+def encode(event: str, data: dict, event_id=None) -> bytes:
+    """One SSE message."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class Subscription:
+    """
+    One open stream: a bounded buffer of encoded events, and the future
+    its task waits on while the buffer is empty.
+
+    Only touched on the event loop, by Broker and by the stream's task.
+    A bare future and timer are used rather than asyncio.wait_for(), which
+    would start a task per wakeup for every subscriber of a busy doctor.
+    """
+    __slots__ = ("doctor_id", "buffer", "dropped", "_waiter")
+
+    def __init__(self, doctor_id: int, buffer_size: int):
+        self.doctor_id = doctor_id
+        self.buffer = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._waiter = None
+
+    def push(self, message: bytes):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+            metrics.STREAM_EVENTS_DROPPED.inc()
+        self.buffer.append(message)
+        if self._waiter is not None:
+            _wake(self._waiter)
+
+    async def next_batch(self, timeout: float) -> bytes:
+        """
+        Everything buffered, waiting up to `timeout` seconds for something.
+
+        Returns:
+            bytes: The events, preceded by `resync` if some were dropped;
+                empty if nothing arrived in time.
+        """
+        if not self.buffer:
+            loop = asyncio.get_running_loop()
+            self._waiter = waiter = loop.create_future()
+            timer = loop.call_later(timeout, _wake, waiter)
+            try:
+                await waiter
+            finally:
+                timer.cancel()
+                self._waiter = None
+        batch = list(self.buffer)
+        self.buffer.clear()
+        if self.dropped:
+            batch.insert(0, encode(RESYNC, {"dropped": self.dropped}))
+            self.dropped = 0
+        return b"".join(batch)
+
+
+class Broker:
+    """
+    Per-doctor fan-out of encoded events to subscriptions.
+
+    Subscriptions live on the server's event loop. publish() may be called
+    from any thread: sync routes publish from the threadpool, so the
+    fan-out is handed to the loop with call_soon_threadsafe().
+
+    Args:
+        buffer_size (int): Events buffered per subscriber before the oldest
+            are dropped.
+        max_subscribers (int): Open streams allowed in this process.
+    """
+
+    def __init__(self, buffer_size: int, max_subscribers: int):
+        self.buffer_size = max(1, buffer_size)
+        self.max_subscribers = max_subscribers
+        self._topics = {}  # doctor_id -> set of Subscription
+        self._count = 0
+        self._ids = itertools.count(1)
+        self._loop = None
+
+    def __len__(self):
+        return self._count
+
+    def check_capacity(self):
+        """
+        Raises:
+            StreamsFull: STREAM_MAX_SUBSCRIBERS streams are already open.
+        """
+        if self._count >= self.max_subscribers:
+            metrics.STREAM_REJECTED.inc()
+            raise StreamsFull()
+
+    def subscribe(self, doctor_id: int) -> Subscription:
+        """Open a subscription to a doctor's events; call on the event loop."""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(doctor_id, self.buffer_size)
+        self._topics.setdefault(doctor_id, set()).add(subscription)
+        self._count += 1
+        metrics.STREAM_SUBSCRIBERS.add()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        topic = self._topics.get(subscription.doctor_id)
+        if topic is None or subscription not in topic:
+            return
+        topic.discard(subscription)
+        if not topic:
+            del self._topics[subscription.doctor_id]
+        self._count -= 1
+        metrics.STREAM_SUBSCRIBERS.add(amount=-1)
+
+    def publish(self, doctor_id: int, event: str, data: dict):
+        """Send an event to the doctor's subscribers, from any thread."""
+        loop = self._loop
+        if loop is None or doctor_id not in self._topics:
+            return  # nobody is listening; a stale read here only skips a subscriber that just arrived
+        metrics.STREAM_EVENTS_PUBLISHED.inc(event)
+        message = encode(event, data, next(self._ids))
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._fan_out(doctor_id, message)
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(self._fan_out, doctor_id, message)
+
+    def _fan_out(self, doctor_id: int, message: bytes):
+        for subscription in self._topics.get(doctor_id, ()):
+            subscription.push(message)
+
+    async def stream(self, doctor_id: int, heartbeat: float = STREAM_HEARTBEAT_SECONDS):
+        """
+        The SSE body of one stream.
+
+        The subscription is opened when the body starts and closed when it
+        ends (the client went away), so a response that is never sent
+        leaves nothing behind. Events are delivered from the moment the
+        first line reaches the client.
+
+        Yields:
+            bytes: The reconnection delay, then batches of events, or a
+                heartbeat comment when nothing happened for `heartbeat`
+                seconds.
+        """
+        subscription = self.subscribe(doctor_id)
+        try:
+            yield PREAMBLE
+            while True:
+                yield await subscription.next_batch(heartbeat) or HEARTBEAT
+        finally:
+            self.unsubscribe(subscription)
+
+
+broker = Broker(STREAM_BUFFER_SIZE, STREAM_MAX_SUBSCRIBERS)
+
+
+# ---------------------------------------------------------------------
+# DOMAIN EVENTS
+# ---------------------------------------------------------------------
+
+@events.subscribe(events.APPOINTMENT_BOOKED)
+def _slot_taken(doctor_id, date, time, **_):
+    broker.publish(doctor_id, SLOT_TAKEN, {"date": date, "time": time})
+
+
+@events.subscribe(events.APPOINTMENT_CANCELLED)
+def _slot_freed(doctor_id, date, time, **_):
+    broker.publish(doctor_id, SLOT_FREED, {"date": date, "time": time})
+
+
+@events.subscribe(events.AVAILABILITY_ADDED)
+def _availability_added(doctor_id, dates, **_):
+    broker.publish(doctor_id, AVAILABILITY_ADDED, {"dates": dates})
+
+
+@events.subscribe(events.AVAILABILITY_CHANGED)
+def _availability_changed(doctor_id, date_from, date_to, **_):
+    broker.publish(doctor_id, AVAILABILITY_CHANGED, {"date_from": date_from, "date_to": date_to})
@@ -1,21 +1,34 @@
 # app/utils.py
+import logging
+import os
 from passlib.context import CryptContext
 from typing import Dict
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
 
-pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor. Pinning min/max to the same value makes
+# pwd_ctx.needs_update() flag hashes made with any other cost, so they are
+# transparently re-hashed on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_ctx = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 SECRET_KEY = "change-this-secret"  # set via env var in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
 
+logger = logging.getLogger(__name__)
+
 def hash_password(password: str) -> str:
-    print("Unhashed password: ", password)
     # bcrypt requires the password to be <= 72 bytes
     safe_password = password[:72]
     hashed = pwd_ctx.hash(safe_password)
-    print("Hashed password: ", hashed)
     return hashed
 
 def verify_password(plain: str, hashed: str) -> bool:
@@ -37,5 +50,6 @@ def decode_access_token(token: str):
 
 # Simple email stub (replace with SendGrid/Twilio)
 def send_email_stub(to_email: str, subject: str, message: str):
-    print(f"[EMAIL] To: {to_email} | Subject: {subject}\n{message}\n")
+    logger.info("email to %s: %s", to_email, subject, extra={"to": to_email, "subject": subject})
+    logger.debug("email body: %s", message)
 
@@ -0,0 +1,3 @@
+# benchmarks/__init__.py
+# Benchmark scripts; run them from clinic_backend/, e.g.
+#   python -m benchmarks.bench_booking_contention
@@ -0,0 +1,60 @@
+# benchmarks/_common.py
+"""
+Helpers shared by the benchmark scripts.
+
+Every script runs against a scratch SQLite file so it never touches
+clinic.db. use_scratch_database() must be called before anything from
+`app` is imported, because app.database builds its engine at import time.
+It also turns the read cache (app/read_cache.py) off unless
+READ_CACHE_BACKEND is set, so that repeated requests time the queries
+rather than cache hits; bench_read_cache sets it per run. It turns
+BOOKING_REQUIRE_AVAILABILITY on unless set, since the benchmarks publish
+availability and time bookings with the window check included.
+"""
+import math
+import os
+import statistics
+import tempfile
+
+
+def use_scratch_database(name="bench.db"):
+    """
+    Point DATABASE_URL at a fresh file in a temporary directory.
+
+    Returns:
+        str: Path of the database file.
+    """
+    directory = tempfile.mkdtemp(prefix="clinic-bench-")
+    path = os.path.join(directory, name)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("READ_CACHE_BACKEND", "off")
+    os.environ.setdefault("BOOKING_REQUIRE_AVAILABILITY", "1")
+    return path
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers (pct in 0..100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies_ms):
+    """Return count/mean/p50/p95/p99/max for a list of latencies in ms."""
+    return {
+        "count": len(latencies_ms),
+        "mean_ms": round(statistics.fmean(latencies_ms), 3) if latencies_ms else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "max_ms": round(max(latencies_ms), 3) if latencies_ms else 0.0,
+    }
+
+
+def auth_header(user_id, role="patient"):
+    """Bearer header for a user, minted directly so benchmarks skip bcrypt."""
+    from app.utils import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token({'id': user_id, 'role': role})}"}
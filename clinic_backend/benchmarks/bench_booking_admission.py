@@ -0,0 +1,181 @@
+# benchmarks/bench_booking_admission.py
+"""
+A popular doctor's calendar opens: booking admission on and off.
+
+--patients patients try to book one of --slots slots of the same doctor
+at the same moment. Each patient picks a random slot it has not yet seen
+taken and keeps trying:
+- after a 409 it picks another slot straight away;
+- after a 429 it waits Retry-After seconds;
+- it stops once it has booked, or when every slot is taken.
+
+Meanwhile a background client books other doctors' slots and lists the
+directory, to show what the storm does to everyone else.
+
+Each configuration runs in its own child process against its own scratch
+database, because the settings are read at import time:
+- off: no queue limit and no known-taken cache
+  (BOOKING_DOCTOR_CONCURRENCY, BOOKING_QUEUE_LIMIT and
+  BOOKING_MAX_WAITING_THREADS very large, BOOKING_TAKEN_TTL_SECONDS=0): every request runs its transaction;
+- on: the defaults from app/reservations.py.
+
+The report covers:
+- status codes of the hot doctor's bookings and their latency;
+- the SQL statements the booking route executed (from /metrics);
+- the latency of the background traffic.
+
+    python -m benchmarks.bench_booking_admission --patients 400 --slots 16
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from benchmarks._common import summarize
+
+CONFIGS = {
+    "off": {"BOOKING_DOCTOR_CONCURRENCY": "100000", "BOOKING_QUEUE_LIMIT": "100000",
+            "BOOKING_MAX_WAITING_THREADS": "100000", "BOOKING_TAKEN_TTL_SECONDS": "0"},
+    "on": {},
+}
+DAY = datetime.date(2030, 1, 7)
+OTHER_DOCTORS = 10
+BOOK_URL = "/appointments/appointments/"
+
+
+def seed(engine, patients):
+    from sqlmodel import Session
+    from app.models import Availability, Doctor, User
+
+    with Session(engine) as session:
+        for i in range(1 + OTHER_DOCTORS):
+            doctor = Doctor(name=f"Dr. {i:03d}", specialty="Cardiology")
+            session.add(doctor)
+            session.flush()
+            for day in range(1 if i == 0 else 60):
+                session.add(Availability(doctor_id=doctor.id, date=DAY + datetime.timedelta(days=day),
+                                         start_time=datetime.time(0), end_time=datetime.time(23, 30)))
+        session.add_all(User(name=f"p{i}", email=f"p{i}@example.com", password_hash="x")
+                        for i in range(patients + 1))
+        session.commit()
+
+
+def booking_statements():
+    """SQL statements executed by the booking route so far, from the /metrics text."""
+    from app import metrics
+
+    pattern = r'clinic_db_statements_per_request_sum\{method="POST",route="/appointments/appointments/"\} (\S+)'
+    match = re.search(pattern, metrics.render())
+    return int(float(match.group(1))) if match else 0
+
+
+async def run(patients, slots, seed_value):
+    import httpx
+    from app.main import app
+    from benchmarks._common import auth_header
+
+    rnd = random.Random(seed_value)
+    times = [(datetime.datetime.combine(DAY, datetime.time(0)) + datetime.timedelta(minutes=30 * i)).time()
+             for i in range(slots)]
+    codes = Counter()
+    hot_ms, other_ms = [], []
+    done = asyncio.Event()
+
+    async def patient(client, user_id):
+        headers = auth_header(user_id)
+        seen_taken = set()
+        while len(seen_taken) < slots:
+            slot = rnd.choice([t for t in times if t not in seen_taken])
+            body = {"doctor_id": 1, "date": DAY.isoformat(), "time": slot.isoformat()}
+            started = time.perf_counter()
+            r = await client.post(BOOK_URL, json=body, headers=headers)
+            hot_ms.append((time.perf_counter() - started) * 1000)
+            codes[r.status_code] += 1
+            if r.status_code == 200:
+                return
+            if r.status_code == 409:
+                seen_taken.add(slot)
+            elif r.status_code == 429:
+                await asyncio.sleep(int(r.headers["Retry-After"]))
+            else:
+                raise AssertionError((r.status_code, r.text))
+
+    async def other_traffic(client):
+        headers = auth_header(patients + 1)
+        n = 0
+        while not done.is_set():
+            day, step = divmod(n // OTHER_DOCTORS, 48)
+            when = datetime.datetime.combine(DAY, datetime.time(0)) + datetime.timedelta(days=day, minutes=30 * step)
+            body = {"doctor_id": 2 + n % OTHER_DOCTORS, "date": when.date().isoformat(), "time": when.time().isoformat()}
+            for method, url, kwargs in (("POST", BOOK_URL, {"json": body, "headers": headers}),
+                                        ("GET", "/doctors/doctors/", {})):
+                started = time.perf_counter()
+                r = await client.request(method, url, **kwargs)
+                assert r.status_code == 200, (url, r.status_code, r.text)
+                other_ms.append((time.perf_counter() - started) * 1000)
+            n += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            background = asyncio.create_task(other_traffic(client))
+            started = time.perf_counter()
+            await asyncio.gather(*(patient(client, user_id) for user_id in range(1, patients + 1)))
+            elapsed = time.perf_counter() - started
+            done.set()
+            await background
+
+    return {
+        "seconds": round(elapsed, 2),
+        "status_codes": dict(sorted(codes.items())),
+        "booked": codes[200],
+        "hot_doctor": summarize(hot_ms),
+        "booking_sql_statements": booking_statements(),
+        "other_traffic": summarize(other_ms),
+    }
+
+
+def child(config, patients, slots, seed_value):
+    from benchmarks._common import use_scratch_database
+
+    use_scratch_database(f"admission-{config}.db")
+    from app.database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    seed(engine, patients)
+    print(json.dumps(asyncio.run(run(patients, slots, seed_value))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--patients", type=int, default=400)
+    parser.add_argument("--slots", type=int, default=16, help="at most 47 (half-hour slots in one day)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--child", choices=list(CONFIGS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.patients, args.slots, args.seed)
+        return
+
+    report = {}
+    for config, env in CONFIGS.items():
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_booking_admission", "--child", config,
+             "--patients", str(args.patients), "--slots", str(args.slots), "--seed", str(args.seed)],
+            env={**os.environ, "LOG_LEVEL": "WARNING", **env}, check=True, capture_output=True, text=True,
+        ).stdout
+        report[config] = json.loads(out.strip().splitlines()[-1])
+        assert report[config]["booked"] == args.slots, f"{config}: {report[config]['booked']} slots booked"
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_booking_contention.py
+"""
+Fire N parallel bookings at one doctor's slot and check that exactly one
+wins while the rest fail fast with 409.
+
+    python -m benchmarks.bench_booking_contention --requests 200 --rounds 5
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import time
+
+from benchmarks._common import use_scratch_database, summarize, auth_header
+
+use_scratch_database()
+
+import httpx  # noqa: E402
+from sqlmodel import Session, select, func  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.database import create_db_and_tables, engine  # noqa: E402
+from app.models import User, Doctor, Appointment, Availability  # noqa: E402
+
+create_db_and_tables()  # the app does this in its lifespan, which is not run here
+
+BOOK_URL = "/appointments/appointments/"
+
+
+def seed(patients):
+    with Session(engine) as session:
+        doctor = Doctor(name="Dr. Hot Slot", specialty="Cardiology")
+        session.add(doctor)
+        session.flush()
+        session.add(Availability(doctor_id=doctor.id, date=datetime.date(2030, 1, 7),
+                                 start_time=datetime.time(9), end_time=datetime.time(17)))
+        users = [User(name=f"p{i}", email=f"p{i}@bench.local", password_hash="x") for i in range(patients)]
+        session.add_all(users)
+        session.commit()
+        return doctor.id, [u.id for u in users]
+
+
+async def one_round(client, doctor_id, user_ids, slot):
+    payload = {"doctor_id": doctor_id, "date": slot.date().isoformat(), "time": slot.time().isoformat()}
+    headers = [auth_header(uid) for uid in user_ids]
+
+    async def book(h):
+        started = time.perf_counter()
+        r = await client.post(BOOK_URL, json=payload, headers=h)
+        return r.status_code, (time.perf_counter() - started) * 1000
+
+    return await asyncio.gather(*(book(h) for h in headers))
+
+
+async def main(requests, rounds):
+    doctor_id, user_ids = seed(requests)
+    transport = httpx.ASGITransport(app=app)
+    latencies, codes = [], {}
+    base = datetime.datetime(2030, 1, 7, 9, 0)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for r in range(rounds):
+            slot = base + datetime.timedelta(minutes=30 * r)
+            results = await one_round(client, doctor_id, user_ids, slot)
+            winners = sum(1 for code, _ in results if code == 200)
+            assert winners == 1, f"round {r}: {winners} bookings succeeded"
+            for code, ms in results:
+                codes[code] = codes.get(code, 0) + 1
+                latencies.append(ms)
+
+    with Session(engine) as session:
+        booked = session.exec(select(func.count()).select_from(Appointment).where(Appointment.status == "booked")).one()
+    assert booked == rounds, f"{booked} rows booked for {rounds} slots"
+
+    report = {"requests_per_round": requests, "rounds": rounds, "status_codes": codes, "latency": summarize(latencies)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200, help="parallel bookings per slot")
+    parser.add_argument("--rounds", type=int, default=5, help="number of slots to contend for")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.rounds))
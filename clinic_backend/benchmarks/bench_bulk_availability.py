@@ -0,0 +1,91 @@
+# benchmarks/bench_bulk_availability.py
+"""
+Loading a schedule: one POST /availability/ per window vs POST /availability/bulk.
+
+Measures, over HTTP against SQLite:
+- --singles windows posted one request at a time (the old way), reported
+  per window and extrapolated to --windows;
+- --windows explicit windows in one bulk request (one fresh doctor per
+  run, so every run inserts everything);
+- the same request again with on_overlap=skip, where every window
+  overlaps (the overlap check without inserts);
+- a quarter of recurring weekday shifts sent as one rule.
+
+    python -m benchmarks.bench_bulk_availability --windows 10000
+"""
+import argparse
+import datetime
+import json
+import time
+
+
+def windows(count, start=datetime.date(2031, 1, 1)):
+    # 28 half-hour windows a day, 06:00-20:00
+    out = []
+    for i in range(count):
+        minute = 6 * 60 + i % 28 * 30
+        out.append({"date": str(start + datetime.timedelta(days=i // 28)),
+                    "start_time": f"{minute // 60:02d}:{minute % 60:02d}",
+                    "end_time": f"{(minute + 30) // 60:02d}:{(minute + 30) % 60:02d}"})
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--windows", type=int, default=10000)
+    parser.add_argument("--singles", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    from benchmarks._common import use_scratch_database, auth_header
+
+    use_scratch_database("bulk.db")
+    from fastapi.testclient import TestClient
+    from sqlmodel import Session
+    from app.main import app
+    from app.database import create_db_and_tables, engine
+    from app.models import Doctor, User
+
+    create_db_and_tables()  # the app does this in its lifespan, which is not run here
+
+    with Session(engine) as session:
+        session.add(User(name="admin", email="admin@example.com", password_hash="x", role="admin"))
+        session.add_all(Doctor(name=f"doctor{i}") for i in range(args.runs + 2))
+        session.commit()
+    client = TestClient(app)
+    headers = auth_header(1, "admin")
+    report = {"windows": args.windows}
+
+    started = time.perf_counter()
+    for w in windows(args.singles):
+        assert client.post("/availability/availability/", json={"doctor_id": 1, **w}, headers=headers).status_code == 200
+    per_window = (time.perf_counter() - started) / args.singles
+    report["single_posts_ms_per_window"] = round(per_window * 1000, 2)
+    report["single_posts_extrapolated_s"] = round(per_window * args.windows, 1)
+
+    body = windows(args.windows)
+    samples = []
+    for run in range(args.runs):
+        started = time.perf_counter()
+        r = client.post("/availability/availability/bulk", json={"doctor_id": 2 + run, "windows": body}, headers=headers)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert r.status_code == 200 and r.json()["inserted"] == args.windows, r.text
+    report["bulk_insert_ms"] = round(min(samples), 1)
+
+    started = time.perf_counter()
+    r = client.post("/availability/availability/bulk",
+                    json={"doctor_id": 2, "windows": body, "on_overlap": "skip"}, headers=headers)
+    report["bulk_all_overlapping_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    assert r.json()["skipped"] == args.windows
+
+    rule = {"weekdays": [0, 1, 2, 3, 4], "start_time": "08:00", "end_time": "17:00",
+            "date_from": "2032-01-01", "date_to": "2032-03-31", "exceptions": ["2032-01-01"]}
+    started = time.perf_counter()
+    r = client.post("/availability/availability/bulk", json={"doctor_id": 2, "rules": [rule]}, headers=headers)
+    report["quarter_rule_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    report["quarter_rule_inserted"] = r.json()["inserted"]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
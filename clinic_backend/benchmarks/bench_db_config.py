@@ -0,0 +1,180 @@
+# benchmarks/bench_db_config.py
+"""
+Mixed read/write workload with and without the SQLite engine settings.
+
+Runs the same workload against three configurations, each on its own
+scratch database shared by --processes app processes, as several server
+workers would (the engine is built at import time, so every configuration
+runs in fresh processes):
+- untuned: no PRAGMAs (rollback journal, synchronous=full, SQLite's
+  default cache, no mmap), the sqlite3 driver's deferred transactions and
+  SQLAlchemy's default pool of 5 + 10;
+- tuned: the defaults in app/database.py (WAL, synchronous=normal,
+  busy_timeout, mmap, larger cache, BEGIN IMMEDIATE for writes, pool of
+  20 + 20);
+- tuned + read pool: as tuned, with DATABASE_READ_URL pointing at the
+  same file so GET requests use their own read-only pool.
+
+The workload interleaves slot lookups, doctor listings and "my
+appointments" (reads) with bookings (writes) at --write-ratio, issued by
+--concurrency clients spread over the processes, each process driving its
+ASGI app directly. Failed requests ("database is locked" surfaces as 500)
+are counted, not retried.
+
+    python -m benchmarks.bench_db_config --requests 4000 --concurrency 16 --processes 4
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from benchmarks._common import summarize
+
+DOCTORS = 50
+PATIENTS = 200
+UNTUNED = {"DB_JOURNAL_MODE": "", "DB_SYNCHRONOUS": "", "DB_BUSY_TIMEOUT_MS": "", "DB_MMAP_SIZE": "",
+           "DB_CACHE_SIZE": "", "DB_SQLITE_BEGIN": "", "DB_POOL_SIZE": "5", "DB_MAX_OVERFLOW": "10"}
+CONFIGS = ["untuned", "tuned", "tuned_read_pool"]
+
+
+def seed(engine):
+    from sqlmodel import Session
+    from app.models import AvailabilityTemplate, Doctor, User
+
+    with Session(engine) as session:
+        session.add_all(Doctor(name=f"doctor{i}", specialty=f"specialty{i % 5}") for i in range(DOCTORS))
+        session.add_all(User(name=f"p{i}", email=f"p{i}@bench.local", password_hash="x") for i in range(PATIENTS))
+        session.commit()
+        session.add_all(AvailabilityTemplate(doctor_id=d, weekday=w, start_time=datetime.time(8),
+                                             end_time=datetime.time(18), effective_from=datetime.date(2030, 1, 1))
+                        for d in range(1, DOCTORS + 1) for w in range(5))
+        session.commit()
+
+
+def plan(requests, write_ratio):
+    """(kind, method, url, body, patient) per request, in a fixed order."""
+    rnd = random.Random(7)
+    slots = itertools.count()
+    monday = datetime.date(2030, 1, 7)
+    out = []
+    for _ in range(requests):
+        patient = rnd.randint(1, PATIENTS)
+        roll = rnd.random()
+        if roll < write_ratio:
+            n = next(slots)
+            day, rest = divmod(n, 20 * DOCTORS)
+            doctor, step = divmod(rest, 20)
+            date = monday + datetime.timedelta(days=day // 5 * 7 + day % 5)
+            body = {"doctor_id": doctor + 1, "date": str(date), "time": f"{8 + step // 2:02d}:{step % 2 * 30:02d}"}
+            out.append(("book", "POST", "/appointments/appointments/", body, patient))
+        elif roll < write_ratio + (1 - write_ratio) / 2:
+            doctor = rnd.randint(1, DOCTORS)
+            out.append(("slots", "GET", f"/availability/availability/{doctor}/slots?from={monday}", None, patient))
+        elif roll < write_ratio + (1 - write_ratio) * 3 / 4:
+            out.append(("doctors", "GET", f"/doctors/doctors/?specialty=specialty{rnd.randint(0, 4)}", None, patient))
+        else:
+            out.append(("my_appointments", "GET", "/appointments/appointments/me", None, patient))
+    return out
+
+
+async def run_workload(queue, concurrency):
+    import httpx
+    from app.main import app
+    from benchmarks._common import auth_header
+
+    headers = {p: auth_header(p) for p in range(1, PATIENTS + 1)}
+    queue = list(reversed(queue))
+    latencies = {}
+    codes = Counter()
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def worker():
+            while queue:
+                kind, method, url, body, patient = queue.pop()
+                started = time.perf_counter()
+                r = await client.request(method, url, json=body, headers=headers[patient])
+                latencies.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+                codes[f"{kind} {r.status_code}"] += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, codes
+
+
+def child(role, args):
+    # Environment (DATABASE_URL and the configuration) comes from the parent.
+    from app.database import engine, create_db_and_tables
+
+    if role == "seed":
+        create_db_and_tables()
+        seed(engine)
+        return
+    queue = plan(args.requests, args.write_ratio)[args.part::args.processes]
+    time.sleep(max(0.0, args.start_at - time.time()))  # all processes start together
+    started = time.time()
+    latencies, codes = asyncio.run(run_workload(queue, args.concurrency // args.processes or 1))
+    print(json.dumps({"started": started, "finished": time.time(), "latencies": latencies, "codes": codes}))
+
+
+def run_config(config, args):
+    from benchmarks._common import use_scratch_database
+
+    env = dict(os.environ)
+    path = use_scratch_database(f"{config}.db")
+    env["DATABASE_URL"] = os.environ.pop("DATABASE_URL")
+    if config == "untuned":
+        env.update(UNTUNED)
+    if config == "tuned_read_pool":
+        env["DATABASE_READ_URL"] = f"sqlite:///{path}"
+    command = [sys.executable, "-m", "benchmarks.bench_db_config", "--requests", str(args.requests),
+               "--concurrency", str(args.concurrency), "--processes", str(args.processes),
+               "--write-ratio", str(args.write_ratio)]
+    subprocess.run(command + ["--child", "seed"], env=env, check=True, capture_output=True)
+    start_at = str(time.time() + 5)
+    workers = [subprocess.Popen(command + ["--child", "work", "--part", str(i), "--start-at", start_at],
+                                env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+               for i in range(args.processes)]
+    results = [json.loads(w.communicate()[0].strip().splitlines()[-1]) for w in workers]
+    elapsed = max(r["finished"] for r in results) - min(r["started"] for r in results)
+    latencies, codes = {}, Counter()
+    for r in results:
+        codes.update(r["codes"])
+        for kind, values in r["latencies"].items():
+            latencies.setdefault(kind, []).extend(values)
+    return {
+        "requests_per_second": round(args.requests / elapsed, 1),
+        "status_codes": dict(sorted(codes.items())),
+        **{kind: summarize(values) for kind, values in sorted(latencies.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=16, help="clients, split across processes")
+    parser.add_argument("--processes", type=int, default=4, help="app worker processes sharing the database")
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--child", choices=["seed", "work"], help=argparse.SUPPRESS)
+    parser.add_argument("--part", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args)
+        return
+
+    report = {"requests": args.requests, "concurrency": args.concurrency,
+              "processes": args.processes, "write_ratio": args.write_ratio}
+    for config in CONFIGS:
+        report[config] = run_config(config, args)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
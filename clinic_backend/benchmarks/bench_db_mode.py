@@ -0,0 +1,127 @@
+# benchmarks/bench_db_mode.py
+"""
+Compare DB_MODE=sync and DB_MODE=async on the same mixed workload.
+
+DB_MODE is read when the app is imported, so each mode runs in its own
+child process against its own scratch database.
+
+    python -m benchmarks.bench_db_mode --requests 5000 --concurrency 100
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks._common import summarize
+
+DOCTORS = 50
+
+
+def seed(engine):
+    from sqlmodel import Session
+    from app.models import User, Doctor, Clinic, Availability
+
+    with Session(engine) as session:
+        clinic = Clinic(name="Bench Clinic")
+        session.add(clinic)
+        session.flush()
+        for i in range(DOCTORS):
+            doctor = Doctor(name=f"doctor{i}", specialty="General", clinic_id=clinic.id)
+            session.add(doctor)
+            session.flush()
+            for day in range(30):
+                session.add(Availability(doctor_id=doctor.id, date=datetime.date(2030, 1, 1) + datetime.timedelta(days=day),
+                                         start_time=datetime.time(9), end_time=datetime.time(17)))
+        session.add(User(name="patient", email="patient@bench.local", password_hash="x"))
+        session.commit()
+
+
+async def run_workload(requests, concurrency):
+    import httpx
+    from app.main import app
+    from benchmarks._common import auth_header
+
+    headers = auth_header(1)
+    rnd = random.Random(3)
+    slots = itertools.count()
+    latencies = {"doctors": [], "availability": [], "book": []}
+
+    def next_request():
+        roll = rnd.random()
+        if roll < 0.6:
+            return "doctors", "GET", "/doctors/doctors/", None
+        if roll < 0.9:
+            return "availability", "GET", f"/availability/availability/{rnd.randint(1, DOCTORS)}", None
+        n = next(slots)
+        day, minute = divmod(n, 16 * DOCTORS)
+        doctor, step = divmod(minute, 16)
+        when = datetime.datetime(2030, 1, 1, 9) + datetime.timedelta(days=day, minutes=30 * step)
+        body = {"doctor_id": doctor + 1, "date": when.date().isoformat(), "time": when.time().isoformat()}
+        return "book", "POST", "/appointments/appointments/", body
+
+    queue = [next_request() for _ in range(requests)]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            while queue:
+                kind, method, url, body = queue.pop()
+                started = time.perf_counter()
+                r = await client.request(method, url, json=body, headers=headers)
+                assert r.status_code == 200, (url, r.status_code, r.text)
+                latencies[kind].append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    everything = [ms for values in latencies.values() for ms in values]
+    return {
+        "requests_per_second": round(requests / elapsed, 1),
+        "all": summarize(everything),
+        **{kind: summarize(values) for kind, values in latencies.items()},
+    }
+
+
+def child(mode, requests, concurrency):
+    from benchmarks._common import use_scratch_database
+
+    use_scratch_database(f"{mode}.db")
+    os.environ["DB_MODE"] = mode
+    from app.database import engine, create_db_and_tables
+
+    create_db_and_tables()
+    seed(engine)
+    result = asyncio.run(run_workload(requests, concurrency))
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--child", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.requests, args.concurrency)
+        return
+
+    report = {}
+    for mode in ("sync", "async"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_db_mode", "--child", mode,
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        report[mode] = json.loads(out.strip().splitlines()[-1])
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
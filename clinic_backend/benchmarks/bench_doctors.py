@@ -0,0 +1,128 @@
+# benchmarks/bench_doctors.py
+"""
+GET /doctors/: the old per-doctor clinic lookup vs the joined, paginated query.
+
+Seeds --doctors doctors over 50 clinics and 20 specialties, then reports
+- the old listing (select every doctor, then session.get(Clinic) per
+  doctor), with its query count;
+- the new listing over HTTP: first page, a specialty/clinic/name-prefix
+  filtered page, the whole directory walked page by page with the largest
+  page size, and a re-fetch answered 304 from If-None-Match.
+
+    python -m benchmarks.bench_doctors --doctors 5000
+"""
+import argparse
+import json
+import time
+
+
+def seed(doctors):
+    from sqlmodel import Session
+    from app.database import engine
+    from app.models import Clinic, Doctor
+
+    with Session(engine) as session:
+        session.add_all(Clinic(name=f"clinic{i}") for i in range(50))
+        session.commit()
+        session.add_all(
+            Doctor(name=f"{chr(65 + i % 26)}{i:06d}", specialty=f"specialty{i % 20}", clinic_id=i % 50 + 1)
+            for i in range(doctors)
+        )
+        session.commit()
+
+
+def old_list_doctors(engine):
+    # Verbatim logic of the previous list_doctors.
+    from sqlmodel import Session, select
+    from app.models import Clinic, Doctor
+
+    with Session(engine) as session:
+        formatted = []
+        for d in session.exec(select(Doctor)).all():
+            clinic_name = None
+            if d.clinic_id:
+                clinic = session.get(Clinic, d.clinic_id)
+                clinic_name = clinic.name if clinic else None
+            formatted.append({"id": d.id, "name": d.name, "specialty": d.specialty, "clinic": clinic_name})
+        return formatted
+
+
+def timed(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return result, round(samples[len(samples) // 2], 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--doctors", type=int, default=5000)
+    args = parser.parse_args()
+
+    from benchmarks._common import use_scratch_database
+
+    use_scratch_database("doctors.db")
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from app.main import app
+    from app.database import create_db_and_tables, engine
+    from app.directory import etag_cache
+
+    create_db_and_tables()  # the app does this in its lifespan, which is not run here
+
+    seed(args.doctors)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(1))
+    report = {"doctors": args.doctors}
+
+    _, report["old_full_list_ms"] = timed(lambda: old_list_doctors(engine))
+    statements.clear()
+    old_list_doctors(engine)
+    report["old_full_list_queries"] = len(statements)
+
+    client = TestClient(app)
+    url = "/doctors/doctors/"
+
+    def walk():
+        etag_cache.clear()
+        count, cursor = 0, None
+        while True:
+            params = {"limit": 1000, **({"cursor": cursor} if cursor else {})}
+            r = client.get(url, params=params)
+            count += len(r.json())
+            cursor = r.headers.get("x-next-cursor")
+            if not cursor:
+                return count
+
+    statements.clear()
+    total = walk()
+    report["new_full_walk_queries"] = len(statements)
+    _, report["new_full_walk_ms"] = timed(walk)
+    assert total == args.doctors
+
+    def first_page():
+        etag_cache.clear()
+        return client.get(url)
+
+    r, report["new_first_page_ms"] = timed(first_page)
+    etag = r.headers["etag"]
+
+    def filtered():
+        etag_cache.clear()
+        return client.get(url, params={"specialty": "specialty3", "clinic_id": 4, "name": "D"})
+
+    _, report["new_filtered_page_ms"] = timed(filtered)
+
+    client.get(url)  # remember the ETag
+    statements.clear()
+    r, report["revalidate_304_ms"] = timed(lambda: client.get(url, headers={"If-None-Match": etag}), 50)
+    assert r.status_code == 304
+    report["revalidate_304_queries"] = len(statements)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/bench_indexes.py
+"""
+Before/after comparison of the lookup indexes added by app/migrations.py.
+
+Builds a database with the original (primary-key only) schema, seeds it
+with --appointments appointments, prints EXPLAIN QUERY PLAN and latency for
+the hot queries, runs the migrations in place, and measures again.
+
+    python -m benchmarks.bench_indexes --appointments 1000000
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+
+from benchmarks._common import use_scratch_database, summarize
+
+use_scratch_database("indexes.db")
+
+from sqlalchemy import text  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.migrations import run_migrations  # noqa: E402
+
+START = datetime.date(2025, 1, 1)
+TIMES = [f"{h:02d}:{m:02d}:00.000000" for h in range(8, 18) for m in (0, 30)]
+
+QUERIES = {
+    "login: user by email":
+        ("SELECT * FROM user WHERE email = :email", lambda r, n: {"email": f"user{r.randrange(n['users'])}@bench.local"}),
+    "booking conflict check":
+        ("SELECT id FROM appointment WHERE doctor_id = :d AND date = :dt AND time = :t AND status = 'booked'",
+         lambda r, n: {"d": r.randrange(1, n["doctors"] + 1),
+                       "dt": (START + datetime.timedelta(days=r.randrange(n["days"]))).isoformat(),
+                       "t": r.choice(TIMES)}),
+    "appointments/me":
+        ("SELECT * FROM appointment WHERE patient_id = :p", lambda r, n: {"p": r.randrange(1, n["users"] + 1)}),
+    "availability by doctor":
+        ("SELECT * FROM availability WHERE doctor_id = :d", lambda r, n: {"d": r.randrange(1, n["doctors"] + 1)}),
+    "unsent notifications":
+        ("SELECT id FROM notification WHERE sent = 0", lambda r, n: {}),
+}
+
+
+def build_original_schema():
+    """Create the tables, then drop every secondary index to mimic the old clinic.db."""
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{index.name}"')
+
+
+def seed(n):
+    rnd = random.Random(7)
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.executemany("INSERT INTO user (name, email, password_hash, role) VALUES (?, ?, 'x', 'patient')",
+                        ((f"user{i}", f"user{i}@bench.local") for i in range(n["users"])))
+        cur.executemany("INSERT INTO doctor (name, specialty) VALUES (?, 'General')",
+                        ((f"doctor{i}",) for i in range(n["doctors"])))
+        cur.executemany(
+            "INSERT INTO availability (doctor_id, date, start_time, end_time) VALUES (?, ?, '08:00:00.000000', '18:00:00.000000')",
+            ((d, (START + datetime.timedelta(days=day)).isoformat())
+             for d in range(1, n["doctors"] + 1) for day in range(n["days"])))
+
+        def appointments():
+            for i in range(n["appointments"]):
+                status = "cancelled" if rnd.random() < 0.1 else "booked"
+                # walk doctors, then days, then times so every row gets its own slot
+                slot = i
+                doctor = slot % n["doctors"] + 1
+                day = (slot // n["doctors"]) % n["days"]
+                t = TIMES[(slot // (n["doctors"] * n["days"])) % len(TIMES)]
+                yield (rnd.randrange(1, n["users"] + 1), doctor,
+                       (START + datetime.timedelta(days=day)).isoformat(), t, status, "2025-01-01 00:00:00.000000")
+
+        cur.executemany("INSERT INTO appointment (patient_id, doctor_id, date, time, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        appointments())
+        cur.execute("INSERT INTO notification (appointment_id, message, sent, created_at) "
+                    "SELECT id, 'Appointment created', CASE WHEN id % 20 = 0 THEN 0 ELSE 1 END, created_at FROM appointment")
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def measure(n, reps):
+    rnd = random.Random(11)
+    results = {}
+    with engine.connect() as conn:
+        for label, (sql, params) in QUERIES.items():
+            plan = [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql), params(rnd, n))]
+            latencies = []
+            for _ in range(reps):
+                p = params(rnd, n)
+                started = time.perf_counter()
+                conn.execute(text(sql), p).fetchall()
+                latencies.append((time.perf_counter() - started) * 1000)
+            results[label] = {"plan": plan, "latency": summarize(latencies)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--appointments", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--doctors", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--reps", type=int, default=20)
+    args = parser.parse_args()
+    n = vars(args)
+
+    build_original_schema()
+    started = time.perf_counter()
+    seed(n)
+    seeded_s = time.perf_counter() - started
+
+    before = measure(n, args.reps)
+    started = time.perf_counter()
+    applied = run_migrations(engine)
+    migrate_s = time.perf_counter() - started
+    after = measure(n, args.reps)
+
+    report = {"scale": n, "seed_seconds": round(seeded_s, 1),
+              "migrations_applied": applied, "migration_seconds": round(migrate_s, 1),
+              "queries": {label: {"before": before[label], "after": after[label]} for label in QUERIES}}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# benchmarks/bench_launcher.py
+"""
+Throughput of run.py against the production launcher (app/serve.py).
+
+Each configuration serves the same seeded scratch database:
+- run_py: `python run.py` as it is, on 127.0.0.1:8000 with reload;
+- serve_asyncio_h11: `python -m app.serve` with SERVER_LOOP=asyncio and
+  SERVER_HTTP=h11, i.e. the launcher without uvloop and httptools;
+- serve_uvicorn: `python -m app.serve` with SERVER_MANAGER=uvicorn, whose
+  workers are spawned and import the app themselves;
+- serve: `python -m app.serve` with its defaults (uvloop and httptools
+  when installed, gunicorn with preloading when installed).
+run.py also picks uvloop and httptools when they are installed, so
+serve_asyncio_h11 against serve shows what they add, run_py against
+serve_asyncio_h11 everything else (the reload watcher, the access log,
+the worker count), and serve_uvicorn against serve what preloading saves.
+
+For each configuration and each path (GET /healthz, the directory page
+and one doctor's availability) --connections keep-alive connections send
+requests back to back for --seconds. The client speaks HTTP/1.1 over raw
+sockets in this process, to cost the server as little CPU as possible;
+on a small machine it still competes with the server, so compare the
+configurations with each other rather than with other machines.
+
+Also reported: seconds from start to the first 200 from /readyz, and
+the proportional memory (PSS) of the server's processes after the load.
+With --recycle N, one more run of `serve` recycles its workers every N
+requests during the load and counts the failed requests.
+
+    python -m benchmarks.bench_launcher --seconds 10 --connections 32
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from benchmarks._common import summarize, use_scratch_database
+
+PORT = 8000  # run.py's
+CONFIGS = {
+    "run_py": ([sys.executable, "run.py"], {}),
+    "serve_asyncio_h11": ([sys.executable, "-m", "app.serve"], {"SERVER_LOOP": "asyncio", "SERVER_HTTP": "h11"}),
+    "serve_uvicorn": ([sys.executable, "-m", "app.serve"], {"SERVER_MANAGER": "uvicorn"}),
+    "serve": ([sys.executable, "-m", "app.serve"], {}),
+}
+CONTENT_LENGTH = re.compile(rb"(?i)\r\ncontent-length: *(\d+)")
+CONNECTION_CLOSE = re.compile(rb"(?i)\r\nconnection: *close")
+
+
+def seed(engine, doctors):
+    from sqlalchemy import insert
+    from app.models import Availability, Doctor
+
+    today = datetime.date.today()
+    with engine.begin() as conn:
+        conn.execute(insert(Doctor), [{"name": f"Dr. {i:04d}", "specialty": "Cardiology"} for i in range(doctors)])
+        conn.execute(insert(Availability), [
+            {"doctor_id": d + 1, "date": today + datetime.timedelta(days=day),
+             "start_time": datetime.time(8), "end_time": datetime.time(18)}
+            for d in range(doctors) for day in range(14)
+        ])
+
+
+def process_tree(root):
+    """PIDs of `root` and all its descendants."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as stat:
+                    ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+            except OSError:
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    pids, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, ()))
+    return pids
+
+
+def pss_mb(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as rollup:
+                total += sum(int(line.split()[1]) for line in rollup if line.startswith("Pss:"))
+        except OSError:
+            pass
+    return round(total / 1024, 1)
+
+
+async def get(reader, writer, request):
+    """
+    Send one request on a keep-alive connection.
+
+    Returns:
+        tuple: (status code, whether the server closes the connection).
+    """
+    writer.write(request)
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = CONTENT_LENGTH.search(head)
+    await reader.readexactly(int(length.group(1)) if length else 0)
+    return int(head[9:12]), CONNECTION_CLOSE.search(head) is not None
+
+
+async def load(path, connections, seconds):
+    request = f"GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n".encode()
+    latencies, failures = [], {"status": 0, "connection": 0}
+    deadline = time.perf_counter() + seconds
+
+    async def connection():
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+                started = time.perf_counter()
+                status, closing = await get(reader, writer, request)
+                latencies.append((time.perf_counter() - started) * 1000)
+                failures["status"] += status != 200
+                if closing:  # the worker is being recycled or stopped
+                    writer.close()
+                    writer = None
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Closed without an answer: the request was lost.
+                failures["connection"] += 1
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(connection() for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "latency": summarize(latencies),
+        "failed": failures,
+    }
+
+
+async def wait_ready(timeout=60):
+    request = b"GET /readyz HTTP/1.1\r\nHost: bench\r\n\r\n"
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+            try:
+                if (await get(reader, writer, request))[0] == 200:
+                    return
+            finally:
+                writer.close()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        await asyncio.sleep(0.05)
+    raise RuntimeError("server did not become ready")
+
+
+def run(command, env, paths, args):
+    started = time.perf_counter()
+    server = subprocess.Popen(command, env={**os.environ, **env}, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_ready())
+        report = {"ready_seconds": round(time.perf_counter() - started, 2)}
+        for name, path in paths.items():
+            report[name] = asyncio.run(load(path, args.connections, args.seconds))
+        report["pss_mb"] = pss_mb(process_tree(server.pid))
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--configs", default=",".join(CONFIGS))
+    parser.add_argument("--seconds", type=float, default=10, help="per path")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="SERVER_WORKERS")
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--recycle", type=int, default=0, help="SERVER_MAX_REQUESTS of the extra recycling run")
+    args = parser.parse_args()
+
+    use_scratch_database("launcher.db")
+    from app.database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    seed(engine, args.doctors)
+    engine.dispose()
+
+    paths = {
+        "healthz": "/healthz",
+        "directory": "/doctors/doctors/?limit=20",
+        "availability": f"/availability/availability/{args.doctors // 2}",
+    }
+    base = {"LOG_LEVEL": "WARNING", "SERVER_HOST": "127.0.0.1", "SERVER_PORT": str(PORT),
+            "SERVER_WORKERS": str(args.workers)}
+    report = {"workers": args.workers, "connections": args.connections}
+    for name in args.configs.split(","):
+        command, env = CONFIGS[name]
+        report[name] = run(command, {**base, **env}, paths, args)
+    if args.recycle:
+        env = {**base, "SERVER_MAX_REQUESTS": str(args.recycle), "SERVER_MAX_REQUESTS_JITTER": str(args.recycle // 10)}
+        report[f"serve_recycle_{args.recycle}"] = run(CONFIGS["serve"][0], env, paths, args)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
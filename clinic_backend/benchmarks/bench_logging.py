@@ -0,0 +1,199 @@
+# benchmarks/bench_logging.py
+"""
+Request latency with a slow log sink: print() against queued logging.
+
+Each mode runs in a child process whose stdout and stderr go to a pipe
+that the parent drains at --sink-kbps, like a terminal, container log
+driver or log shipper that cannot keep up. Once the pipe buffer is full,
+every write from a request blocks until the sink catches up. The workload
+is authenticated GET /appointments/appointments/me (80%) and bookings
+(20%), each of which sends a confirmation email through send_email_stub:
+- print: the code before app/logs.py, which printed the bearer token on
+  every authenticated request and the whole email on every booking
+  (patched back in for this mode);
+- sync_debug: LOG_LEVEL=DEBUG with LOG_QUEUE_SIZE=0, so the request line,
+  email and email body are written by the request itself;
+- queue_debug: the same records through the queue and writer thread;
+- queue_info: the defaults (INFO, queued): one email line per booking.
+
+The HTTP client's own loggers are silenced in every mode.
+
+    python -m benchmarks.bench_logging --requests 3000 --sink-kbps 16
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks._common import summarize
+
+DOCTORS = 20
+QUIET = "sqlalchemy=WARNING,aiosqlite=WARNING,httpx=WARNING,httpcore=WARNING,passlib=WARNING"
+MODES = {
+    "print": {"LOG_LEVEL": "WARNING", "LOG_LEVELS": QUIET},
+    "sync_debug": {"LOG_LEVEL": "DEBUG", "LOG_LEVELS": QUIET, "LOG_QUEUE_SIZE": "0"},
+    "queue_debug": {"LOG_LEVEL": "DEBUG", "LOG_LEVELS": QUIET},
+    "queue_info": {"LOG_LEVELS": QUIET},
+}
+
+
+def seed(engine):
+    from sqlmodel import Session
+    from app.models import User, Doctor, Clinic, Availability
+
+    with Session(engine) as session:
+        clinic = Clinic(name="Bench Clinic")
+        session.add(clinic)
+        session.flush()
+        for i in range(DOCTORS):
+            doctor = Doctor(name=f"doctor{i}", specialty="General", clinic_id=clinic.id)
+            session.add(doctor)
+            session.flush()
+            for day in range(60):
+                session.add(Availability(doctor_id=doctor.id, date=datetime.date(2030, 1, 1) + datetime.timedelta(days=day),
+                                         start_time=datetime.time(9), end_time=datetime.time(17)))
+        session.add(User(name="patient", email="patient@example.com", password_hash="x"))
+        session.commit()
+
+
+def restore_prints():
+    """Put back the print() calls app/logs.py replaced."""
+    from app import auth
+    from app.routers import appointments_router
+
+    user_id_from_token = auth._user_id_from_token
+
+    def printing_user_id_from_token(token):
+        print("Received token: ", token)
+        return user_id_from_token(token)
+
+    def printing_send_email_stub(to_email, subject, message):
+        print(f"[EMAIL] To: {to_email} | Subject: {subject}\n{message}\n")
+
+    auth._user_id_from_token = printing_user_id_from_token
+    appointments_router.send_email_stub = printing_send_email_stub
+
+
+async def run_workload(requests, concurrency):
+    import httpx
+    from app.main import app
+    from benchmarks._common import auth_header
+
+    headers = auth_header(1)
+    rnd = random.Random(5)
+    slots = itertools.count()
+    latencies = {"read": [], "book": []}
+
+    def next_request():
+        if rnd.random() < 0.8:
+            return "read", "GET", "/appointments/appointments/me", None
+        day, minute = divmod(next(slots), 16 * DOCTORS)
+        doctor, step = divmod(minute, 16)
+        when = datetime.datetime(2030, 1, 1, 9) + datetime.timedelta(days=day, minutes=30 * step)
+        body = {"doctor_id": doctor + 1, "date": when.date().isoformat(), "time": when.time().isoformat()}
+        return "book", "POST", "/appointments/appointments/", body
+
+    queue = [next_request() for _ in range(requests)]
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def worker():
+                while queue:
+                    kind, method, url, body = queue.pop()
+                    started = time.perf_counter()
+                    r = await client.request(method, url, json=body, headers=headers)
+                    assert r.status_code == 200, (url, r.status_code, r.text)
+                    latencies[kind].append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+
+    from app.logs import DroppingQueueHandler
+
+    everything = [ms for values in latencies.values() for ms in values]
+    return {
+        "requests_per_second": round(requests / elapsed, 1),
+        "all": summarize(everything),
+        **{kind: summarize(values) for kind, values in latencies.items()},
+        "log_records_dropped": DroppingQueueHandler.dropped,
+    }
+
+
+def child(mode, requests, concurrency, out):
+    from benchmarks._common import use_scratch_database
+
+    use_scratch_database(f"{mode}.db")
+    from app.database import engine, create_db_and_tables
+
+    create_db_and_tables()
+    seed(engine)
+    if mode == "print":
+        restore_prints()
+    result = asyncio.run(run_workload(requests, concurrency))
+    with open(out, "w") as f:
+        json.dump(result, f)
+
+
+def run_mode(mode, args):
+    """Run one mode in a child whose output is drained at --sink-kbps; returns its report."""
+    out = os.path.join(tempfile.mkdtemp(prefix="clinic-bench-"), "result.json")
+    env = {**os.environ, "DB_MODE": "sync", "PYTHONUNBUFFERED": "1", **MODES[mode]}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_logging", "--child", mode, "--out", out,
+         "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+    )
+    written = 0
+
+    def sink():
+        nonlocal written
+        while chunk := proc.stdout.read1(4096):
+            written += len(chunk)
+            if args.sink_kbps:
+                time.sleep(len(chunk) / (args.sink_kbps * 1024))
+
+    reader = threading.Thread(target=sink, daemon=True)
+    reader.start()
+    proc.wait()
+    reader.join()
+    if proc.returncode != 0:
+        raise SystemExit(f"{mode} failed with status {proc.returncode}")
+    with open(out) as f:
+        report = json.load(f)
+    report["log_bytes"] = written
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sink-kbps", type=float, default=16, help="drain rate of the log pipe; 0 = unthrottled")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--child", choices=list(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.requests, args.concurrency, args.out)
+        return
+
+    report = {mode: run_mode(mode, args) for mode in args.modes}
+    if "print" in report:
+        for mode, result in report.items():
+            result["p50_saved_ms"] = round(report["print"]["all"]["p50_ms"] - result["all"]["p50_ms"], 3)
+            result["p95_saved_ms"] = round(report["print"]["all"]["p95_ms"] - result["all"]["p95_ms"], 3)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
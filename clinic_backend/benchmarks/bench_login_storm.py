@@ -0,0 +1,110 @@
+# benchmarks/bench_login_storm.py
+"""
+Latency of a non-auth endpoint while logins saturate bcrypt.
+
+Runs twice, each in its own process: once with hashing inline on the
+request threadpool (PASSWORD_HASH_WORKERS=0, no admission limit, i.e. the
+old behaviour) and once with the default process pool and queue limit.
+A probe client calls GET /doctors/ at a steady rate before and during
+the storm.
+
+    python -m benchmarks.bench_login_storm --storm-clients 80 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODES = {
+    "inline": {"PASSWORD_HASH_WORKERS": "0", "PASSWORD_HASH_QUEUE_LIMIT": "100000"},
+    "pool": {},
+}
+
+
+async def probe(client, seconds, interval=0.05):
+    from benchmarks._common import summarize
+
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        r = await client.get("/doctors/doctors/")
+        assert r.status_code == 200
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+    return summarize(latencies)
+
+
+async def storm(client, clients, seconds):
+    codes = {}
+    deadline = time.perf_counter() + seconds
+
+    async def login_loop():
+        while time.perf_counter() < deadline:
+            r = await client.post("/auth/auth/login", json={"email": "storm@example.com", "password": "hunter22"})
+            codes[r.status_code] = codes.get(r.status_code, 0) + 1
+            if r.status_code == 503:
+                # well-behaved clients back off for Retry-After seconds
+                await asyncio.sleep(float(r.headers.get("Retry-After", "1")))
+
+    await asyncio.gather(*(login_loop() for _ in range(clients)))
+    return codes
+
+
+async def run(clients, seconds):
+    import httpx
+    from sqlmodel import Session
+    from app.main import app
+    from app.database import create_db_and_tables, engine
+    from app.models import User, Doctor
+    from app.utils import hash_password
+
+    create_db_and_tables()  # the app does this in its lifespan, which is not run here
+
+    with Session(engine) as session:
+        session.add(User(name="storm", email="storm@example.com", password_hash=hash_password("hunter22")))
+        session.add_all(Doctor(name=f"doctor{i}", specialty="General") for i in range(20))
+        session.commit()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        idle = await probe(client, 2)
+        busy, codes = await asyncio.gather(probe(client, seconds), storm(client, clients, seconds))
+    return {"probe_idle": idle, "probe_during_storm": busy, "login_status_codes": codes}
+
+
+def child(clients, seconds):
+    from benchmarks._common import use_scratch_database
+
+    use_scratch_database("storm.db")
+    result = asyncio.run(run(clients, seconds))
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--storm-clients", type=int, default=80)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.storm_clients, args.seconds)
+        return
+
+    report = {}
+    for mode, env in MODES.items():
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_login_storm", "--child",
+             "--storm-clients", str(args.storm_clients), "--seconds", str(args.seconds)],
+            check=True, capture_output=True, text=True, env={**os.environ, **env},
+        ).stdout
+        report[mode] = json.loads(out.strip().splitlines()[-1])
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
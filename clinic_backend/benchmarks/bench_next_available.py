@@ -0,0 +1,96 @@
+# benchmarks/bench_next_available.py
+"""
+Cost of "next available slot" searches.
+
+Seeds --doctors doctors over 10 specialties with daily availability for
+--days days, then measures the one-off index build, warm searches, a
+search right after a booking, and searches whose 7-day window has gone
+stale (older than NEXT_AVAILABLE_STALE_SECONDS), so they re-read it.
+
+    python -m benchmarks.bench_next_available --doctors 2000 --days 90
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+
+from benchmarks._common import use_scratch_database, summarize
+
+use_scratch_database("next.db")
+
+from app.database import engine, create_db_and_tables  # noqa: E402
+from app.next_available import NextAvailableIndex  # noqa: E402
+
+SPECIALTIES = [f"specialty{i}" for i in range(10)]
+
+
+def seed(doctors, days):
+    rnd = random.Random(1)
+    today = datetime.date.today()
+    create_db_and_tables()
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.executemany("INSERT INTO doctor (name, specialty, clinic_id) VALUES (?, ?, ?)",
+                        ((f"doctor{i}", SPECIALTIES[i % 10], i % 20) for i in range(doctors)))
+        cur.executemany(
+            "INSERT INTO availability (doctor_id, date, start_time, end_time) VALUES (?, ?, ?, ?)",
+            ((d, (today + datetime.timedelta(days=day)).isoformat(),
+              f"{rnd.choice((8, 9, 10)):02d}:00:00.000000", f"{rnd.choice((15, 16, 17)):02d}:00:00.000000")
+             for d in range(1, doctors + 1) for day in range(1, days)))
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--doctors", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--reps", type=int, default=200)
+    args = parser.parse_args()
+    seed(args.doctors, args.days)
+
+    index = NextAvailableIndex(horizon_days=args.days)
+    today = datetime.date.today()
+    started = time.perf_counter()
+    index.search(SPECIALTIES[0], today, today + datetime.timedelta(days=args.days - 1), k=10)
+    build_s = time.perf_counter() - started
+
+    rnd = random.Random(2)
+    warm = []
+    for _ in range(args.reps):
+        spec = rnd.choice(SPECIALTIES)
+        date_from = today + datetime.timedelta(days=rnd.randrange(args.days - 7))
+        started = time.perf_counter()
+        index.search(spec, date_from, date_from + datetime.timedelta(days=7), k=10)
+        warm.append((time.perf_counter() - started) * 1000)
+
+    after_change = []
+    for _ in range(args.reps // 4):
+        top = index.search(SPECIALTIES[0], today, today + datetime.timedelta(days=args.days - 1), k=1)[0]
+        index.on_booked(top["doctor_id"], top["date"], top["time"])
+        index.on_changed(top["doctor_id"], date=top["date"])  # e.g. a cancellation elsewhere that day
+        started = time.perf_counter()
+        index.search(SPECIALTIES[0], today, today + datetime.timedelta(days=args.days - 1), k=10)
+        after_change.append((time.perf_counter() - started) * 1000)
+
+    index.stale_seconds = 0  # every search finds its window stale
+    stale = []
+    for _ in range(args.reps // 4):
+        spec = rnd.choice(SPECIALTIES)
+        date_from = today + datetime.timedelta(days=rnd.randrange(args.days - 7))
+        started = time.perf_counter()
+        index.search(spec, date_from, date_from + datetime.timedelta(days=7), k=10)
+        stale.append((time.perf_counter() - started) * 1000)
+
+    slots = sum(len(v) for v in index._free.values())
+    print(json.dumps({"doctors": args.doctors, "days": args.days, "indexed_free_slots": slots,
+                      "build_seconds": round(build_s, 2), "warm_search": summarize(warm),
+                      "search_after_dirty_day": summarize(after_change),
+                      "search_of_stale_window": summarize(stale)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
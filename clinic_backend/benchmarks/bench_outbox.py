@@ -0,0 +1,189 @@
+# benchmarks/bench_outbox.py
+"""
+Notification delivery throughput: old dispatch_pending loop vs the outbox worker.
+
+Starts a local SMTP sink (a minimal SMTP server that accepts and counts
+messages, with --smtp-delay-ms of simulated latency per message), seeds
+--notifications pending notifications and delivers them:
+- with the old dispatch loop (two session.get per row, one message at a
+  time, one commit at the end) over an SMTP connection per message;
+- with OutboxWorker.drain() at concurrency 1 and at --concurrency;
+- with two workers draining the same outbox at once, checking that the
+  sink received every notification exactly once.
+
+    python -m benchmarks.bench_outbox --notifications 5000
+"""
+import argparse
+import json
+import multiprocessing
+import socketserver
+import threading
+import time
+from collections import Counter
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay_ms):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.delay = delay_ms / 1000
+        self.received = Counter()  # message body -> times received
+        self.lock = threading.Lock()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode(errors="replace").strip().split(" ")[0].upper()
+            if verb == "DATA":
+                self.reply("354 end with <CRLF>.<CRLF>")
+                body = []
+                for data in iter(self.rfile.readline, b""):
+                    if data in (b".\r\n", b".\n"):
+                        break
+                    body.append(data.decode(errors="replace"))
+                time.sleep(self.server.delay)
+                text = "".join(body).strip().splitlines()[-1]  # last line is the message
+                with self.server.lock:
+                    self.server.received[text] += 1
+                self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:  # EHLO, HELO, MAIL, RCPT, RSET, NOOP
+                self.reply("250 ok")
+
+
+def _run_sink(delay_ms, conn):
+    sink = SMTPSink(delay_ms)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    conn.send(sink.server_address[1])
+    while True:  # commands from the benchmark: "report" (and reset) or "stop"
+        command = conn.recv()
+        with sink.lock:
+            conn.send(dict(sink.received))
+            sink.received.clear()
+        if command == "stop":
+            return
+
+
+def start_sink(delay_ms):
+    """Run the SMTP sink in its own process so it does not share our GIL."""
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_run_sink, args=(delay_ms, child), daemon=True)
+    process.start()
+    return parent.recv(), parent
+
+
+def seed(count):
+    import datetime
+    from sqlalchemy import insert, update
+    from sqlmodel import Session
+    from app.database import engine
+    from app.models import Appointment, Doctor, Notification, User
+
+    with Session(engine) as session:
+        if not session.get(Doctor, 1):
+            session.add(Doctor(name="doctor"))
+            session.add_all(User(name=f"p{i}", email=f"p{i}@example.com", password_hash="x") for i in range(100))
+            session.commit()
+    with engine.begin() as conn:
+        conn.execute(update(Notification).values(sent=True))
+        appointment_ids = conn.execute(insert(Appointment).returning(Appointment.id), [
+            {"patient_id": i % 100 + 1, "doctor_id": 1, "date": datetime.date(2030, 1, 1),
+             "time": datetime.time(0, 0), "status": "cancelled", "created_at": datetime.datetime.utcnow()}
+            for i in range(count)
+        ]).scalars().all()
+        conn.execute(insert(Notification), [
+            {"appointment_id": a, "message": f"notification {a}-{time.monotonic_ns()}", "sent": False,
+             "attempts": 0, "created_at": datetime.datetime.utcnow()}
+            for a in appointment_ids
+        ])
+
+
+def old_dispatch(engine, transport):
+    # The previous dispatch_pending, with send_email_stub swapped for a
+    # one-message send through the same transport.
+    from sqlmodel import Session, select
+    from app.models import Appointment, Notification, User
+    from app.outbox import OutgoingEmail
+
+    with Session(engine) as session:
+        pending = session.exec(select(Notification).where(Notification.sent == False)).all()  # noqa: E712
+        for n in pending:
+            if n.appointment_id:
+                appt = session.get(Appointment, n.appointment_id)
+                if appt:
+                    user = session.get(User, appt.patient_id)
+                    if user:
+                        transport.send_many([OutgoingEmail(n.id, user.email, "Notification", n.message)])
+            n.sent = True
+            session.add(n)
+        session.commit()
+    return len(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--notifications", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--smtp-delay-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    from benchmarks._common import use_scratch_database
+
+    use_scratch_database("outbox.db")
+    from app.database import create_db_and_tables, engine
+    from app.outbox import OutboxWorker, SMTPTransport
+
+    create_db_and_tables()
+    port, sink = start_sink(args.smtp_delay_ms)
+    transport = SMTPTransport("127.0.0.1", port)
+    n = args.notifications
+    report = {"notifications": n, "smtp_delay_ms": args.smtp_delay_ms}
+
+    seed(n)
+    started = time.perf_counter()
+    old_dispatch(engine, transport)
+    report["old_dispatch_per_second"] = round(n / (time.perf_counter() - started), 1)
+
+    for concurrency in (1, args.concurrency):
+        seed(n)
+        totals = OutboxWorker(transport=transport, concurrency=concurrency).drain()
+        assert totals["delivered"] == n, totals
+        report[f"worker_concurrency_{concurrency}_per_second"] = totals["per_second"]
+
+    seed(n)
+    sink.send("report")
+    sink.recv()
+    results = []
+    workers = [OutboxWorker(transport=transport, concurrency=args.concurrency // 2 or 1) for _ in range(2)]
+    threads = [threading.Thread(target=lambda w=w: results.append(w.drain())) for w in workers]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    sink.send("stop")
+    received = sink.recv()
+    report["two_workers"] = {
+        "per_second": round(n / elapsed, 1),
+        "delivered_by_each": [r["delivered"] for r in results],
+        "distinct_received": len(received),
+        "duplicates": sum(c - 1 for c in received.values()),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
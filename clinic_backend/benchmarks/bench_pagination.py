@@ -0,0 +1,113 @@
+# benchmarks/bench_pagination.py
+"""
+Admin appointment listing: full array vs keyset pages vs streaming.
+
+Seeds --rows appointments, then measures
+- the old behaviour (one select(Appointment).all() serialized to JSON);
+- fetching the first page and a page deep in the table by cursor;
+- a full NDJSON export (the body of GET /admin/appointments?format=ndjson),
+  with peak Python heap (tracemalloc) while it runs.
+
+    python -m benchmarks.bench_pagination --rows 500000
+"""
+import argparse
+import datetime
+import json
+import time
+import tracemalloc
+
+
+def seed(rows):
+    from sqlalchemy import insert
+    from sqlmodel import Session
+    from app.database import engine
+    from app.models import Appointment, Doctor, User
+
+    with Session(engine) as session:
+        session.add(User(name="admin", email="admin@example.com", password_hash="x", role="admin"))
+        session.add_all(Doctor(name=f"doctor{i}", specialty="General") for i in range(100))
+        session.commit()
+    start = datetime.date(2020, 1, 1)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            batch.append({
+                "patient_id": 1, "doctor_id": i % 100 + 1,
+                "date": start + datetime.timedelta(days=i // 1600),
+                "time": datetime.time(8 + (i // 100) % 16 // 2, (i // 100) % 2 * 30),
+                "status": "booked" if i % 5 else "cancelled",
+                "created_at": datetime.datetime(2020, 1, 1),
+            })
+            if len(batch) == 10_000:
+                conn.execute(insert(Appointment), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Appointment), batch)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, round((time.perf_counter() - started) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    from benchmarks._common import use_scratch_database, auth_header
+
+    use_scratch_database("pagination.db")
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.testclient import TestClient
+    from sqlmodel import Session, select
+    from app.main import app
+    from app.database import create_db_and_tables, engine
+    from app.models import Appointment
+    from app.pagination import STREAM_CHUNK_SIZE, _stream, encode_cursor
+    from app.routers.admin_router import APPOINTMENT_COLUMNS
+
+    create_db_and_tables()  # the app does this in its lifespan, which is not run here
+
+    seed(args.rows)
+    client = TestClient(app)
+    headers = auth_header(1, "admin")
+    report = {"rows": args.rows}
+
+    def full_table():
+        tracemalloc.start()
+        with Session(engine) as session:
+            body = json.dumps(jsonable_encoder(session.exec(select(Appointment)).all()))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return len(body), peak
+
+    (size, peak), ms = timed(full_table)
+    report["full_array"] = {"ms": ms, "bytes": size, "peak_heap_mb": round(peak / 2**20, 1)}
+
+    params = {"limit": args.page_size}
+    r, ms = timed(lambda: client.get("/admin/admin/appointments", params=params, headers=headers))
+    report["first_page_ms"] = ms
+    deep = {**params, "cursor": encode_cursor([args.rows - 10 * args.page_size])}
+    r, ms = timed(lambda: client.get("/admin/admin/appointments", params=deep, headers=headers))
+    report["deep_page_ms"] = ms
+
+    def export():
+        # Drive the response body directly: TestClient buffers the whole
+        # stream, which would measure the client rather than the server.
+        stmt = select(*APPOINTMENT_COLUMNS).order_by(Appointment.id)
+        tracemalloc.start()
+        lines = sum(chunk.count("\n") for chunk in _stream(stmt, "ndjson", STREAM_CHUNK_SIZE))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return lines, peak
+
+    (lines, peak), ms = timed(export)
+    report["ndjson_export"] = {"ms": ms, "rows": lines, "peak_heap_mb": round(peak / 2**20, 1)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# benchmarks/bench_read_cache.py
+"""
+Public reads with the read cache off, in memory and in Redis, on two workers.
+
+For each READ_CACHE_BACKEND, two uvicorn workers serve the same scratch
+database (and, for redis, the same Redis-compatible server). Then:
+- load: --clients clients read for --seconds from both workers, picking
+  GET /availability/{id} (60%), /availability/{id}/slots (30%) or
+  /doctors/ (10%) for one of --doctors doctors, while a writer books a
+  slot every --write-interval seconds;
+- consistency: --rounds times, read a doctor's slots from worker A, book
+  one of them through worker B, and read A again. The second read is
+  stale if it still offers the booked time.
+
+Read latency and throughput are measured by the clients. Hit rate, SQL
+statements per read and server time per read (from the request start to
+its last byte, without the HTTP client) come from each worker's /metrics.
+
+Without READ_CACHE_URL, the redis run starts a fakeredis TCP server in
+this process as the stand-in (pip install fakeredis redis); it is much
+slower than a real Redis, so the redis figures are an upper bound.
+
+    python -m benchmarks.bench_read_cache --seconds 20 --clients 8
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks._common import auth_header, summarize, use_scratch_database
+
+PORTS = (8301, 8302)
+USERS = 50
+
+
+def seed(engine, doctors):
+    from sqlalchemy import insert
+    from app.models import Availability, Doctor, User
+
+    today = datetime.date.today()
+    with engine.begin() as conn:
+        conn.execute(insert(Doctor), [{"name": f"Dr. {i:04d}", "specialty": "Cardiology"} for i in range(doctors)])
+        conn.execute(insert(User), [{"name": f"p{i}", "email": f"p{i}@example.com", "password_hash": "x"}
+                                    for i in range(USERS)])
+        conn.execute(insert(Availability), [
+            {"doctor_id": d + 1, "date": today + datetime.timedelta(days=day),
+             "start_time": datetime.time(8), "end_time": datetime.time(18)}
+            for d in range(doctors) for day in range(14)
+        ])
+
+
+def start_fake_redis():
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return f"redis://{host}:{port}/0"
+
+
+def start_workers(env):
+    workers = []
+    for port in PORTS:
+        workers.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            env={**os.environ, **env}, stdout=subprocess.DEVNULL))
+    return workers
+
+
+async def wait_ready(client):
+    import httpx
+
+    for port in PORTS:
+        for _ in range(300):
+            try:
+                await client.get(f"http://127.0.0.1:{port}/")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError(f"worker on port {port} did not start")
+
+
+def read_metrics(text):
+    """Hits, misses, reads, SQL statements and server seconds of the cached GET routes, from /metrics."""
+    hits = sum(float(v) for v in re.findall(r'clinic_read_cache_requests_total\{[^}]*result="hit"\} (\S+)', text))
+    misses = sum(float(v) for v in re.findall(r'clinic_read_cache_requests_total\{[^}]*result="miss"\} (\S+)', text))
+    reads = statements = seconds = 0.0
+    for route in ("/availability/availability/{doctor_id}", "/availability/availability/{doctor_id}/slots",
+                  "/doctors/doctors/"):
+        labels = r'\{method="GET",route="' + re.escape(route) + r'"\} (\S+)'
+        reads += sum(float(v) for v in re.findall(r"clinic_db_statements_per_request_count" + labels, text))
+        statements += sum(float(v) for v in re.findall(r"clinic_db_statements_per_request_sum" + labels, text))
+        seconds += sum(float(v) for v in re.findall(r"clinic_http_request_duration_seconds_sum" + labels, text))
+    return hits, misses, reads, statements, seconds
+
+
+async def run(args, env):
+    import httpx
+
+    workers = start_workers(env)
+    rnd = random.Random(args.seed)
+    today = datetime.date.today()
+    try:
+        async with httpx.AsyncClient(timeout=30) as client:
+            await wait_ready(client)
+            latencies, errors = [], 0
+            deadline = time.perf_counter() + args.seconds
+
+            def url(port, path):
+                return f"http://127.0.0.1:{port}{path}"
+
+            async def reader():
+                nonlocal errors
+                while time.perf_counter() < deadline:
+                    doctor = rnd.randint(1, args.doctors)
+                    pick = rnd.random()
+                    path = (f"/availability/availability/{doctor}" if pick < 0.6 else
+                            f"/availability/availability/{doctor}/slots" if pick < 0.9 else
+                            "/doctors/doctors/?limit=50")
+                    started = time.perf_counter()
+                    r = await client.get(url(rnd.choice(PORTS), path))
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    errors += r.status_code != 200
+
+            async def writer():
+                while time.perf_counter() < deadline:
+                    slot = datetime.datetime.combine(today + datetime.timedelta(days=rnd.randrange(14)),
+                                                     datetime.time(8)) + datetime.timedelta(minutes=30 * rnd.randrange(20))
+                    await client.post(url(rnd.choice(PORTS), "/appointments/appointments/"),
+                                      headers=auth_header(rnd.randint(1, USERS)),
+                                      json={"doctor_id": rnd.randint(1, args.doctors), "date": slot.date().isoformat(),
+                                            "time": slot.time().isoformat()})
+                    await asyncio.sleep(args.write_interval)
+
+            started = time.perf_counter()
+            await asyncio.gather(writer(), *(reader() for _ in range(args.clients)))
+            elapsed = time.perf_counter() - started
+
+            totals = [0.0] * 5
+            for port in PORTS:
+                for i, value in enumerate(read_metrics((await client.get(url(port, "/metrics"))).text)):
+                    totals[i] += value
+            hits, misses, reads, statements, seconds = totals
+
+            stale = 0
+            for i in range(args.rounds):
+                doctor = args.doctors - i  # not booked by the writer's random picks more than by chance
+                path = f"/availability/availability/{doctor}/slots"
+                before = (await client.get(url(PORTS[0], path))).json()
+                day = before["days"][-1]
+                r = await client.post(url(PORTS[1], "/appointments/appointments/"), headers=auth_header(USERS),
+                                      json={"doctor_id": doctor, "date": day["date"], "time": day["times"][0]})
+                assert r.status_code == 200, r.text
+                after = (await client.get(url(PORTS[0], path))).json()
+                stale += day["times"][0] in next(d["times"] for d in after["days"] if d["date"] == day["date"])
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+    return {
+        "reads_per_second": round(len(latencies) / elapsed, 1),
+        "read_latency": summarize(latencies),
+        "read_errors": errors,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "sql_statements_per_read": round(statements / reads, 3) if reads else 0.0,
+        "server_ms_per_read": round(seconds / reads * 1000, 3) if reads else 0.0,
+        "stale_reads_across_workers": f"{stale}/{args.rounds}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", default="off,memory,redis")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--write-interval", type=float, default=0.5, help="seconds between bookings")
+    parser.add_argument("--rounds", type=int, default=20, help="consistency rounds")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    use_scratch_database("read_cache.db")
+    from app.database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    seed(engine, args.doctors)
+    # Every worker starts from the seeded schema; none of them migrates.
+    base = {"DB_INIT_SCHEMA": "0", "LOG_LEVEL": "WARNING"}
+
+    report = {}
+    for backend in args.backends.split(","):
+        env = {**base, "READ_CACHE_BACKEND": backend}
+        if backend == "redis":
+            env["READ_CACHE_URL"] = os.getenv("READ_CACHE_URL") or start_fake_redis()
+        report[backend] = asyncio.run(run(args, env))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
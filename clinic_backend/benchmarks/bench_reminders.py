@@ -0,0 +1,177 @@
+# benchmarks/bench_reminders.py
+"""
+The reminder scheduler with a million reminders queued.
+
+Seeds --appointments appointments, --in-window of them booked and starting
+in the next REMINDER_WINDOW_HOURS, the rest spread over the year before
+and after. With the default 24 h and 1 h leads, the appointments of the
+first 24 hours have only their 1 h reminder left to queue. Then:
+- rebuild: one scheduler's startup load of the window (one range query),
+  its time, the heap's size, the peak of Python allocations while a
+  second scheduler loads the same window, and the query's plan;
+- events: schedule() and unschedule() per booking or cancellation with
+  the heap full;
+- fire: writing every reminder due in the next --fire-minutes to the
+  outbox, as the scheduler's thread would at those times;
+- fire again, from the second scheduler: every write must be skipped;
+- the window's query, as plain SQL, with ix_appointment_booked_start and
+  then without it, i.e. what one poll of the table would cost.
+
+    python -m benchmarks.bench_reminders --appointments 2000000 --in-window 667000
+"""
+import argparse
+import datetime
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks._common import use_scratch_database
+
+DOCTORS = 1000
+
+
+def seed(engine, now, appointments, in_window, window_hours, seed_value):
+    """Booked appointments on distinct (doctor, minute) slots; returns nothing."""
+    from sqlalchemy import insert
+    from app.models import Appointment, Doctor, User
+
+    rnd = random.Random(seed_value)
+    window_minutes = int(window_hours * 60)
+    year = 365 * 24 * 60
+
+    def slots(count, low, high):
+        taken = set()
+        while len(taken) < count:
+            taken.add((rnd.randrange(DOCTORS), rnd.randrange(low, high)))
+        return taken
+
+    rows = slots(in_window, 1, window_minutes)
+    outside = slots(appointments - in_window, -year, year - window_minutes)
+    rows |= {(d, m + window_minutes if m >= 0 else m) for d, m in outside}
+    with engine.begin() as conn:
+        conn.execute(insert(Doctor), [{"name": f"Dr. {i:04d}", "specialty": "Cardiology"} for i in range(DOCTORS)])
+        conn.execute(insert(User), [{"name": "p", "email": "p@example.com", "password_hash": "x"}])
+        batch = []
+        for doctor, minute in rows:
+            start = now + datetime.timedelta(minutes=minute)
+            batch.append({"patient_id": 1, "doctor_id": doctor + 1, "date": start.date(), "time": start.time(),
+                          "status": "booked" if rnd.random() < 0.9 or 0 < minute < window_minutes else "cancelled"})
+            if len(batch) == 50000:
+                conn.execute(insert(Appointment), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Appointment), batch)
+
+
+def heap_mb(scheduler):
+    return round((sys.getsizeof(scheduler._heap) + sum(sys.getsizeof(k) for k in scheduler._heap)) / 2**20, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--appointments", type=int, default=2000000)
+    parser.add_argument("--in-window", type=int, default=667000)
+    parser.add_argument("--fire-minutes", type=int, default=60)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    use_scratch_database("reminders.db")
+    from sqlalchemy import text
+    from app.database import create_db_and_tables, engine
+    from app.reminders import REMINDER_WINDOW_HOURS, ReminderScheduler, to_seconds
+
+    create_db_and_tables()
+    # Whole minutes, so that seeded start times and due times line up.
+    now_dt = datetime.datetime.now().replace(second=0, microsecond=0)
+    now = to_seconds(now_dt)
+    started = time.perf_counter()
+    seed(engine, now_dt, args.appointments, args.in_window, REMINDER_WINDOW_HOURS, args.seed)
+    report = {"appointments": args.appointments, "in_window": args.in_window,
+              "seed_seconds": round(time.perf_counter() - started, 1)}
+
+    scheduler = ReminderScheduler([1440, 60], REMINDER_WINDOW_HOURS, 30, 500)
+    loaded = scheduler.refill(now)
+    assert loaded == len(scheduler)
+    # The second scheduler (for the last step) loads the same window under
+    # tracemalloc: RSS would also count SQLite's page cache and mmap.
+    second = ReminderScheduler([1440, 60], REMINDER_WINDOW_HOURS, 30, 500)
+    tracemalloc.start()
+    second.refill(now)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    report["rebuild"] = {
+        **{k: v for k, v in scheduler.stats()["last_refill"].items() if k in ("appointments", "reminders", "seconds")},
+        "heap_mb": heap_mb(scheduler),
+        "python_peak_mb": round(peak / 2**20, 1),
+    }
+
+    # The refill's query, as text so that it can be explained and rerun.
+    begin, end = now_dt, now_dt + datetime.timedelta(hours=REMINDER_WINDOW_HOURS)
+    query = text("SELECT id, date, time FROM appointment WHERE status = 'booked' "
+                 "AND (date, time) >= (:d1, :t1) AND (date, time) < (:d2, :t2)")
+    params = {"d1": begin.date().isoformat(), "t1": begin.strftime("%H:%M:%S.%f"),
+              "d2": end.date().isoformat(), "t2": end.strftime("%H:%M:%S.%f")}
+
+    def plan(conn):
+        return [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + query.text), params)]
+
+    def timed(conn):
+        started = time.perf_counter()
+        rows = len(conn.execute(query, params).all())
+        return {"rows": rows, "seconds": round(time.perf_counter() - started, 3), "query_plan": plan(conn)}
+
+    with engine.connect() as conn:
+        report["rebuild"]["query_plan"] = plan(conn)
+        report["with_index"] = timed(conn)
+
+    rnd = random.Random(args.seed)
+    picks = [(rnd.randrange(10**9, 2 * 10**9), now_dt + datetime.timedelta(minutes=rnd.randrange(90, 2880)))
+             for _ in range(args.events)]
+    started = time.perf_counter()
+    for appointment_id, start in picks:
+        scheduler.schedule(appointment_id, start.date(), start.time())
+    scheduled = time.perf_counter() - started
+    started = time.perf_counter()
+    for appointment_id, start in picks:
+        scheduler.unschedule(appointment_id, start.date(), start.time())
+    unscheduled = time.perf_counter() - started
+    report["events"] = {
+        "count": args.events,
+        "schedule_us": round(scheduled / args.events * 1e6, 2),
+        "unschedule_us": round(unscheduled / args.events * 1e6, 2),
+    }
+
+    fire_until = now + args.fire_minutes * 60
+    started = time.perf_counter()
+    written = scheduler.fire_due(fire_until)
+    elapsed = time.perf_counter() - started
+    report["fire"] = {
+        "minutes_of_reminders": args.fire_minutes,
+        "written": written,
+        "skipped": scheduler.skipped,
+        "seconds": round(elapsed, 2),
+        "per_second": round(written / elapsed, 1) if elapsed else 0.0,
+        "left_in_heap": len(scheduler),
+    }
+    started = time.perf_counter()
+    again = second.fire_due(fire_until)
+    report["fire_again_from_second_scheduler"] = {
+        "written": again,
+        "skipped": second.skipped,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+    # Last, since the scratch database keeps the dropped index dropped.
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_appointment_booked_start"))
+    engine.dispose()  # pooled connections cache the statements prepared with the index
+    with engine.connect() as conn:
+        report["without_index"] = timed(conn)
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
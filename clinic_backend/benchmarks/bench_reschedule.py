@@ -0,0 +1,189 @@
+# benchmarks/bench_reschedule.py
+"""
+Moving appointments: cancel and book again, against the reschedule routes.
+
+- move: --patients patients each move their appointment to a new slot,
+  while --rivals other patients try to book that slot at the same moment.
+  cancel_and_book is DELETE /appointments/{id} followed by POST
+  /appointments/; reschedule is PATCH /appointments/{id}/reschedule.
+  Each patient ends up moved, kept where they were (the move was
+  refused), or stranded (cancelled, then lost the new slot to a rival).
+- day: a doctor's fully booked day (24 appointments) moved to another
+  doctor at the same times by an admin, with one PATCH per appointment
+  or one PATCH /appointments/reschedule.
+
+SQL statements and commits are counted on the engine. For the move
+scenario they include the rivals' bookings, which cost the same under
+both methods.
+
+    python -m benchmarks.bench_reschedule --patients 200 --rivals 3
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import time
+
+from benchmarks._common import use_scratch_database, summarize, auth_header
+
+use_scratch_database("reschedule.db")
+
+import httpx  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+from sqlmodel import Session, select, func  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.database import create_db_and_tables, engine  # noqa: E402
+from app.models import Appointment, Availability, Doctor, Notification, User  # noqa: E402
+
+create_db_and_tables()  # the app does this in its lifespan, which is not run here
+
+URL = "/appointments/appointments/"
+DAY = datetime.date(2030, 1, 7)
+SLOTS_PER_DAY = 24  # 08:00-20:00, every 30 minutes
+counts = {"statements": 0, "commits": 0}
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_statement(*_):
+    counts["statements"] += 1
+
+
+@event.listens_for(engine, "commit")
+def _count_commit(*_):
+    counts["commits"] += 1
+
+
+def day_slots(doctor_id, date):
+    start = datetime.datetime.combine(date, datetime.time(8))
+    return [(doctor_id, date, (start + datetime.timedelta(minutes=30 * i)).time()) for i in range(SLOTS_PER_DAY)]
+
+
+def seed(doctors, users):
+    """Doctors open 08:00-20:00 on DAY and the day after; returns the admin's user ID."""
+    with engine.begin() as conn:
+        conn.execute(insert(Doctor), [{"name": f"Dr. {i:03d}", "specialty": "Cardiology"} for i in range(doctors)])
+        conn.execute(insert(Availability), [
+            {"doctor_id": d + 1, "date": DAY + datetime.timedelta(days=k),
+             "start_time": datetime.time(8), "end_time": datetime.time(20)}
+            for d in range(doctors) for k in range(2)
+        ])
+        conn.execute(insert(User), [{"name": f"p{i}", "email": f"p{i}@bench.local", "password_hash": "x"}
+                                    for i in range(users)])
+        conn.execute(insert(User), [{"name": "admin", "email": "admin@bench.local", "password_hash": "x",
+                                     "role": "admin"}])
+    with Session(engine) as session:
+        return session.exec(select(func.max(User.id))).one()
+
+
+def slot_json(slot):
+    return {"doctor_id": slot[0], "date": slot[1].isoformat(), "time": slot[2].isoformat()}
+
+
+async def book(client, user_id, slot):
+    r = await client.post(URL, json=slot_json(slot), headers=auth_header(user_id))
+    return r.json()["appointment_id"] if r.status_code == 200 else None
+
+
+def notifications_of(patient_ids, after_id):
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(Notification).join(Appointment).where(
+            Notification.id > after_id, Appointment.patient_id.in_(patient_ids))).one()
+
+
+def last_notification_id():
+    with Session(engine) as session:
+        return session.exec(select(func.max(Notification.id))).one() or 0
+
+
+async def move_scenario(client, method, free, users, patients, rivals):
+    """Every patient books a slot, then moves it to a fresh one that rivals try to book too."""
+    moves = []
+    for _ in range(patients):
+        user_id, old, new = next(users), next(free), next(free)
+        moves.append((user_id, await book(client, user_id, old), new, [next(users) for _ in range(rivals)]))
+    outcomes = {"moved": 0, "kept": 0, "stranded": 0}
+    latencies = []
+
+    async def move(user_id, appointment_id, new):
+        started = time.perf_counter()
+        headers = auth_header(user_id)
+        if method == "reschedule":
+            r = await client.patch(f"{URL}{appointment_id}/reschedule", json=slot_json(new), headers=headers)
+            outcome = "moved" if r.status_code == 200 else "kept"
+        else:
+            await client.delete(f"{URL}{appointment_id}", headers=headers)
+            r = await client.post(URL, json=slot_json(new), headers=headers)
+            outcome = "moved" if r.status_code == 200 else "stranded"
+        latencies.append((time.perf_counter() - started) * 1000)
+        outcomes[outcome] += 1
+
+    statements, commits, first = counts["statements"], counts["commits"], last_notification_id()
+    started = time.perf_counter()
+    for user_id, appointment_id, new, rival_ids in moves:
+        await asyncio.gather(move(user_id, appointment_id, new), *(book(client, r, new) for r in rival_ids))
+    elapsed = time.perf_counter() - started
+    return {
+        **outcomes,
+        "seconds": round(elapsed, 2),
+        "move_latency": summarize(latencies),
+        "statements_per_round": round((counts["statements"] - statements) / patients, 1),
+        "commits_per_round": round((counts["commits"] - commits) / patients, 2),
+        "patient_notifications_per_move": round(notifications_of([m[0] for m in moves], first) / patients, 2),
+    }
+
+
+async def day_scenario(client, method, source, target, users, admin_id):
+    """Book one doctor's whole DAY, then move every appointment to `target` at the same time."""
+    booked = [(await book(client, next(users), slot), slot) for slot in day_slots(source, DAY)]
+    headers = auth_header(admin_id, "admin")
+    statements, commits = counts["statements"], counts["commits"]
+    latencies = []
+    started = time.perf_counter()
+    if method == "batch":
+        moves = [{"appointment_id": a, **slot_json((target, day, t))} for a, (_, day, t) in booked]
+        r = await client.patch(f"{URL}reschedule", json={"moves": moves}, headers=headers)
+        assert r.status_code == 200, r.text
+        latencies.append((time.perf_counter() - started) * 1000)
+    else:
+        for appointment_id, (_, day, t) in booked:
+            call = time.perf_counter()
+            r = await client.patch(f"{URL}{appointment_id}/reschedule", json=slot_json((target, day, t)),
+                                   headers=headers)
+            assert r.status_code == 200, r.text
+            latencies.append((time.perf_counter() - call) * 1000)
+    elapsed = time.perf_counter() - started
+    return {
+        "appointments": len(booked),
+        "calls": len(latencies),
+        "milliseconds": round(elapsed * 1000, 1),
+        "statements": counts["statements"] - statements,
+        "commits": counts["commits"] - commits,
+    }
+
+
+async def main(args):
+    # Each move uses two slots; each doctor has 2 * SLOTS_PER_DAY. Four
+    # more doctors for the day scenario: a source and a target per method.
+    move_doctors = math.ceil(2 * 2 * args.patients / (2 * SLOTS_PER_DAY))
+    admin_id = seed(move_doctors + 4, 2 * args.patients * (1 + args.rivals) + 2 * SLOTS_PER_DAY)
+    users = iter(range(1, admin_id))
+    free = iter([slot for d in range(1, move_doctors + 1) for k in range(2)
+                 for slot in day_slots(d, DAY + datetime.timedelta(days=k))])
+    report = {"patients": args.patients, "rivals_per_move": args.rivals}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for method in ("cancel_and_book", "reschedule"):
+            report[method] = await move_scenario(client, method, free, users, args.patients, args.rivals)
+        for i, method in enumerate(("one_patch_each", "batch")):
+            source = move_doctors + 1 + 2 * i
+            report[f"day_{method}"] = await day_scenario(client, method, source, source + 1, users, admin_id)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--patients", type=int, default=200, help="moves per method")
+    parser.add_argument("--rivals", type=int, default=3, help="competing bookings per new slot")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,126 @@
+# benchmarks/bench_serialization.py
+"""
+Serialization cost of a 10k-row list response, before and after app/serialization.py.
+
+Appointments are fetched once per repeat, then encoded the ways a list
+route can produce its body:
+- orm_response_model_json: full Appointment instances, validated against
+  List[AppointmentOut] by FastAPI's own serialize_response() and encoded
+  by the stdlib JSONResponse (the original routes);
+- dicts_response_model_json: column rows as dicts through the same path
+  (the list routes before this change);
+- dicts_response_model_orjson: the same with ORJSONResponse, the new
+  default response class, for routes that still return dicts or models;
+- row_serializer: column rows through RowSerializer(AppointmentOut), as
+  the list routes do now.
+
+Fetching is measured separately for ORM instances and column rows. Every
+figure is the median over --repeat runs, in ms per 10k rows.
+
+    python -m benchmarks.bench_serialization --rows 10000 --repeat 15
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import statistics
+import time
+
+from benchmarks._common import use_scratch_database
+
+
+def seed(engine, rows):
+    from sqlalchemy import insert
+    from app.models import Appointment, Clinic, Doctor, User
+
+    with engine.begin() as conn:
+        conn.execute(insert(Clinic), [{"name": "Bench Clinic"}])
+        conn.execute(insert(Doctor), [{"name": f"doctor{i}", "specialty": "General", "clinic_id": 1} for i in range(20)])
+        conn.execute(insert(User), [{"name": "patient", "email": "patient@example.com", "password_hash": "x"}])
+        start = datetime.datetime(2030, 1, 1, 8)
+        conn.execute(insert(Appointment), [
+            {"patient_id": 1, "doctor_id": i % 20 + 1, "status": "booked",
+             "date": (start + datetime.timedelta(minutes=30 * (i // 20))).date(),
+             "time": (start + datetime.timedelta(minutes=30 * (i // 20))).time()}
+            for i in range(rows)
+        ])
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    use_scratch_database("serialization.db")
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from sqlmodel import Session, select
+    from typing import List
+
+    from app.database import engine, create_db_and_tables
+    from app.models import Appointment
+    from app.pagination import rows_as_dicts
+    from app.routers.appointments_router import APPOINTMENT_ROWS
+    from app.schemas import AppointmentOut
+
+    create_db_and_tables()
+    seed(engine, args.rows)
+    columns = select(Appointment.id, Appointment.patient_id, Appointment.doctor_id,
+                     Appointment.date, Appointment.time, Appointment.status,
+                     Appointment.version).order_by(Appointment.id)
+
+    def fetch_orm():
+        with Session(engine) as session:
+            return session.exec(select(Appointment).order_by(Appointment.id)).all()
+
+    def fetch_rows():
+        with Session(engine) as session:
+            return session.exec(columns).all()
+
+    field = create_model_field(name="Response_bench", type_=List[AppointmentOut], mode="serialization")
+    loop = asyncio.new_event_loop()
+
+    def response_model(content, response_class):
+        encoded = loop.run_until_complete(serialize_response(field=field, response_content=content))
+        return response_class(encoded).body
+
+    report = {"rows": args.rows, "repeat": args.repeat, "fetch_ms": {}, "encode_ms": {}}
+    report["fetch_ms"]["orm_instances"], instances = timed(fetch_orm, args.repeat)
+    report["fetch_ms"]["column_rows"], rows = timed(fetch_rows, args.repeat)
+
+    encoders = {
+        "orm_response_model_json": lambda: response_model(instances, JSONResponse),
+        "dicts_response_model_json": lambda: response_model(rows_as_dicts(rows), JSONResponse),
+        "dicts_response_model_orjson": lambda: response_model(rows_as_dicts(rows), ORJSONResponse),
+        "row_serializer": lambda: APPOINTMENT_ROWS.dump(rows),
+    }
+    bodies = {}
+    for name, encode in encoders.items():
+        report["encode_ms"][name], bodies[name] = timed(encode, args.repeat)
+    expected = json.loads(bodies["orm_response_model_json"])
+    assert all(json.loads(body) == expected for body in bodies.values()), "encoders disagree"
+
+    before = report["fetch_ms"]["orm_instances"] + report["encode_ms"]["orm_response_model_json"]
+    after = report["fetch_ms"]["column_rows"] + report["encode_ms"]["row_serializer"]
+    report["fetch_and_encode_ms"] = {"before": before, "after": after, "speedup": before / after}
+    scale = 10000 / args.rows
+    for section in ("fetch_ms", "encode_ms", "fetch_and_encode_ms"):
+        report[section] = {k: round(v * scale, 2) if k != "speedup" else round(v, 1)
+                           for k, v in report[section].items()}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
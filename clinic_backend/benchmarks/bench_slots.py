@@ -0,0 +1,82 @@
+# benchmarks/bench_slots.py
+"""
+Latency of the free-slot endpoints.
+
+Seeds --doctors doctors with two availability windows per day for --days
+days and books roughly half of their 30-minute slots, then times
+GET /availability/{doctor_id}/slots over the full range and the batched
+GET /availability/slots for every doctor.
+
+    python -m benchmarks.bench_slots --days 90 --doctors 100
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+
+from benchmarks._common import use_scratch_database, summarize
+
+use_scratch_database("slots.db")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.database import create_db_and_tables, engine  # noqa: E402
+from app.models import Doctor, Availability, Appointment, User  # noqa: E402
+
+create_db_and_tables()  # the app does this in its lifespan, which is not run here
+
+START = datetime.date(2030, 1, 1)
+
+
+def seed(doctors, days):
+    rnd = random.Random(5)
+    with Session(engine) as session:
+        session.add(User(name="p", email="p@example.com", password_hash="x"))
+        session.add_all(Doctor(name=f"doctor{i}") for i in range(doctors))
+        session.flush()
+        for d in range(1, doctors + 1):
+            for day in range(days):
+                date = START + datetime.timedelta(days=day)
+                session.add(Availability(doctor_id=d, date=date, start_time=datetime.time(8), end_time=datetime.time(12)))
+                session.add(Availability(doctor_id=d, date=date, start_time=datetime.time(13), end_time=datetime.time(17)))
+                for hour in (8, 9, 10, 11, 13, 14, 15, 16):
+                    for minute in (0, 30):
+                        if rnd.random() < 0.5:
+                            session.add(Appointment(patient_id=1, doctor_id=d, date=date, time=datetime.time(hour, minute)))
+        session.commit()
+
+
+def timed(client, url, params, reps):
+    latencies = []
+    for _ in range(reps):
+        started = time.perf_counter()
+        r = client.get(url, params=params)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert r.status_code == 200, r.text
+    return summarize(latencies), r.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--doctors", type=int, default=100)
+    parser.add_argument("--reps", type=int, default=50)
+    args = parser.parse_args()
+
+    seed(args.doctors, args.days)
+    window = {"from": START.isoformat(), "to": (START + datetime.timedelta(days=args.days - 1)).isoformat()}
+    client = TestClient(app)
+
+    single, body = timed(client, "/availability/availability/1/slots", window, args.reps)
+    free = sum(len(day["times"]) for day in body["days"])
+    batch, _ = timed(client, "/availability/availability/slots",
+                     {**window, "doctor_ids": list(range(1, args.doctors + 1))}, max(5, args.reps // 10))
+    print(json.dumps({"days": args.days, "doctors": args.doctors, "free_slots_doctor_1": free,
+                      "single_doctor": single, "all_doctors_batched": batch}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
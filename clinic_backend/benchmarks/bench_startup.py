@@ -0,0 +1,113 @@
+# benchmarks/bench_startup.py
+"""
+Cold start of a worker process: importing app.main, the lifespan startup and the first OpenAPI request.
+
+Each measurement runs in a fresh interpreter, --runs times, and reports
+the median:
+- import_ms: `import app.main`, which builds the app and touches no
+  database;
+- startup_ms: the lifespan startup on a database that is already
+  migrated (the common case: a worker restart), on an empty database,
+  and with DB_INIT_SCHEMA=0;
+- openapi_ms: the first app.openapi() call, generated and loaded from a
+  file written by `python -m app.openapi`.
+
+It also runs `python -X importtime -c "import app.main"` once and lists the
+packages that take longest to import (self time, grouped by top-level
+package). Exits with status 1 when the median import takes longer than
+--target-ms.
+
+    python -m benchmarks.bench_startup --runs 7 --target-ms 1000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+
+def child():
+    started = time.perf_counter()
+    from app.main import app
+    report = {"import_ms": (time.perf_counter() - started) * 1000}
+
+    import asyncio
+
+    async def startup():
+        started = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            report["startup_ms"] = (time.perf_counter() - started) * 1000
+
+    asyncio.run(startup())
+    started = time.perf_counter()
+    app.openapi()
+    report["openapi_ms"] = (time.perf_counter() - started) * 1000
+    print(json.dumps(report))
+
+
+def measure(env, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+                             env={**os.environ, **env}, check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {key: round(statistics.median(s[key] for s in samples), 1) for key in samples[0]}
+
+
+def import_profile(env, top):
+    """Self import time (ms) by top-level package, and app.main's cumulative time."""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                         env={**os.environ, **env}, check=True, capture_output=True, text=True).stderr
+    by_package = Counter()
+    total = None
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        package = name.split(".")[0] if not name.startswith("app.") else name
+        by_package[package] += int(self_us) / 1000
+        if name == "app.main":
+            total = int(cumulative_us) / 1000
+    return total, {name: round(ms, 1) for name, ms in by_package.most_common(top)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--target-ms", type=float, default=1000, help="budget for the median import")
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    directory = tempfile.mkdtemp(prefix="clinic-bench-")
+    migrated = f"sqlite:///{directory}/migrated.db"
+    schema = os.path.join(directory, "openapi.json")
+    subprocess.run([sys.executable, "-m", "app.openapi", schema], env={**os.environ, "DATABASE_URL": migrated},
+                   check=True, capture_output=True)
+    measure({"DATABASE_URL": migrated}, 1)  # creates the tables
+
+    report = {"runs": args.runs, "target_ms": args.target_ms}
+    report["migrated_db"] = measure({"DATABASE_URL": migrated}, args.runs)
+    empty = [measure({"DATABASE_URL": f"sqlite:///{directory}/empty{i}.db"}, 1) for i in range(args.runs)]
+    report["empty_db_startup_ms"] = round(statistics.median(r["startup_ms"] for r in empty), 1)
+    report["skip_schema"] = measure({"DATABASE_URL": migrated, "DB_INIT_SCHEMA": "0",
+                                     "OPENAPI_SCHEMA_PATH": schema}, args.runs)
+    report["import_time_total_ms"], report["import_time_by_package_ms"] = import_profile(
+        {"DATABASE_URL": migrated}, args.top)
+    print(json.dumps(report, indent=2))
+    if report["migrated_db"]["import_ms"] > args.target_ms:
+        print(f"median import {report['migrated_db']['import_ms']} ms is over the {args.target_ms} ms target",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
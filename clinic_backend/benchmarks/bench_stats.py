@@ -0,0 +1,122 @@
+# benchmarks/bench_stats.py
+"""
+/admin/stats: rollup table vs aggregating the appointment table.
+
+Seeds --rows appointments over 200 doctors and two years, builds the
+rollup, then times the same breakdowns (by status, by month, by doctor)
+computed with GROUP BY over the appointment table and via app.stats
+summary() over the rollup. Also reports GET /admin/stats with a cold and
+a warm cache, and the cost the counters add to a booking.
+
+    python -m benchmarks.bench_stats --rows 2000000
+"""
+import argparse
+import datetime
+import json
+import time
+
+
+def seed(rows):
+    from sqlalchemy import insert
+    from sqlmodel import Session
+    from app.database import engine
+    from app.models import Appointment, Availability, Doctor, User
+
+    with Session(engine) as session:
+        session.add(User(name="admin", email="admin@example.com", password_hash="x", role="admin"))
+        session.add_all(Doctor(name=f"doctor{i}", specialty="General") for i in range(200))
+        session.commit()
+        # window for the booking latency run in main()
+        session.add(Availability(doctor_id=1, date=datetime.date(2030, 1, 1),
+                                 start_time=datetime.time(8), end_time=datetime.time(17)))
+        session.commit()
+    start = datetime.date(2024, 1, 1)
+    batch = []
+    with engine.begin() as conn:
+        per_doctor = max(1, rows // 200)
+        for i in range(rows):
+            k = i // 200  # k-th appointment of this doctor; 40 quarter-hour slots a day
+            batch.append({
+                "patient_id": 1, "doctor_id": i % 200 + 1,
+                "date": start + datetime.timedelta(days=k * 730 // per_doctor),
+                "time": datetime.time(8 + k % 40 // 4, k % 4 * 15),
+                "status": "cancelled" if i % 7 == 0 else "completed" if i % 3 == 0 else "booked",
+                "created_at": datetime.datetime(2024, 1, 1),
+            })
+            if len(batch) == 20_000:
+                conn.execute(insert(Appointment), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Appointment), batch)
+
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        ms = (time.perf_counter() - started) * 1000
+        best = ms if best is None else min(best, ms)
+    return round(best, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    from benchmarks._common import use_scratch_database, auth_header
+
+    use_scratch_database("stats.db")
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func
+    from sqlmodel import Session, select
+    from app.main import app
+    from app.database import create_db_and_tables, engine
+    from app.models import Appointment
+    from app.stats import rebuild, stats_cache, summary
+
+    create_db_and_tables()  # the app does this in its lifespan, which is not run here
+
+    seed(args.rows)
+    report = {"rows": args.rows}
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        rebuild(conn)
+    report["rollup_rebuild_ms"] = round((time.perf_counter() - started) * 1000)
+
+    def raw():
+        with Session(engine) as session:
+            session.exec(select(Appointment.status, func.count()).group_by(Appointment.status)).all()
+            session.exec(select(Appointment.date, Appointment.status, func.count())
+                         .group_by(Appointment.date, Appointment.status)).all()
+            session.exec(select(Appointment.doctor_id, Appointment.status, func.count())
+                         .group_by(Appointment.doctor_id, Appointment.status)).all()
+
+    def rollup():
+        with Session(engine) as session:
+            summary(session, bucket="month")
+
+    report["group_by_appointment_table_ms"] = timed(raw)
+    report["summary_over_rollup_ms"] = timed(rollup)
+
+    client = TestClient(app)
+    headers = auth_header(1, "admin")
+    stats_cache.clear()
+    report["http_cold_ms"] = timed(lambda: client.get("/admin/admin/stats", params={"bucket": "month"}, headers=headers), 1)
+    report["http_warm_ms"] = timed(lambda: client.get("/admin/admin/stats", params={"bucket": "month"}, headers=headers), 20)
+
+    booking = {"doctor_id": 1, "date": "2030-01-01", "time": "09:00"}
+    latencies = []
+    for minute in range(0, 60 * 8, 5):
+        booking["time"] = f"{8 + minute // 60:02d}:{minute % 60:02d}"
+        started = time.perf_counter()
+        assert client.post("/appointments/appointments/", json=booking, headers=headers).status_code == 200
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    report["booking_p50_ms"] = round(latencies[len(latencies) // 2], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
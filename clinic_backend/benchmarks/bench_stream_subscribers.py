@@ -0,0 +1,201 @@
+# benchmarks/bench_stream_subscribers.py
+"""
+One process holding --subscribers idle slot-change streams.
+
+The streams are opened against the ASGI app directly, each as a request
+to GET /availability/{doctor_id}/events whose client sends nothing until
+it disconnects; that is what an idle browser tab looks like to the app,
+without 10k sockets. All of them follow the same doctor, the worst case
+for fan-out. Then:
+- open: time until every stream has its first line, and the memory the
+  process grew by;
+- idle: CPU time the process used over --idle seconds, heartbeats
+  included (STREAM_HEARTBEAT_SECONDS=--heartbeat);
+- booking: a real POST /appointments/appointments/ (sync route, so the
+  event is published from the threadpool), and the time until every
+  stream has received its slot.taken, --bookings times;
+- burst: 3 x STREAM_BUFFER_SIZE events published at once from a thread;
+  each stream must end up with a resync in place of what it dropped;
+- close: every client disconnects; no subscription may be left.
+
+    python -m benchmarks.bench_stream_subscribers --subscribers 10000
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks._common import auth_header, summarize, use_scratch_database
+
+DAY = datetime.date(2030, 1, 7)
+MARKERS = (b"event: slot.taken", b"event: resync")
+arrivals = defaultdict(list)  # marker -> perf_counter() of every body message containing it
+
+
+def rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def seed(engine):
+    from sqlmodel import Session
+    from app.models import Availability, Doctor, User
+
+    with Session(engine) as session:
+        session.add(Doctor(name="Dr. Popular", specialty="Cardiology"))
+        session.add(User(name="patient", email="patient@example.com", password_hash="x"))
+        session.flush()
+        session.add(Availability(doctor_id=1, date=DAY, start_time=datetime.time(0),
+                                 end_time=datetime.time(23, 30)))
+        session.commit()
+
+
+class Client:
+    """One idle SSE client: records what it receives, disconnects on request."""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.gone = asyncio.Event()
+        self.received = bytearray()
+        self.status = None
+        self._requested = False
+
+    async def receive(self):
+        if not self._requested:
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            self.received += body
+            self.started.set()
+            for marker in MARKERS:
+                if marker in body:
+                    arrivals[marker].append(time.perf_counter())
+
+    def count(self, marker: bytes) -> int:
+        return self.received.count(marker)
+
+
+def scope(path):
+    return {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"bench"), (b"accept", b"text/event-stream")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+
+async def wait_until(predicate, timeout=120):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise AssertionError("timed out waiting for the streams")
+        await asyncio.sleep(0.002)
+
+
+async def run(args):
+    import httpx
+    from app import events
+    from app.main import app
+    from app.streams import STREAM_BUFFER_SIZE, broker
+
+    report = {"subscribers": args.subscribers}
+    async with app.router.lifespan_context(app):
+        clients = [Client() for _ in range(args.subscribers)]
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(app(scope("/availability/availability/1/events"), c.receive, c.send))
+                 for c in clients]
+        await asyncio.gather(*(c.started.wait() for c in clients))
+        assert all(c.status == 200 for c in clients), {c.status for c in clients}
+        assert len(broker) == args.subscribers, len(broker)
+        report["open"] = {
+            "seconds": round(time.perf_counter() - started, 2),
+            "rss_growth_mb": round(rss_mb() - rss_before, 1),
+            "kb_per_subscriber": round((rss_mb() - rss_before) * 1024 / args.subscribers, 1),
+        }
+
+        cpu = time.process_time()
+        await asyncio.sleep(args.idle)
+        heartbeats = sum(c.count(b": keepalive") for c in clients)
+        report["idle"] = {
+            "seconds": args.idle,
+            "cpu_seconds": round(time.process_time() - cpu, 2),
+            "heartbeats_sent": heartbeats,
+        }
+
+        transport = httpx.ASGITransport(app=app)
+        fan_out_ms = []
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            for i in range(args.bookings):
+                slot = datetime.time(i // 2, 30 * (i % 2))
+                started = time.perf_counter()
+                r = await http.post("/appointments/appointments/", headers=auth_header(1),
+                                    json={"doctor_id": 1, "date": DAY.isoformat(), "time": slot.isoformat()})
+                assert r.status_code == 200, r.text
+                await wait_until(lambda: len(arrivals[MARKERS[0]]) == (i + 1) * args.subscribers)
+                fan_out_ms.append((arrivals[MARKERS[0]][-1] - started) * 1000)
+        report["booking_to_all_subscribers"] = summarize(fan_out_ms)
+
+        burst = 3 * STREAM_BUFFER_SIZE
+        before = [c.count(b"event: ") for c in clients]
+        started = time.perf_counter()
+        thread = threading.Thread(target=lambda: [
+            events.publish(events.AVAILABILITY_CHANGED, doctor_id=1, date_from=DAY, date_to=DAY)
+            for _ in range(burst)])
+        thread.start()
+        thread.join()
+        await wait_until(lambda: len(arrivals[MARKERS[1]]) == args.subscribers)
+        elapsed = arrivals[MARKERS[1]][-1] - started
+        await asyncio.sleep(0.5)  # let the last batches through
+        delivered = [c.count(b"event: ") - b for c, b in zip(clients, before)]
+        report["burst"] = {
+            "published": burst,
+            "seconds": round(elapsed, 2),
+            "streams_resynced": sum(1 for c in clients if c.count(b"event: resync")),
+            "max_events_delivered": max(delivered),
+        }
+
+        started = time.perf_counter()
+        for c in clients:
+            c.gone.set()
+        await asyncio.gather(*tasks)
+        assert len(broker) == 0, f"{len(broker)} subscriptions left after disconnect"
+        report["close_seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--idle", type=float, default=10, help="seconds to stay idle")
+    parser.add_argument("--heartbeat", type=float, default=5, help="STREAM_HEARTBEAT_SECONDS")
+    parser.add_argument("--bookings", type=int, default=5)
+    args = parser.parse_args()
+
+    use_scratch_database("streams.db")
+    os.environ["STREAM_HEARTBEAT_SECONDS"] = str(args.heartbeat)
+    os.environ["STREAM_MAX_SUBSCRIBERS"] = str(max(args.subscribers, 20000))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from app.database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    seed(engine)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
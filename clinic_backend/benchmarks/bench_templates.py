@@ -0,0 +1,159 @@
+# benchmarks/bench_templates.py
+"""
+Availability for a 2-year horizon: one row per window vs recurring templates.
+
+Seeds --doctors doctors with the same weekly pattern (Monday-Friday,
+08:00-12:00 and 13:00-17:00) for --days days, half of them as concrete
+Availability rows and half as AvailabilityTemplate rows with a few
+overrides, then reports
+- rows and on-disk bytes (tables plus indexes, from SQLite's dbstat) of
+  each representation;
+- the cost of reading one doctor's windows for the whole horizon with
+  load_windows(), for concrete rows, and for templates with a cold and a
+  warm week cache, with query counts;
+- GET /availability/{doctor_id} for the default two weeks and for a year,
+  and the batch /slots endpoint for every template doctor.
+
+    python -m benchmarks.bench_templates --doctors 200 --days 730
+"""
+import argparse
+import datetime
+import json
+import time
+
+START = datetime.date(2030, 1, 7)  # a Monday
+SHIFTS = [(datetime.time(8), datetime.time(12)), (datetime.time(13), datetime.time(17))]
+
+
+def seed(doctors, days):
+    from sqlalchemy import insert
+    from sqlmodel import Session
+    from app.database import engine
+    from app.models import Availability, AvailabilityOverride, AvailabilityTemplate, Doctor
+
+    with Session(engine) as session:
+        session.add_all(Doctor(name=f"doctor{i}") for i in range(doctors))
+        session.commit()
+    concrete = range(1, doctors // 2 + 1)
+    templated = range(doctors // 2 + 1, doctors + 1)
+    end = START + datetime.timedelta(days=days - 1)
+    with engine.begin() as conn:
+        rows = []
+        for doctor_id in concrete:
+            for offset in range(days):
+                date = START + datetime.timedelta(days=offset)
+                if date.weekday() < 5:
+                    rows.extend({"doctor_id": doctor_id, "date": date, "start_time": s, "end_time": e} for s, e in SHIFTS)
+        conn.execute(insert(Availability), rows)
+        conn.execute(insert(AvailabilityTemplate), [
+            {"doctor_id": doctor_id, "weekday": weekday, "start_time": s, "end_time": e,
+             "effective_from": START, "effective_to": end}
+            for doctor_id in templated for weekday in range(5) for s, e in SHIFTS
+        ])
+        # a closed day and a short day per doctor and quarter
+        overrides = []
+        for doctor_id in templated:
+            for quarter in range(0, days, 91):
+                date = START + datetime.timedelta(days=quarter)
+                overrides.append({"doctor_id": doctor_id, "date": date, "start_time": None, "end_time": None})
+                overrides.append({"doctor_id": doctor_id, "date": date + datetime.timedelta(days=1),
+                                  "start_time": datetime.time(8), "end_time": datetime.time(12)})
+        conn.execute(insert(AvailabilityOverride), overrides)
+    return concrete[0], templated[0], end
+
+
+def storage(engine, table):
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(f'SELECT count(*) FROM "{table}"')).scalar()
+        size = conn.execute(text(
+            "SELECT sum(pgsize) FROM dbstat WHERE name = :t OR name IN "
+            "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t)"), {"t": table}).scalar()
+    return {"rows": rows, "bytes": size}
+
+
+def timed(fn, repeat=5, before=None):
+    samples = []
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return result, round(samples[len(samples) // 2], 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--days", type=int, default=730)
+    args = parser.parse_args()
+
+    from benchmarks._common import use_scratch_database
+
+    use_scratch_database("templates.db")
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from sqlmodel import Session
+    from app.main import app
+    from app.database import create_db_and_tables, engine
+    from app.recurring import week_cache
+    from app.slots import load_windows
+
+    create_db_and_tables()  # the app does this in its lifespan, which is not run here
+
+    concrete_id, template_id, end = seed(args.doctors, args.days)
+    per_doctor = args.doctors // 2
+    report = {"doctors_each": per_doctor, "horizon_days": args.days}
+    for table in ("availability", "availabilitytemplate", "availabilityoverride"):
+        report[table] = storage(engine, table)
+    report["bytes_per_doctor_concrete"] = round(report["availability"]["bytes"] / per_doctor)
+    report["bytes_per_doctor_templates"] = round(
+        (report["availabilitytemplate"]["bytes"] + report["availabilityoverride"]["bytes"]) / per_doctor)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(1))
+
+    def horizon(doctor_id):
+        with Session(engine) as session:
+            return load_windows(session, [doctor_id], START, end)
+
+    windows, report["horizon_concrete_ms"] = timed(lambda: horizon(concrete_id))
+    report["horizon_windows"] = len(windows)
+    templated, report["horizon_templates_cold_ms"] = timed(lambda: horizon(template_id), before=week_cache.clear)
+    report["horizon_templates_warm_ms"] = timed(lambda: horizon(template_id))[1]
+    statements.clear()
+    horizon(template_id)
+    report["horizon_templates_warm_queries"] = len(statements)  # the concrete-row query only
+    week_cache.clear()
+    statements.clear()
+    horizon(template_id)
+    report["horizon_templates_cold_queries"] = len(statements)
+    report["horizon_templates_windows"] = len(templated)
+
+    client = TestClient(app)
+    url = "/availability/availability/{}"
+    two_weeks = {"from": str(START), "to": str(START + datetime.timedelta(days=13))}
+    year = {"from": str(START), "to": str(START + datetime.timedelta(days=365))}
+    for name, doctor_id in (("concrete", concrete_id), ("templates", template_id)):
+        r, report[f"http_two_weeks_{name}_ms"] = timed(lambda: client.get(url.format(doctor_id), params=two_weeks))
+        report[f"http_two_weeks_{name}_bytes"] = len(r.content)
+        r, report[f"http_year_{name}_ms"] = timed(lambda: client.get(url.format(doctor_id), params=year))
+        report[f"http_year_{name}_bytes"] = len(r.content)
+
+    ids = [("doctor_ids", d) for d in range(template_id, args.doctors + 1)]
+    params = ids + list(two_weeks.items())
+    _, report["slots_batch_templates_cold_ms"] = timed(
+        lambda: client.get("/availability/availability/slots", params=params), before=week_cache.clear)
+    _, report["slots_batch_templates_warm_ms"] = timed(
+        lambda: client.get("/availability/availability/slots", params=params))
+    params = [("doctor_ids", d) for d in range(concrete_id, template_id)] + list(two_weeks.items())
+    _, report["slots_batch_concrete_ms"] = timed(
+        lambda: client.get("/availability/availability/slots", params=params))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
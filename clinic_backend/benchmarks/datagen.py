@@ -0,0 +1,190 @@
+# benchmarks/datagen.py
+"""
+Synthetic data for the benchmark suite.
+
+Fills an empty database with clinics, doctors, weekly availability
+templates, patients, appointments and pending notifications at one of the
+SCALES presets, optionally with individual counts overridden. Everything
+is derived from --seed, so two databases generated with the same
+arguments hold the same rows.
+
+- Doctors work Monday-Friday 08:00-17:00 from START on, as open-ended
+  AvailabilityTemplate rows; a few have a closed day (an override).
+- Patients are patient<N>@example.com, all with the password PASSWORD
+  (hashed once with the configured bcrypt cost and shared, so generating
+  100 000 users does not take hours).
+- Appointments fill distinct half-hour slots from START on, spread over
+  the doctors, about 70% booked, 20% completed and 10% cancelled; the
+  stats rollups are rebuilt from them.
+- Pending notifications point at the first appointments.
+
+Rows go in with executemany inserts in chunks of CHUNK, not through the
+API. describe() reads back what a generated database holds, which is all
+the suite needs to aim its scenarios, so it also works against the
+database of a separately started server.
+
+    python -m benchmarks.datagen --scale medium            # into DATABASE_URL
+    python -m benchmarks.datagen --scale small --doctors 200
+"""
+import argparse
+import dataclasses
+import datetime
+import json
+import random
+from dataclasses import dataclass
+
+START = datetime.date(2030, 1, 7)  # a Monday
+PASSWORD = "bench-password"
+SPECIALTIES = ["Cardiology", "Dermatology", "General", "Neurology", "Oncology",
+               "Orthopedics", "Pediatrics", "Psychiatry", "Radiology", "Urology"]
+DAY_START, DAY_END = datetime.time(8), datetime.time(17)
+SLOTS_PER_DAY = 18  # half-hour slots between DAY_START and DAY_END
+CHUNK = 10000
+
+
+@dataclass
+class Scale:
+    clinics: int
+    doctors: int
+    patients: int
+    appointments: int
+    notifications: int
+
+
+SCALES = {
+    "small": Scale(clinics=5, doctors=50, patients=500, appointments=5000, notifications=1000),
+    "medium": Scale(clinics=20, doctors=500, patients=10000, appointments=100000, notifications=10000),
+    "large": Scale(clinics=100, doctors=5000, patients=100000, appointments=1000000, notifications=50000),
+}
+
+
+def slot(n, doctors):
+    """(doctor_id, date, time) of the n-th generated slot; slots go doctor by doctor, then forward in time."""
+    rest, doctor = divmod(n, doctors)
+    day, step = divmod(rest, SLOTS_PER_DAY)
+    date = START + datetime.timedelta(days=day // 5 * 7 + day % 5)
+    minutes = DAY_START.hour * 60 + step * 30
+    return doctor + 1, date, datetime.time(minutes // 60, minutes % 60)
+
+
+def _chunks(rows):
+    for i in range(0, len(rows), CHUNK):
+        yield rows[i:i + CHUNK]
+
+
+def generate(engine, scale: Scale, seed: int = 1):
+    """
+    Insert a dataset of the given scale into an empty database.
+
+    Args:
+        engine: Engine of a database whose tables exist and are empty.
+        scale (Scale): Row counts.
+        seed (int): Seed of every random choice.
+
+    Returns:
+        dict: describe() of the generated database.
+    """
+    from sqlalchemy import insert
+    from app import stats
+    from app.models import (Appointment, AvailabilityOverride, AvailabilityTemplate, Clinic, Doctor,
+                            Notification, User)
+    from app.utils import hash_password
+
+    rnd = random.Random(seed)
+    password_hash = hash_password(PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(insert(Clinic), [{"name": f"Clinic {i}", "address": f"{i} Bench Street"}
+                                      for i in range(1, scale.clinics + 1)])
+        conn.execute(insert(Doctor), [
+            {"name": f"Dr. {i:06d}", "specialty": SPECIALTIES[i % len(SPECIALTIES)],
+             "clinic_id": rnd.randint(1, scale.clinics) if scale.clinics else None}
+            for i in range(1, scale.doctors + 1)
+        ])
+        conn.execute(insert(AvailabilityTemplate), [
+            {"doctor_id": d, "weekday": w, "start_time": DAY_START, "end_time": DAY_END,
+             "effective_from": START, "effective_to": None}
+            for d in range(1, scale.doctors + 1) for w in range(5)
+        ])
+        conn.execute(insert(AvailabilityOverride), [
+            {"doctor_id": d, "date": START + datetime.timedelta(days=rnd.randrange(0, 28)),
+             "start_time": None, "end_time": None}
+            for d in range(1, scale.doctors + 1, 10)
+        ])
+        for rows in _chunks([{"name": f"Patient {i}", "email": f"patient{i}@example.com",
+                              "password_hash": password_hash, "role": "patient"}
+                             for i in range(1, scale.patients + 1)]):
+            conn.execute(insert(User), rows)
+        created = datetime.datetime(2029, 12, 1)
+        appointments = []
+        for n in range(scale.appointments):
+            doctor_id, date, time = slot(n, scale.doctors)
+            roll = rnd.random()
+            status = "booked" if roll < 0.7 else "completed" if roll < 0.9 else "cancelled"
+            appointments.append({"patient_id": rnd.randint(1, scale.patients), "doctor_id": doctor_id,
+                                 "date": date, "time": time, "status": status, "created_at": created})
+        for rows in _chunks(appointments):
+            conn.execute(insert(Appointment), rows)
+        for rows in _chunks([{"appointment_id": i % scale.appointments + 1 if scale.appointments else None,
+                              "message": f"Reminder {i}", "sent": False, "created_at": created}
+                             for i in range(scale.notifications)]):
+            conn.execute(insert(Notification), rows)
+        stats.rebuild(conn)
+    return describe(engine)
+
+
+def describe(engine):
+    """
+    What a generated database holds, for aiming the scenarios.
+
+    Returns:
+        dict: Row counts, the specialties in use, the last appointment
+        date and "free_from", the first Monday after it and after every
+        override (every slot of every doctor from there on is free).
+    """
+    from sqlalchemy import func, select
+    from app.models import Appointment, AvailabilityOverride, Clinic, Doctor, Notification, User
+
+    with engine.connect() as conn:
+        last = conn.execute(select(func.max(Appointment.date))).scalar() or START
+        closed = conn.execute(select(func.max(AvailabilityOverride.date))).scalar() or START
+        busy_until = max(datetime.date.fromisoformat(str(last)), datetime.date.fromisoformat(str(closed)))
+        specialties = conn.execute(select(Doctor.specialty).distinct().order_by(Doctor.specialty)).scalars().all()
+        return {
+            "clinics": conn.execute(select(func.count()).select_from(Clinic)).scalar(),
+            "doctors": conn.execute(select(func.count()).select_from(Doctor)).scalar(),
+            "patients": conn.execute(select(func.count()).select_from(User).where(User.role == "patient")).scalar(),
+            "appointments": conn.execute(select(func.count()).select_from(Appointment)).scalar(),
+            "pending_notifications": conn.execute(
+                select(func.count()).select_from(Notification).where(Notification.sent.is_(False))).scalar(),
+            "specialties": [s for s in specialties if s],
+            "last_appointment_date": str(last),
+            "free_from": str(busy_until + datetime.timedelta(days=7 - busy_until.weekday())),
+        }
+
+
+def scale_from_args(args) -> Scale:
+    """The --scale preset with any --clinics/--doctors/... overrides applied."""
+    overrides = {f.name: getattr(args, f.name) for f in dataclasses.fields(Scale) if getattr(args, f.name) is not None}
+    return dataclasses.replace(SCALES[args.scale], **overrides)
+
+
+def add_scale_arguments(parser):
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for field in dataclasses.fields(Scale):
+        parser.add_argument(f"--{field.name}", type=int, help=f"override the preset's {field.name}")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+
+    from app.database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    print(json.dumps(generate(engine, scale_from_args(args), args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
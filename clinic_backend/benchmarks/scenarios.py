@@ -0,0 +1,185 @@
+# benchmarks/scenarios.py
+"""
+Scenarios of the benchmark suite (benchmarks/suite.py).
+
+Each scenario is a coroutine taking an httpx.AsyncClient, the describe()
+output of the dataset and the suite's options, that drives one kind of
+traffic and returns a Recorder summary: request count, wall time,
+throughput, latency percentiles and status codes. A response whose status
+is not in the scenario's expected set counts as a failure, as does a
+broken invariant (two bookings winning one slot).
+
+- login_storm: --logins logins by different patients at --concurrency;
+  503 (bcrypt admission shedding, see app/hashing.py) is expected.
+- booking_contention: --hot-slots free slots of the first doctors, each
+  booked by --contenders patients at once; exactly one booking per slot
+  may succeed, the rest get 409.
+- directory_browsing: --requests doctor directory pages, walking up to
+  three pages of a random specialty. Half the visits come from returning
+  visitors, who revalidate pages already seen with If-None-Match like a
+  browser cache would (304 is expected).
+- patient_history: --requests "my appointments" pages of random
+  patients, following X-Next-Cursor.
+- notification_dispatch: one POST /notifications/dispatch_pending that
+  drains every pending notification; throughput is notifications per
+  second, as reported by the endpoint. It consumes the dataset's pending
+  notifications, so a second run against the same database sends only
+  what later bookings queued and is reported as a failure.
+"""
+import asyncio
+import datetime
+import random
+import time
+from collections import Counter
+
+from benchmarks._common import auth_header, summarize
+from benchmarks.datagen import PASSWORD, SLOTS_PER_DAY
+
+
+class Recorder:
+    """Latencies and status codes of one scenario run."""
+
+    def __init__(self, expected):
+        self.expected = set(expected)
+        self.latencies = []
+        self.codes = Counter()
+        self.failures = 0
+        self.started = time.perf_counter()
+
+    async def request(self, client, method, url, **kwargs):
+        started = time.perf_counter()
+        r = await client.request(method, url, **kwargs)
+        self.latencies.append((time.perf_counter() - started) * 1000)
+        self.codes[r.status_code] += 1
+        if r.status_code not in self.expected:
+            self.failures += 1
+        return r
+
+    def result(self, throughput=None, unit="req/s", **extra):
+        seconds = time.perf_counter() - self.started
+        if throughput is None:
+            throughput = len(self.latencies) / seconds if seconds else 0.0
+        return {
+            "requests": len(self.latencies),
+            "seconds": round(seconds, 3),
+            "throughput": round(throughput, 1),
+            "unit": unit,
+            **{k: v for k, v in summarize(self.latencies).items() if k != "count"},
+            "status_codes": {str(code): n for code, n in sorted(self.codes.items())},
+            "failures": self.failures,
+            **extra,
+        }
+
+
+async def run_pool(concurrency, jobs):
+    """Await the coroutine factories in `jobs` with at most `concurrency` in flight."""
+    jobs = list(reversed(jobs))
+
+    async def worker():
+        while jobs:
+            await jobs.pop()()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def login_storm(client, data, options):
+    rnd = random.Random(options.seed)
+    rec = Recorder({200, 503})
+    body = lambda: {"email": f"patient{rnd.randint(1, data['patients'])}@example.com", "password": PASSWORD}
+    await run_pool(options.concurrency, [
+        lambda: rec.request(client, "POST", "/auth/auth/login", json=body()) for _ in range(options.logins)
+    ])
+    return rec.result(shed=rec.codes[503])
+
+
+async def booking_contention(client, data, options):
+    rnd = random.Random(options.seed)
+    rec = Recorder({200, 409})
+    free_from = datetime.date.fromisoformat(data["free_from"])
+    hot_doctors = max(1, min(data["doctors"], options.hot_slots // SLOTS_PER_DAY + 1))
+    double_booked = 0
+    for n in range(options.hot_slots):
+        day, step = divmod(n // hot_doctors, SLOTS_PER_DAY)
+        date = free_from + datetime.timedelta(days=day // 5 * 7 + day % 5)
+        body = {"doctor_id": n % hot_doctors + 1, "date": str(date),
+                "time": f"{8 + step // 2:02d}:{step % 2 * 30:02d}"}
+        patients = rnd.sample(range(1, data["patients"] + 1), min(options.contenders, data["patients"]))
+        responses = await asyncio.gather(*(
+            rec.request(client, "POST", "/appointments/appointments/", json=body, headers=auth_header(p))
+            for p in patients
+        ))
+        if sum(r.status_code == 200 for r in responses) != 1:
+            double_booked += 1
+    rec.failures += double_booked
+    return rec.result(slots=options.hot_slots, contenders=options.contenders, slots_not_booked_once=double_booked)
+
+
+async def directory_browsing(client, data, options):
+    rnd = random.Random(options.seed)
+    rec = Recorder({200, 304})
+    etags = {}  # (specialty, cursor) -> ETag, the client's cache
+    issued = 0
+
+    async def visit():
+        nonlocal issued
+        specialty = rnd.choice(data["specialties"])
+        returning = rnd.random() < 0.5
+        cursor = None
+        for _ in range(3):
+            if issued >= options.requests:
+                return
+            issued += 1
+            params = {"specialty": specialty, "limit": 20, **({"cursor": cursor} if cursor else {})}
+            cached = etags.get((specialty, cursor)) if returning else None
+            headers = {"If-None-Match": cached} if cached else {}
+            r = await rec.request(client, "GET", "/doctors/doctors/", params=params, headers=headers)
+            if r.status_code == 200 and "ETag" in r.headers:
+                etags[(specialty, cursor)] = r.headers["ETag"]
+            cursor = r.headers.get("X-Next-Cursor")
+            if not cursor:
+                return
+
+    # enough visits for --requests pages even if every visit stops after one
+    await run_pool(options.concurrency, [visit for _ in range(options.requests)])
+    return rec.result(not_modified=rec.codes[304])
+
+
+async def patient_history(client, data, options):
+    rnd = random.Random(options.seed)
+    rec = Recorder({200})
+    issued = 0
+
+    async def visit():
+        nonlocal issued
+        headers = auth_header(rnd.randint(1, data["patients"]))
+        cursor = None
+        while issued < options.requests:
+            issued += 1
+            params = {"limit": 20, **({"cursor": cursor} if cursor else {})}
+            r = await rec.request(client, "GET", "/appointments/appointments/me", params=params, headers=headers)
+            cursor = r.headers.get("X-Next-Cursor")
+            if not cursor:
+                return
+
+    await run_pool(options.concurrency, [visit for _ in range(options.requests)])
+    return rec.result()
+
+
+async def notification_dispatch(client, data, options):
+    rec = Recorder({200})
+    r = await rec.request(client, "POST", "/notifications/notifications/dispatch_pending")
+    body = r.json() if r.status_code == 200 else {}
+    sent = body.get("sent", 0)
+    if sent < data["pending_notifications"]:  # bookings made by earlier scenarios add more
+        rec.failures += 1
+    return rec.result(throughput=body.get("per_second", 0.0), unit="notifications/s", sent=sent,
+                      pending=data["pending_notifications"])
+
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "booking_contention": booking_contention,
+    "directory_browsing": directory_browsing,
+    "patient_history": patient_history,
+    "notification_dispatch": notification_dispatch,
+}
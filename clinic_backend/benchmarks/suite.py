@@ -0,0 +1,187 @@
+# benchmarks/suite.py
+"""
+Load-test suite: run every scenario, save the results, compare with a baseline.
+
+By default the suite generates a --scale dataset (benchmarks/datagen.py)
+in a scratch database and drives app.main:app in-process through
+httpx.ASGITransport. With --url it drives a running server instead; the
+server's database must have been filled by benchmarks.datagen first, and
+DATABASE_URL must point at it so the suite can describe() the dataset:
+
+    python -m benchmarks.suite --scale small --out results.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+
+    DATABASE_URL=sqlite:///load.db python -m benchmarks.datagen --scale medium
+    DATABASE_URL=sqlite:///load.db uvicorn app.main:app --workers 4 &
+    DATABASE_URL=sqlite:///load.db python -m benchmarks.suite --url http://127.0.0.1:8000
+
+Scenarios run one after another, in SCENARIOS order (see
+benchmarks/scenarios.py). Results are one JSON document: "meta" (scale,
+target, git revision, Python, CPUs, DB_MODE) and one entry per scenario.
+
+Against a baseline, a scenario regresses when its throughput drops, or its
+p50/p95/p99 latency grows, by more than --tolerance (a fraction; latency
+changes under --min-delta-ms are ignored as noise), or when it has more
+failures than the baseline. Regressions are listed on stderr and the exit
+status is 1. Compare only runs of the same scale on the same machine.
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from benchmarks.datagen import add_scale_arguments, scale_from_args
+
+HIGHER_IS_BETTER = ["throughput"]
+LOWER_IS_BETTER = ["p50_ms", "p95_ms", "p99_ms"]
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare(args):
+    """Dataset description, generating it first when running in-process."""
+    if args.url:
+        from sqlalchemy import create_engine
+        from benchmarks.datagen import describe
+
+        if "DATABASE_URL" not in os.environ:
+            sys.exit("--url needs DATABASE_URL pointing at the server's (generated) database")
+        return describe(create_engine(os.environ["DATABASE_URL"]))
+
+    from benchmarks._common import use_scratch_database
+    from benchmarks.datagen import generate
+
+    use_scratch_database("suite.db")
+    from app.database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    return generate(engine, scale_from_args(args), args.seed)
+
+
+async def run(args, data):
+    import httpx
+    from benchmarks.scenarios import SCENARIOS
+
+    results = {}
+    async with contextlib.AsyncExitStack() as stack:
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=300,
+                                       limits=httpx.Limits(max_connections=args.concurrency + args.contenders))
+        else:
+            from app.main import app
+
+            # ASGITransport sends no lifespan events; run startup/shutdown here
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300)
+        await stack.enter_async_context(client)
+        for name in args.scenarios:
+            print(f"running {name}", file=sys.stderr)
+            results[name] = await SCENARIOS[name](client, data, args)
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """
+    Regressions of `results` against `baseline`.
+
+    Returns:
+        List[str]: One line per regressed metric; empty when none did.
+    """
+    if results["meta"]["scale"] != baseline["meta"].get("scale"):
+        print("warning: baseline was recorded at a different scale", file=sys.stderr)
+    regressions = []
+    for name, current in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if not before:
+            continue
+        for metric in HIGHER_IS_BETTER:
+            if before[metric] and current[metric] < before[metric] * (1 - tolerance):
+                regressions.append(f"{name}.{metric}: {current[metric]} < {before[metric]} {current['unit']}")
+        for metric in LOWER_IS_BETTER:
+            if (current[metric] > before[metric] * (1 + tolerance)
+                    and current[metric] - before[metric] >= min_delta_ms):
+                regressions.append(f"{name}.{metric}: {current[metric]} > {before[metric]} ms")
+        if current["failures"] > before["failures"]:
+            regressions.append(f"{name}.failures: {current['failures']} > {before['failures']}")
+    return regressions
+
+
+def table(results):
+    lines = [f"{'scenario':<24}{'requests':>9}{'throughput':>22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+             f"{'failures':>10}"]
+    for name, r in results["scenarios"].items():
+        lines.append(f"{name:<24}{r['requests']:>9}{r['throughput']:>10} {r['unit']:<11}{r['p50_ms']:>10}"
+                     f"{r['p95_ms']:>10}{r['p99_ms']:>10}{r['failures']:>10}")
+    return "\n".join(lines)
+
+
+def main():
+    from benchmarks.scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_scale_arguments(parser)
+    parser.add_argument("--url", help="drive a running server instead of the app in-process")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="per browsing/history scenario")
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--hot-slots", type=int, default=20)
+    parser.add_argument("--contenders", type=int, default=20, help="concurrent bookings per hot slot")
+    parser.add_argument("--out", help="write the results here")
+    parser.add_argument("--baseline", help="compare with these results; exit 1 on a regression")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results here as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    # The app prints (stub e-mails, debug output); keep stdout for the table.
+    with contextlib.redirect_stdout(sys.stderr):
+        data = prepare(args)
+        scenarios = asyncio.run(run(args, data))
+    results = {
+        "meta": {
+            # a server's dataset was generated elsewhere; "dataset" describes it
+            "scale": None if args.url else {"name": args.scale, **vars(scale_from_args(args))},
+            "target": args.url or "in-process",
+            "dataset": data,
+            "options": {k: getattr(args, k) for k in ("concurrency", "requests", "logins", "hot_slots",
+                                                      "contenders", "seed")},
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "db_mode": os.getenv("DB_MODE", "sync"),
+            "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        },
+        "scenarios": scenarios,
+    }
+    print(table(results))
+    for path in filter(None, [args.out, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
-
+# Development server: one process on 127.0.0.1 that reloads on code changes.
+# For deployments use the production launcher, `python -m app.serve`.
 import uvicorn
 
 if __name__ == "__main__":